@@ -0,0 +1,97 @@
+from bisect import bisect_left
+
+
+def normalize_name(name):
+    """Нормализует имя: нижний регистр, без лишних пробелов."""
+    return " ".join(name.lower().split())
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Расстояние Левенштейна между a и b, ограниченное max_distance:
+    если расстояние больше, возвращается max_distance + 1 (расчёт прерывается раньше).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class ActorNameIndex:
+    """
+    Индекс имён актёров в памяти: отсортированный массив нормализованных имён
+    в вариантах "first last" и "last, first". Поиск — по префиксу имени или фамилии
+    (бинарный поиск); полный перебор имён по подстроке и нечёткий поиск (опечатки)
+    выполняются, только если префиксов не найдено.
+    """
+    def __init__(self, rows):
+        """
+        :param rows: тройки (actor_id, first_name, last_name)
+        """
+        entries = []
+        self.full_names = []  # (нормализованное "first last", actor_id)
+        for actor_id, first_name, last_name in rows:
+            full_name = normalize_name(f"{first_name} {last_name}")
+            self.full_names.append((full_name, actor_id))
+            entries.append((full_name, actor_id))
+            entries.append((normalize_name(f"{last_name}, {first_name}"), actor_id))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._ids = [actor_id for _, actor_id in entries]
+
+    @classmethod
+    def from_connection(cls, connection):
+        """Строит индекс по таблице actor."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT actor_id, first_name, last_name FROM actor")
+            return cls((row["actor_id"], row["first_name"], row["last_name"]) for row in cursor.fetchall())
+
+    def __len__(self):
+        return len(self.full_names)
+
+    def prefix(self, query):
+        """actor_id, у которых имя или фамилия (вариант "last, first") начинается с query."""
+        query = normalize_name(query)
+        start = bisect_left(self._keys, query)
+        end = bisect_left(self._keys, query + "\uffff")
+        return set(self._ids[start:end])
+
+    def substring(self, query):
+        """actor_id, у которых полное имя содержит query (как LIKE '%query%')."""
+        query = normalize_name(query)
+        return {actor_id for full_name, actor_id in self.full_names if query in full_name}
+
+    def fuzzy(self, query, max_distance=None):
+        """
+        actor_id с минимальным расстоянием редактирования до query (не больше max_distance).
+        Сравнение идёт и с полным именем, и с его началом длины query — так находятся
+        и неполные имена с опечаткой.
+        """
+        query = normalize_name(query)
+        if max_distance is None:
+            # Допускаем одну опечатку на каждые 4 символа, но не больше трёх
+            max_distance = min(3, max(1, len(query) // 4))
+        best, found = max_distance + 1, set()
+        for key, actor_id in zip(self._keys, self._ids):
+            distance = min(edit_distance(query, key, best), edit_distance(query, key[:len(query)], best))
+            if distance < best:
+                best, found = distance, {actor_id}
+            elif distance == best and distance <= max_distance:
+                found.add(actor_id)
+        return found
+
+    def resolve(self, query):
+        """
+        Находит actor_id по имени: префиксы (бинарный поиск), если их нет — подстрока
+        (как LIKE '%query%' в MySQL), если нет и её — нечёткое совпадение.
+        Возвращает отсортированный список.
+        """
+        return sorted(self.prefix(query) or self.substring(query) or self.fuzzy(query))
@@ -0,0 +1,128 @@
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from rows import as_dicts
+
+# Пакетный режим: поисковые запросы читаются из JSONL (файл или stdin), выполняются
+# пулом потоков и выводятся в JSONL в порядке входа. Формат строки запроса совпадает
+# с записью лога LogSearch:
+#   {"search_type": "by title", "parameters": {"title": "ace"}, "limit": 10, "id": "..."}
+
+# search_type -> (метод DBConnector, параметры в порядке аргументов)
+SEARCHES = {
+    "by title": ("search_by_title", ("title",)),
+    "by genre": ("search_by_genre", ("genre",)),
+    "by years (from... to...)": ("search_by_year_range", ("from", "to")),
+    "by genre and years": ("search_by_genre_and_years", ("genre", "from", "to")),
+    "by actor": ("search_by_actor", ("actor",)),
+    "by keyword": ("search_by_keyword", ("keywords",)),
+    # Составной поиск FilmQuery: любые из параметров title, genre, from, to, actor
+    "by filters": ("search_films", ()),
+}
+
+# Необязательные параметры после обязательных (передаются, если указаны)
+OPTIONAL = {
+    "by keyword": ("mode", "fields"),
+}
+
+_YEAR_PARAMETERS = ("from", "to")
+_FILTER_PARAMETERS = ("title", "genre", "from", "to", "actor")
+
+
+def read_requests(lines):
+    """Разбирает строки JSONL: пустые строки и комментарии (#) пропускаются."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"некорректный JSON: {e}")
+
+
+def search_args(request):
+    """Метод поиска и его аргументы для запроса."""
+    search_type = str(request.get("search_type", "")).strip().lower()
+    if search_type not in SEARCHES:
+        raise ValueError(f"неизвестный search_type {request.get('search_type')!r}")
+    method, names = SEARCHES[search_type]
+    parameters = request.get("parameters") or {}
+    if search_type == "by filters":
+        from film_query import FilmQuery
+        filters = {name: parameters[name] for name in _FILTER_PARAMETERS if parameters.get(name) not in (None, "")}
+        years = [int(filters[name]) if name in filters else None for name in _YEAR_PARAMETERS]
+        return search_type, method, [FilmQuery(filters.get("title"), filters.get("genre"), *years,
+                                               filters.get("actor"))]
+    missing = [name for name in names if name not in parameters]
+    if missing:
+        raise ValueError(f"не хватает параметров: {', '.join(missing)}")
+    args = [int(parameters[name]) if name in _YEAR_PARAMETERS else parameters[name] for name in names]
+    for name in OPTIONAL.get(search_type, ()):
+        if name not in parameters:
+            break
+        args.append(parameters[name])
+    return search_type, method, args
+
+
+def run_request(db, number, request, limit):
+    """
+    Выполняет один запрос. Возвращает запись результата; ошибки не пробрасываются,
+    а попадают в поле error, чтобы одна плохая строка не останавливала пакет.
+    """
+    record = {"line": number}
+    started = time.perf_counter()
+    try:
+        if isinstance(request, Exception):
+            raise request
+        if not isinstance(request, dict):
+            raise ValueError("строка запроса должна быть JSON-объектом")
+        if "id" in request:
+            record["id"] = request["id"]
+        search_type, method, args = search_args(request)
+        search = getattr(db, method)
+        limit = int(request.get("limit", limit))
+        record["search_type"] = search_type
+        record["parameters"] = request.get("parameters")
+        record["result_count"] = db.count(search, *args)
+        record["results"] = as_dicts(search(*args, limit=limit)) if limit > 0 else []
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - started, 6)
+    return record
+
+
+def run_batch(db, lines, output, workers=8, limit=10, logger=None, window=None):
+    """
+    Выполняет запросы из lines пулом из workers потоков и пишет результаты в output
+    построчно в порядке входа. Одновременно в работе не больше window запросов
+    (по умолчанию workers * 4), поэтому память не растёт с размером входа.
+    :param logger: LogSearch для записи выполненных запросов (лучше буферизованный)
+    :return: сводка {"requests", "errors", "seconds", "per_second"}
+    """
+    window = window or workers * 4
+    pending = deque()
+    summary = {"requests": 0, "errors": 0}
+    started = time.perf_counter()
+
+    def emit(record):
+        summary["requests"] += 1
+        if "error" in record:
+            summary["errors"] += 1
+        elif logger is not None:
+            logger.log_search(record["search_type"], record["parameters"], record["result_count"])
+        output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-search") as executor:
+        for number, request in read_requests(lines):
+            pending.append(executor.submit(run_request, db, number, request, limit))
+            if len(pending) >= window:
+                emit(pending.popleft().result())
+        while pending:
+            emit(pending.popleft().result())
+    output.flush()
+    summary["seconds"] = time.perf_counter() - started
+    summary["per_second"] = summary["requests"] / summary["seconds"] if summary["seconds"] else None
+    return summary
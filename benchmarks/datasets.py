@@ -0,0 +1,139 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+# Генерация каталога в форме Sakila (film, category, film_category, actor, film_actor)
+# и лога поисковых запросов заданного масштаба. Генерация детерминирована (seed).
+
+GENRES = ["Action", "Animation", "Children", "Classics", "Comedy", "Documentary", "Drama", "Family",
+          "Foreign", "Games", "Horror", "Music", "New", "Sci-Fi", "Sports", "Travel"]
+
+WORDS = ["ACADEMY", "ACE", "ADAPTATION", "AFFAIR", "AFRICAN", "AGENT", "AIRPLANE", "ALABAMA", "ALADDIN",
+         "ALAMO", "ALASKA", "ALI", "ALLEY", "ALTER", "AMADEUS", "AMELIE", "AMERICAN", "ANACONDA", "ANGELS",
+         "ANNIE", "ANONYMOUS", "ANTHEM", "ANTITRUST", "ANYTHING", "APACHE", "APOCALYPSE", "ARABIA", "ARACHNOPHOBIA",
+         "ARGONAUTS", "ARIZONA", "ARK", "ARMAGEDDON", "ARMY", "ATLANTIS", "ATTACKS", "BABY", "BACKLASH", "BADMAN",
+         "BAKED", "BALLOON", "BANG", "BARBARELLA", "BEACH", "BEAR", "BEAUTY", "BED", "BEDAZZLED", "BEHAVIOR",
+         "BENEATH", "BERETS", "BETRAYED", "BEVERLY", "BIKINI", "BILKO", "BIRCH", "BIRDS", "BLADE", "BLANKET",
+         "BLINDNESS", "BLOOD", "BLUES", "BOILED", "BONNIE", "BOOGIE", "BORN", "BORROWERS", "BOULEVARD", "BOUND",
+         "BOWFINGER", "BRANNIGAN", "BRAVEHEART", "BREAKFAST", "BRIDE", "BRINGING", "BROOKLYN", "BROTHERHOOD",
+         "BUBBLE", "BUCKET", "BUGSY", "BULL", "BUNCH", "BUTCH", "CABIN", "CADDYSHACK", "CALENDAR", "CALIFORNIA",
+         "CAMELOT", "CAMPUS", "CANDIDATE", "CANDLES", "CANYON", "CAPER", "CARIBBEAN", "CAROL", "CARRIE", "CASABLANCA",
+         "CASPER", "CASSIDY", "CASUALTIES", "CAT", "CATCH", "CAUSE", "CELEBRITY", "CENTER", "CHAINSAW", "CHAMBER",
+         "CHAMPION", "CHANCE", "CHAPLIN", "CHARADE", "CHARIOTS", "CHASING", "CHEAPER", "CHICAGO", "CHICKEN",
+         "CHINATOWN", "CHOCOLAT", "CHRISTMAS", "CIDER", "CINCINATTI", "CIRCUS", "CITIZEN", "CLASH", "CLEOPATRA",
+         "CLERKS", "CLOCKWORK", "CLONES", "CLOSER", "CLUB", "CLUE", "CLUELESS", "CLYDE", "COAST", "COLDBLOODED",
+         "COLOR", "COMANCHEROS", "COMFORTS", "COMMAND", "CONEHEADS", "CONFESSIONS", "CONFIDENTIAL", "CONGENIALITY",
+         "CONNECTICUT", "CONNECTION", "CONQUERER", "CONSPIRACY", "CONTACT", "CONTROL", "CONVERSATION", "CORE",
+         "DINOSAUR", "GOLDFINGER", "HUNTER", "FOREVER", "EGG", "IGBY", "JUMANJI", "KANE", "LADYBUGS", "MADNESS"]
+
+FIRST_NAMES = ["PENELOPE", "NICK", "ED", "JENNIFER", "JOHNNY", "BETTE", "GRACE", "MATTHEW", "JOE", "CHRISTIAN",
+               "ZERO", "KARL", "UMA", "VIVIEN", "CUBA", "FRED", "HELEN", "DAN", "BOB", "LUCILLE", "KIRSTEN",
+               "ELVIS", "SANDRA", "CAMERON", "KEVIN", "RIP", "JULIA", "WOODY", "ALEC", "SISSY", "TIM", "MILLA"]
+
+LAST_NAMES = ["GUINESS", "WAHLBERG", "CHASE", "DAVIS", "LOLLOBRIGIDA", "NICHOLSON", "MOSTEL", "JOHANSSON",
+              "SWANK", "GABLE", "CAGE", "BERRY", "WOOD", "BERGEN", "OLIVIER", "COSTNER", "VOIGHT", "TORN",
+              "FAWCETT", "TRACY", "PALTROW", "MARX", "KILMER", "STREEP", "BLOOM", "CRAWFORD", "MCQUEEN", "HOFFMAN",
+              "WAYNE", "PECK", "SOBIESKI", "HACKMAN", "PESCI", "DEAN", "DUKAKIS", "BOLGER", "FONDA", "ZELLWEGER"]
+
+_SCHEMA = """
+CREATE TABLE film (film_id INTEGER PRIMARY KEY, title TEXT NOT NULL, description TEXT,
+                   release_year INTEGER, last_update TEXT NOT NULL);
+CREATE TABLE category (category_id INTEGER PRIMARY KEY, name TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE film_category (film_id INTEGER NOT NULL, category_id INTEGER NOT NULL, last_update TEXT NOT NULL,
+                            PRIMARY KEY (film_id, category_id));
+CREATE TABLE actor (actor_id INTEGER PRIMARY KEY, first_name TEXT NOT NULL, last_name TEXT NOT NULL,
+                    last_update TEXT NOT NULL);
+CREATE TABLE film_actor (actor_id INTEGER NOT NULL, film_id INTEGER NOT NULL, last_update TEXT NOT NULL,
+                         PRIMARY KEY (actor_id, film_id));
+CREATE INDEX idx_title ON film (title);
+CREATE INDEX idx_fk_category_id ON film_category (category_id);
+CREATE INDEX idx_fk_film_id ON film_actor (film_id);
+CREATE INDEX idx_actor_last_name ON actor (last_name);
+"""
+
+
+def _chunks(rows, size=50000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_catalog(path, films, actors_per_film=5, seed=42):
+    """
+    Создаёт каталог в файле SQLite: films фильмов, films // 5 актёров (не меньше 200),
+    по одному жанру и actors_per_film актёров на фильм. Строки вставляются пачками.
+    :return: {таблица: число строк}
+    """
+    rng = random.Random(seed)
+    actors = max(200, films // 5)
+    updated = "2006-02-15 05:03:42"
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.executescript(_SCHEMA)
+    connection.execute("BEGIN")
+    connection.executemany("INSERT INTO category VALUES (?, ?, ?)",
+                           [(i, name, updated) for i, name in enumerate(GENRES, 1)])
+    for chunk in _chunks((i, f"{rng.choice(FIRST_NAMES)}", f"{rng.choice(LAST_NAMES)}", updated)
+                         for i in range(1, actors + 1)):
+        connection.executemany("INSERT INTO actor VALUES (?, ?, ?, ?)", chunk)
+    for chunk in _chunks((i, f"{rng.choice(WORDS)} {rng.choice(WORDS)}", "A Epic Story",
+                          rng.randint(1990, 2025), updated) for i in range(1, films + 1)):
+        connection.executemany("INSERT INTO film VALUES (?, ?, ?, ?, ?)", chunk)
+    for chunk in _chunks((i, rng.randint(1, len(GENRES)), updated) for i in range(1, films + 1)):
+        connection.executemany("INSERT INTO film_category VALUES (?, ?, ?)", chunk)
+    pairs = ((actor_id, film_id, updated) for film_id in range(1, films + 1)
+             for actor_id in rng.sample(range(1, actors + 1), min(actors_per_film, actors)))
+    for chunk in _chunks(pairs):
+        connection.executemany("INSERT INTO film_actor VALUES (?, ?, ?)", chunk)
+    connection.execute("COMMIT")
+    connection.execute("ANALYZE")
+    connection.close()
+    return {"film": films, "category": len(GENRES), "film_category": films,
+            "actor": actors, "film_actor": films * min(actors_per_film, actors)}
+
+
+def query_mix(count, seed=7):
+    """
+    Поисковые запросы с распределением, близким к реальному: популярные
+    значения повторяются чаще (распределение Ципфа по словарю).
+    """
+    rng = random.Random(seed)
+
+    def zipf_choice(values):
+        # Индекс с вероятностью ~ 1 / (rank + 1)
+        weights = [1 / (rank + 1) for rank in range(len(values))]
+        return rng.choices(values, weights)[0]
+
+    queries = []
+    for _ in range(count):
+        kind = rng.choices(["by title", "by genre and years", "by actor"], [5, 3, 2])[0]
+        if kind == "by title":
+            word = zipf_choice(WORDS)
+            queries.append((kind, {"title": word[:rng.randint(3, len(word))]}))
+        elif kind == "by genre and years":
+            year_from = rng.randint(1990, 2020)
+            queries.append((kind, {"genre": zipf_choice(GENRES), "from": year_from,
+                                   "to": rng.randint(year_from, 2025)}))
+        else:
+            queries.append((kind, {"actor": f"{zipf_choice(FIRST_NAMES)} {zipf_choice(LAST_NAMES)}"}))
+    return queries
+
+
+def log_entries(count, seed=11, days=30):
+    """Записи лога поиска в формате LogSearch (параметры нормализованы)."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    step = timedelta(days=days) / max(count, 1)
+    for i, (search_type, parameters) in enumerate(query_mix(count, seed)):
+        normalized = {key: value.strip().lower() if isinstance(value, str) else value
+                      for key, value in sorted(parameters.items())}
+        yield {
+            "search_type": search_type,
+            "parameters": normalized,
+            "result_count": rng.randint(0, 200),
+            "timestamp": start + step * i,
+        }
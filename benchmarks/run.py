@@ -0,0 +1,348 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from tabulate import tabulate
+
+from benchmarks.datasets import build_catalog, log_entries, query_mix
+from benchmarks.standins import mongo_client, sqlite_connect
+from db_connector import DBConnector
+from film_query import FilmQuery
+from log_stats import LogStats
+from log_writer import LogSearch
+from result_cache import ResultCache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Запуск: python -m benchmarks.run run --films 10000 --log-entries 100000 --out result.json
+# Сравнение: python -m benchmarks.run compare base.json result.json
+
+DB_VARIANTS = ("sql", "title_index", "actor_index", "cache", "snapshot", "compact")
+STATS_METHODS = ("get_popular", "get_popular_genre", "get_popular_films_by_title", "get_popular_actors",
+                 "get_latest", "dashboard")
+# Замеры, которые нельзя выполнить на mongomock: конвейеры по сырому логу используют $reduce
+IN_PROCESS_SKIPPED = {"stats.get_latest[raw]": "mongomock не поддерживает $reduce",
+                      "stats.dashboard[raw]": "mongomock не поддерживает $reduce"}
+# Методы поиска, которые нельзя выполнить на SQLite: MATCH ... AGAINST есть только в MySQL
+SQLITE_SKIPPED = {"search_by_keyword": "полнотекстовый поиск требует MySQL (FULLTEXT-индекс film_text)"}
+
+
+def peak_rss_kb():
+    """Пиковый RSS процесса в КБ (None, если недоступно)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux — килобайты
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def summarize(samples, rows, elapsed):
+    """Перцентили задержки (мс), пропускная способность и число строк."""
+    samples = sorted(samples)
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] / 1e6
+
+    return {
+        "calls": len(samples),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": samples[-1] / 1e6,
+        "mean_ms": sum(samples) / len(samples) / 1e6,
+        "throughput_ops": len(samples) / elapsed if elapsed else None,
+        "rows": rows,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def measure(func, calls):
+    """Вызывает func(*args) для каждого набора аргументов и собирает задержки."""
+    samples, rows = [], 0
+    started = time.perf_counter()
+    try:
+        for args in calls:
+            call_started = time.perf_counter_ns()
+            result = func(*args)
+            samples.append(time.perf_counter_ns() - call_started)
+            rows += len(result) if isinstance(result, list) else 0
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return summarize(samples, rows, time.perf_counter() - started)
+
+
+def db_calls(queries):
+    """Аргументы методов DBConnector из смеси запросов."""
+    titles = [(p["title"],) for kind, p in queries if kind == "by title"]
+    genres = [(p["genre"], p["from"], p["to"]) for kind, p in queries if kind == "by genre and years"]
+    actors = [(p["actor"].split()[0],) for kind, p in queries if kind == "by actor"]
+    # Составной поиск: название с жанром и годами, актёр с жанром
+    films = [(FilmQuery(title, genre, year_from, year_to),) for (title,), (genre, year_from, year_to)
+             in zip(titles, genres)]
+    films += [(FilmQuery(genre=genre, actor=actor),) for (actor,), (genre, _, _) in zip(actors, genres)]
+    return {
+        "search_by_title": titles,
+        "search_by_genre": [(genre,) for genre, _, _ in genres],
+        "search_by_year_range": [(year_from, year_to) for _, year_from, year_to in genres],
+        "search_by_genre_and_years": genres,
+        "search_by_actor": actors,
+        "search_films": films,
+        "search_by_keyword": titles,
+    }
+
+
+def make_db(variant, connect, workdir):
+    if variant == "sql":
+        return DBConnector(connect=connect)
+    if variant == "title_index":
+        return DBConnector(title_index=True, connect=connect)
+    if variant == "actor_index":
+        return DBConnector(actor_index=True, connect=connect)
+    if variant == "cache":
+        return DBConnector(cache=ResultCache(max_size=10000, ttl=3600), connect=connect)
+    if variant == "compact":
+        return DBConnector(row_format="tuple", connect=connect)
+    if variant == "snapshot":
+        path = os.path.join(workdir, "catalog.snapshot")
+        source = DBConnector(connect=connect)
+        try:
+            source.sync_snapshot(path)
+        finally:
+            source.close()
+        return DBConnector(snapshot=path, connect=connect)
+    raise ValueError(f"Неизвестный вариант {variant}")
+
+
+def bench_db(variants, connect, queries, workdir, page_size, skipped=None):
+    results = {}
+    calls = db_calls(queries)
+    for variant in variants:
+        db = make_db(variant, connect, workdir)
+        for method, method_calls in calls.items():
+            if not method_calls:
+                continue
+            if skipped and method in skipped:
+                results[f"db.{method}[{variant}]"] = {"skipped": skipped[method]}
+                continue
+            search = getattr(db, method)
+            results[f"db.{method}[{variant}]"] = measure(lambda *a: search(*a, limit=page_size), method_calls)
+            results[f"db.count.{method}[{variant}]"] = measure(lambda *a: db.count(search, *a), method_calls)
+        results[f"db.get_all_genres[{variant}]"] = measure(db.get_all_genres, [()] * 50)
+        db.close()
+    return results
+
+
+def bench_row_memory(connect, rows):
+    """
+    Память, которую занимает результат поиска из rows строк, в словарях и в rows.Row
+    (tracemalloc: всё, что выделено под результат и ещё не освобождено).
+    """
+    results = {}
+    for row_format in ("dict", "tuple"):
+        db = DBConnector(row_format=row_format, connect=connect)
+        # Соединение и служебные структуры создаются до замера
+        db.search_by_year_range(0, 9999, limit=1)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        result = db.search_by_year_range(0, 9999, limit=rows)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[f"rows.memory[{row_format}]"] = {
+            "rows": len(result),
+            "bytes": allocated,
+            "bytes_per_row": allocated / len(result) if result else None,
+        }
+        del result
+        db.close()
+    dict_bytes = results["rows.memory[dict]"]["bytes_per_row"]
+    tuple_bytes = results["rows.memory[tuple]"]["bytes_per_row"]
+    if dict_bytes and tuple_bytes:
+        results["rows.memory[tuple]"]["saving"] = 1 - tuple_bytes / dict_bytes
+    return results
+
+
+def bench_stats(logger, iterations, skipped=None):
+    results = {}
+    for mode, use_counters in (("counters", True), ("raw", False)):
+        stats = LogStats(logger, use_counters=use_counters)
+        for method in STATS_METHODS:
+            name = f"stats.{method}[{mode}]"
+            if skipped and name in skipped:
+                results[name] = {"skipped": skipped[name]}
+                continue
+            results[name] = measure(getattr(stats, method), [(5,)] * iterations)
+    return results
+
+
+def make_logger(client, database, collection, **kwargs):
+    """LogSearch с коллекциями бенчмарка вместо заданных в окружении."""
+    logger = LogSearch(client=client, **kwargs)
+    db = client[database]
+    logger.db = db
+    logger.collection = db[collection]
+    logger.popularity = db[f"{collection}_popularity"]
+    logger.recent = db[f"{collection}_recent"]
+    return logger
+
+
+def bench_log_writes(client, database, entries):
+    results = {}
+    queries = query_mix(entries, seed=13)
+    for mode, buffered in (("sync", False), ("buffered", True)):
+        logger = make_logger(client, database, "bench_writes", buffered=buffered)
+        results[f"log.log_search[{mode}]"] = measure(
+            lambda kind, parameters: logger.log_search(kind, parameters, 0) or [], queries)
+        logger.close()
+        results[f"log.log_search[{mode}]"]["counters"] = logger.counters()
+    return results
+
+
+def load_log(logger, count, chunk=10000):
+    batch = []
+    for entry in log_entries(count):
+        batch.append(entry)
+        if len(batch) >= chunk:
+            logger.collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        logger.collection.insert_many(batch, ordered=False)
+    logger.rebuild_popularity()
+    logger.rebuild_recent()
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="film-bench-")
+    report = {
+        "meta": {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "films": args.films,
+            "log_entries": args.log_entries,
+            "queries": args.queries,
+            "mysql": "env" if args.mysql else "sqlite",
+            "mongo": args.mongo_uri or "in-process",
+        },
+        "results": {},
+    }
+    queries = query_mix(args.queries)
+
+    if args.mysql:
+        connect = None  # DBConnector подключается по переменным окружения
+    else:
+        path = os.path.join(workdir, "catalog.sqlite3")
+        if os.path.exists(path):
+            os.remove(path)
+        started = time.perf_counter()
+        report["meta"]["catalog"] = build_catalog(path, args.films)
+        report["meta"]["catalog_build_s"] = time.perf_counter() - started
+        connect = sqlite_connect(path)
+    report["results"].update(bench_db(args.variants, connect, queries, workdir, args.page_size,
+                                      None if args.mysql else SQLITE_SKIPPED))
+    report["results"].update(bench_row_memory(connect, args.memory_rows))
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    else:
+        client = mongo_client()
+    client.drop_database(args.mongo_db)
+    logger = make_logger(client, args.mongo_db, "log_search")
+    started = time.perf_counter()
+    load_log(logger, args.log_entries)
+    report["meta"]["log_load_s"] = time.perf_counter() - started
+    report["results"].update(bench_stats(logger, args.stats_iterations,
+                                         None if args.mongo_uri else IN_PROCESS_SKIPPED))
+    report["results"].update(bench_log_writes(client, args.mongo_db, args.log_writes))
+    report["meta"]["peak_rss_kb"] = peak_rss_kb()
+    return report
+
+
+def compare(base, current, threshold):
+    """
+    Сравнивает два отчёта. Регрессия — рост p50/p99 или падение пропускной
+    способности больше чем на threshold (доля).
+    """
+    rows, regressions = [], []
+    for name, new in sorted(current["results"].items()):
+        old = base["results"].get(name)
+        if not old or "error" in old or "error" in new or "skipped" in old or "skipped" in new:
+            continue
+        for metric, higher_is_worse in (("p50_ms", True), ("p99_ms", True), ("throughput_ops", False)):
+            if not old.get(metric) or new.get(metric) is None:
+                continue
+            change = new[metric] / old[metric] - 1
+            worse = change > threshold if higher_is_worse else change < -threshold
+            rows.append([name, metric, f"{old[metric]:.3f}", f"{new[metric]:.3f}", f"{change:+.1%}",
+                         "REGRESSION" if worse else ""])
+            if worse:
+                regressions.append({"name": name, "metric": metric, "base": old[metric],
+                                    "current": new[metric], "change": change})
+    return rows, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки поиска фильмов и статистики логов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="сгенерировать данные и замерить все пути поиска и статистики")
+    run_parser.add_argument("--films", type=int, default=1000, help="число фильмов в каталоге")
+    run_parser.add_argument("--log-entries", type=int, default=10000, help="число записей в логе поиска")
+    run_parser.add_argument("--queries", type=int, default=200, help="число поисковых запросов в смеси")
+    run_parser.add_argument("--stats-iterations", type=int, default=20, help="повторов каждого метода LogStats")
+    run_parser.add_argument("--log-writes", type=int, default=2000, help="число записей в замере log_search")
+    run_parser.add_argument("--page-size", type=int, default=10, help="размер страницы поиска")
+    run_parser.add_argument("--memory-rows", type=int, default=1000,
+                            help="размер результата в замере памяти строк dict/tuple")
+    run_parser.add_argument("--variants", type=lambda value: value.split(","), default=list(DB_VARIANTS),
+                            help=f"варианты DBConnector через запятую: {','.join(DB_VARIANTS)}")
+    run_parser.add_argument("--mysql", action="store_true",
+                            help="использовать MySQL/MariaDB из переменных окружения DB_* вместо SQLite")
+    run_parser.add_argument("--mongo-uri", help="локальный MongoDB вместо MongoDB в памяти процесса")
+    run_parser.add_argument("--mongo-db", default="film_search_bench", help="база MongoDB для бенчмарка")
+    run_parser.add_argument("--workdir", help="каталог для временных файлов")
+    run_parser.add_argument("--out", help="файл для JSON-отчёта (по умолчанию stdout)")
+
+    compare_parser = commands.add_parser("compare", help="сравнить два отчёта и найти регрессии")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="допустимое ухудшение, доля (по умолчанию 0.2)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "run":
+        # Сообщения DBConnector/LogSearch не должны попадать в JSON на stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run(args)
+        output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as file:
+                file.write(output)
+        else:
+            print(output)
+        return 0
+    with open(args.base, encoding="utf-8") as file:
+        base = json.load(file)
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)
+    rows, regressions = compare(base, current, args.threshold)
+    print(tabulate(rows, headers=["benchmark", "metric", "base", "current", "change", ""]))
+    print(f"\nРегрессий: {len(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import re
+import sqlite3
+from datetime import datetime
+
+# Локальные заменители MySQL и MongoDB для бенчмарков и проверок без сети:
+# SQLiteConnection повторяет ту часть API pymysql, которой пользуется DBConnector,
+# mongo_client() возвращает MongoDB в памяти процесса (mongomock).
+
+_CONCAT = re.compile(r"CONCAT\(([^()]*)\)")
+_LAST_UPDATE = re.compile(r"(^|_)last_update$")
+
+
+def translate_sql(query):
+    """Переводит запросы DBConnector с диалекта MySQL на SQLite."""
+    query = _CONCAT.sub(lambda match: "(" + " || ".join(part.strip() for part in match.group(1).split(",")) + ")",
+                        query)
+    # В MySQL экранирующий символ LIKE по умолчанию — обратная косая черта
+    query = query.replace("LIKE %s", "LIKE %s ESCAPE '\\'")
+    return query.replace("%s", "?")
+
+
+class SQLiteCursor:
+    """
+    Курсор, возвращающий строки словарями, как pymysql DictCursor, или кортежами
+    (as_tuples), как pymysql Cursor и SSCursor.
+    """
+    def __init__(self, connection, as_tuples=False):
+        self._cursor = connection.cursor()
+        self.as_tuples = as_tuples
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate_sql(query), list(params or ()))
+        self.description = self._cursor.description
+        return self._cursor.rowcount
+
+    def _row(self, values):
+        if self.as_tuples:
+            return values
+        row = dict(zip((column[0] for column in self._cursor.description), values))
+        for column, value in row.items():
+            # pymysql возвращает DATETIME как datetime, SQLite — строкой
+            if isinstance(value, str) and _LAST_UPDATE.search(column):
+                row[column] = datetime.fromisoformat(value)
+        return row
+
+    def fetchone(self):
+        values = self._cursor.fetchone()
+        return None if values is None else self._row(values)
+
+    def fetchall(self):
+        return [self._row(values) for values in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(values) for values in self._cursor.fetchmany(size)]
+
+    def __iter__(self):
+        for values in self._cursor:
+            yield self._row(values)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Соединение с файлом SQLite с интерфейсом pymysql-соединения."""
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+
+    def cursor(self, cursor_class=None):
+        # Строки — словари для DictCursor и SSDictCursor, кортежи для Cursor и SSCursor
+        as_tuples = cursor_class is not None and "Dict" not in cursor_class.__name__
+        return SQLiteCursor(self._connection, as_tuples)
+
+    def ping(self, reconnect=False):
+        self._connection.execute("SELECT 1")
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._connection.close()
+
+
+def sqlite_connect(path):
+    """Фабрика соединений для DBConnector(connect=...)."""
+    return lambda: SQLiteConnection(path)
+
+
+def _with_bulk_write(collection):
+    """
+    Коллекция mongomock с bulk_write, совместимым с новыми версиями pymongo: bulk API
+    mongomock не принимает их аргументы (TypeError до выполнения операций), тогда
+    операции выполняются по одной.
+    """
+    native = collection.bulk_write
+
+    def bulk_write(requests, ordered=True, **kwargs):
+        requests = list(requests)
+        try:
+            return native(requests, ordered=ordered, **kwargs)
+        except TypeError:
+            names = {type(request).__name__ for request in requests}
+            if not names <= {"InsertOne", "UpdateOne", "UpdateMany", "ReplaceOne", "DeleteOne", "DeleteMany"}:
+                raise
+        for request in requests:
+            name = type(request).__name__
+            if name == "InsertOne":
+                collection.insert_one(request._doc)
+            elif name == "UpdateOne":
+                collection.update_one(request._filter, request._doc, upsert=request._upsert)
+            elif name == "UpdateMany":
+                collection.update_many(request._filter, request._doc, upsert=request._upsert)
+            elif name == "ReplaceOne":
+                collection.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif name == "DeleteOne":
+                collection.delete_one(request._filter)
+            else:
+                collection.delete_many(request._filter)
+
+    collection.bulk_write = bulk_write
+    return collection
+
+
+def mongo_client():
+    """
+    MongoDB в памяти процесса (нужен пакет mongomock). bulk_write подменяется только
+    у коллекций этого клиента, класс mongomock не меняется.
+    """
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("Для MongoDB в памяти установите mongomock: pip install -r requirements-dev.txt")
+    client = mongomock.MongoClient()
+    get_database = client.get_database
+
+    def database(*args, **kwargs):
+        db = get_database(*args, **kwargs)
+        if "get_collection" not in vars(db):
+            get_collection = db.get_collection
+            db.get_collection = lambda *args, **kwargs: _with_bulk_write(get_collection(*args, **kwargs))
+        return db
+
+    client.get_database = database
+    return client
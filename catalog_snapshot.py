@@ -0,0 +1,445 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+# Формат файла: MAGIC, длина заголовка (uint64), JSON-заголовок, затем колонки,
+# каждая выровнена по 8 байт. Целые колонки — массивы int32, строковые —
+# массив смещений int32 (n + 1) и общий UTF-8 блок. Колонки читаются через mmap
+# без разбора: процессы, открывшие один файл, делят страницы в памяти.
+MAGIC = b"FILMSNP1"
+VERSION = 1
+NULL_INT = -2 ** 31  # NULL в целой колонке (например, release_year)
+_SEPARATOR = b"\0"  # разделитель строк в колонках для поиска подстроки
+
+# Таблицы снимка: ключ, колонки (имя, тип) и колонки для поиска подстроки
+TABLES = {
+    "film": {
+        "key": ("film_id",),
+        "columns": (("film_id", "int"), ("title", "str"), ("release_year", "int")),
+        "search": {"title_lower": lambda row: row[1]},
+    },
+    "category": {
+        "key": ("category_id",),
+        "columns": (("category_id", "int"), ("name", "str")),
+        "search": {"name_lower": lambda row: row[1]},
+    },
+    "film_category": {
+        "key": ("film_id", "category_id"),
+        "columns": (("film_id", "int"), ("category_id", "int")),
+        "search": {},
+    },
+    "actor": {
+        "key": ("actor_id",),
+        "columns": (("actor_id", "int"), ("first_name", "str"), ("last_name", "str")),
+        "search": {"name_lower": lambda row: f"{row[1]} {row[2]}"},
+    },
+    "film_actor": {
+        "key": ("film_id", "actor_id"),
+        "columns": (("film_id", "int"), ("actor_id", "int")),
+        "search": {},
+    },
+}
+
+
+class _StrColumn:
+    """Строковая колонка поверх mmap: смещения + UTF-8 блок, строки декодируются по запросу."""
+    def __init__(self, buffer, offsets, blob_start, blob_size):
+        self._buffer = buffer
+        self.offsets = offsets
+        self.blob_start = blob_start
+        self.blob_end = blob_start + blob_size
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self._buffer[self.blob_start + self.offsets[i]:self.blob_start + self.offsets[i + 1]].decode()
+
+    def find_rows(self, needle, start=0):
+        """Номера строк (по возрастанию, начиная со start), содержащих needle; поиск прямо по mmap."""
+        if start >= len(self):
+            return
+        position = self.blob_start + self.offsets[start]
+        while True:
+            found = self._buffer.find(needle, position, self.blob_end)
+            if found < 0:
+                return
+            row = bisect_right(self.offsets, found - self.blob_start) - 1
+            if row >= len(self):
+                return
+            yield row
+            # Следующее совпадение ищем со следующей строки
+            position = self.blob_start + self.offsets[row + 1]
+
+
+def _pad(size):
+    return (-size) % 8
+
+
+def _int_bytes(values):
+    return array("i", (NULL_INT if value is None else value for value in values)).tobytes()
+
+
+def _str_bytes(values, separator=b""):
+    offsets = array("i", [0])
+    chunks = []
+    total = 0
+    for value in values:
+        encoded = value.encode() + separator
+        chunks.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+    return offsets.tobytes(), b"".join(chunks)
+
+
+def write_snapshot(path, tables, watermarks):
+    """
+    Записывает снимок атомарно (временный файл + os.replace),
+    открытые читатели продолжают видеть старую версию.
+    :param tables: {таблица: список строк-кортежей в порядке TABLES[таблица]["columns"]}
+    :param watermarks: {таблица: {"max_last_update": str | None, "rows": int}}
+    """
+    header = {"version": VERSION, "byteorder": sys.byteorder, "tables": {}}
+    segments = []
+
+    def add(data):
+        segments.append(data)
+
+    layout = []  # (таблица, колонка, описание, индексы сегментов)
+    for table, spec in TABLES.items():
+        rows = sorted(tables[table], key=lambda row: tuple(row[:len(spec["key"])]))
+        table_header = {"rows": len(rows), **watermarks.get(table, {}), "columns": {}}
+        header["tables"][table] = table_header
+        for i, (column, kind) in enumerate(spec["columns"]):
+            values = [row[i] for row in rows]
+            if kind == "int":
+                layout.append((table_header, column, {"kind": "int"}, [len(segments)]))
+                add(_int_bytes(values))
+            else:
+                offsets, blob = _str_bytes(values)
+                layout.append((table_header, column, {"kind": "str"}, [len(segments), len(segments) + 1]))
+                add(offsets)
+                add(blob)
+        for column, derive in spec["search"].items():
+            offsets, blob = _str_bytes((derive(row).lower() for row in rows), _SEPARATOR)
+            layout.append((table_header, column, {"kind": "str"}, [len(segments), len(segments) + 1]))
+            add(offsets)
+            add(blob)
+
+    # Смещения сегментов зависят от длины заголовка, поэтому считаем до стабилизации
+    header_size = 0
+    while True:
+        position = len(MAGIC) + 8 + header_size + _pad(header_size)
+        starts = []
+        for data in segments:
+            starts.append(position)
+            position += len(data) + _pad(len(data))
+        for table_header, column, description, indexes in layout:
+            description = dict(description)
+            description["offset"] = starts[indexes[0]]
+            description["size"] = len(segments[indexes[0]])
+            if len(indexes) == 2:
+                description["blob_offset"] = starts[indexes[1]]
+                description["blob_size"] = len(segments[indexes[1]])
+            table_header["columns"][column] = description
+        encoded = json.dumps(header).encode()
+        if len(encoded) == header_size:
+            break
+        header_size = len(encoded)
+
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(encoded)))
+        file.write(encoded + b"\0" * _pad(len(encoded)))
+        for data in segments:
+            file.write(data + b"\0" * _pad(len(data)))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def match_genre(genre, categories):
+    """
+    category_id жанра по справочнику {название в нижнем регистре: category_id}: точное
+    совпадение названия без учёта регистра, а если его нет — все жанры, содержащие genre
+    (как прежнее условие LIKE '%genre%'). Общее правило для MySQL и снимка каталога.
+    """
+    genre = genre.lower()
+    if genre in categories:
+        return [categories[genre]]
+    return sorted(category_id for name, category_id in categories.items() if genre in name)
+
+
+class CatalogSnapshot:
+    """
+    Снимок каталога (film, category, film_category, actor, film_actor) в файле,
+    отображённом в память. Методы поиска возвращают те же строки и в том же
+    порядке, что и одноимённые методы DBConnector.
+
+    Синхронизация в другом процессе подменяет файл целиком (os.replace), поэтому поиск
+    не чаще раза в check_interval секунд сверяет файл по stat и отображает новый.
+    """
+    def __init__(self, path, check_interval=None):
+        """
+        :param check_interval: как часто (в секундах) проверять, не заменён ли файл
+            (CATALOG_SNAPSHOT_CHECK_INTERVAL или 5; 0 — перед каждым поиском)
+        """
+        self.path = path
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv("CATALOG_SNAPSHOT_CHECK_INTERVAL", 5)))
+        self._checked = time.monotonic()
+        self._open()
+
+    def _open(self):
+        with open(self.path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(file.fileno())
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} не является снимком каталога")
+        (header_size,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(buffer[start:start + header_size])
+        if header["version"] != VERSION or header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Несовместимый формат снимка {self.path}")
+        view = memoryview(buffer)
+        tables = {}
+        for table, table_header in header["tables"].items():
+            columns = {}
+            for column, description in table_header["columns"].items():
+                numbers = view[description["offset"]:description["offset"] + description["size"]].cast("i")
+                if description["kind"] == "int":
+                    columns[column] = numbers
+                else:
+                    columns[column] = _StrColumn(buffer, numbers, description["blob_offset"], description["blob_size"])
+            tables[table] = columns
+        # Новый снимок подменяется целиком; начатые поиски дочитывают прежнее отображение
+        self._mmap, self._stat, self.header, self.tables = buffer, stat, header, tables
+        self._film_ids = tables["film"]["film_id"]
+
+    def refresh(self):
+        """Переоткрывает файл, если его заменила синхронизация. Возвращает True, если снимок обновился."""
+        self._checked = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == (self._stat.st_ino, self._stat.st_size,
+                                                             self._stat.st_mtime_ns):
+            return False
+        self._open()
+        return True
+
+    def _check(self):
+        """refresh() не чаще раза в check_interval секунд."""
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.refresh()
+
+    def table_rows(self, table):
+        """Все строки таблицы кортежами в порядке TABLES[table]["columns"] (используется при синхронизации)."""
+        columns = [self.tables[table][name] for name, _ in TABLES[table]["columns"]]
+        kinds = [kind for _, kind in TABLES[table]["columns"]]
+        rows = []
+        for i in range(self.header["tables"][table]["rows"]):
+            rows.append(tuple(
+                (None if column[i] == NULL_INT else column[i]) if kind == "int" else column[i]
+                for column, kind in zip(columns, kinds)
+            ))
+        return rows
+
+    # --- вспомогательные методы поиска ---
+
+    @staticmethod
+    def _needle(value):
+        return value.lower().encode()
+
+    @staticmethod
+    def _year(value):
+        return None if value == NULL_INT else value
+
+    def _film_position(self, film_id):
+        i = bisect_left(self._film_ids, film_id)
+        return i if i < len(self._film_ids) and self._film_ids[i] == film_id else None
+
+    def _film_start(self, after):
+        if after is None:
+            return 0
+        after_id = after[0] if isinstance(after, (tuple, list)) else after
+        return bisect_right(self._film_ids, after_id)
+
+    @staticmethod
+    def _pair_start(first, second, after):
+        """Первая позиция в таблице связей, отсортированной по (first, second), после ключа after."""
+        if after is None:
+            return 0
+        i = bisect_left(first, after[0])
+        while i < len(first) and first[i] == after[0] and second[i] <= after[1]:
+            i += 1
+        return i
+
+    def _category_ids(self, genre):
+        """category_id жанра по тому же правилу, что и DBConnector.category_ids (match_genre)."""
+        category = self.tables["category"]
+        names = category["name"]
+        categories = {names[i].lower(): category["category_id"][i] for i in range(len(category["category_id"]))}
+        return set(match_genre(genre, categories))
+
+    @staticmethod
+    def _page(rows, offset, limit):
+        return list(islice(rows, offset, offset + limit))
+
+    # --- генераторы строк результатов в порядке ключа пагинации ---
+
+    def _rows_by_title(self, name, after=None):
+        film = self.tables["film"]
+        for i in film["title_lower"].find_rows(self._needle(name), self._film_start(after)):
+            yield {"film_id": self._film_ids[i], "title": film["title"][i]}
+
+    def _rows_by_year_range(self, year_from=1990, year_to=2025, after=None):
+        film = self.tables["film"]
+        years = film["release_year"]
+        for i in range(self._film_start(after), len(self._film_ids)):
+            year = self._year(years[i])
+            if year is not None and year_from <= year <= year_to:
+                yield {"film_id": self._film_ids[i], "title": film["title"][i], "release_year": year}
+
+    def _rows_by_categories(self, category_ids, after=None, year_from=None, year_to=None):
+        film = self.tables["film"]
+        link = self.tables["film_category"]
+        film_ids, linked_ids = link["film_id"], link["category_id"]
+        for i in range(self._pair_start(film_ids, linked_ids, after), len(film_ids)):
+            if linked_ids[i] not in category_ids:
+                continue
+            position = self._film_position(film_ids[i])
+            if position is None:
+                continue
+            year = self._year(film["release_year"][position])
+            if year_from is not None and (year is None or not year_from <= year <= year_to):
+                continue
+            yield position, film_ids[i], linked_ids[i], year
+
+    def _rows_by_genre(self, genre, after=None):
+        film = self.tables["film"]
+        category_ids = self._category_ids(genre)
+        for position, film_id, category_id, year in self._rows_by_categories(category_ids, after):
+            yield {"film_id": film_id, "category_id": category_id,
+                   "title": film["title"][position], "release_year": year}
+
+    def _rows_by_genre_and_years(self, genre, year_from, year_to, after=None):
+        film = self.tables["film"]
+        category = self.tables["category"]
+        category_ids = self._category_ids(genre)
+        names = {category["category_id"][i]: category["name"][i] for i in range(len(category["name"]))
+                 if category["category_id"][i] in category_ids}
+        for position, film_id, category_id, year in self._rows_by_categories(category_ids, after,
+                                                                              year_from, year_to):
+            yield {"film_id": film_id, "category_id": category_id, "title": film["title"][position],
+                   "release_year": year, "genre": names[category_id]}
+
+    def _rows_by_actor(self, actor_name, after=None):
+        film = self.tables["film"]
+        actor = self.tables["actor"]
+        link = self.tables["film_actor"]
+        names = {}
+        for i in actor["name_lower"].find_rows(self._needle(actor_name)):
+            names[actor["actor_id"][i]] = f"{actor['first_name'][i]} {actor['last_name'][i]}"
+        film_ids, actor_ids = link["film_id"], link["actor_id"]
+        for i in range(self._pair_start(film_ids, actor_ids, after), len(film_ids)):
+            if actor_ids[i] not in names:
+                continue
+            position = self._film_position(film_ids[i])
+            if position is None:
+                continue
+            yield {"film_id": film_ids[i], "actor_id": actor_ids[i], "title": film["title"][position],
+                   "release_year": self._year(film["release_year"][position]),
+                   "actor_name": names[actor_ids[i]]}
+
+    # --- API, совпадающее с DBConnector ---
+
+    def search_by_title(self, name, offset=0, limit=10, after=None):
+        self._check()
+        return self._page(self._rows_by_title(name, after), offset, limit)
+
+    def search_by_genre(self, genre, offset=0, limit=10, after=None):
+        self._check()
+        return self._page(self._rows_by_genre(genre, after), offset, limit)
+
+    def search_by_year_range(self, year_from=1990, year_to=2025, offset=0, limit=10, after=None):
+        self._check()
+        return self._page(self._rows_by_year_range(year_from, year_to, after), offset, limit)
+
+    def search_by_genre_and_years(self, genre, year_from, year_to, offset=0, limit=10, after=None):
+        self._check()
+        return self._page(self._rows_by_genre_and_years(genre, year_from, year_to, after), offset, limit)
+
+    def search_by_actor(self, actor_name, offset=0, limit=10, after=None):
+        self._check()
+        return self._page(self._rows_by_actor(actor_name, after), offset, limit)
+
+    def get_all_genres(self):
+        self._check()
+        names = self.tables["category"]["name"]
+        return list(dict.fromkeys(names[i] for i in range(len(names))))
+
+    def rows(self, search_name, *args):
+        """Все результаты метода поиска search_name по порядку ключа — генератор без LIMIT."""
+        self._check()
+        return getattr(self, search_name.replace("search_", "_rows_", 1))(*args)
+
+    def count(self, search_name, *args):
+        """Количество результатов метода поиска search_name (например, "search_by_title")."""
+        return sum(1 for _ in self.rows(search_name, *args))
+
+
+def _table_query(table):
+    columns = ", ".join(name for name, _ in TABLES[table]["columns"])
+    return f"SELECT {columns} FROM {table}"
+
+
+def sync_snapshot(connection, path):
+    """
+    Создаёт снимок каталога или обновляет его инкрементально по last_update:
+    из MySQL читаются только строки, изменённые с момента прошлой синхронизации.
+    Если число строк не сходится (были удаления), таблица перечитывается целиком.
+    :param connection: соединение pymysql с DictCursor
+    :return: {таблица: число прочитанных из MySQL строк}
+    """
+    previous = CatalogSnapshot(path) if os.path.exists(path) else None
+    tables, watermarks, fetched = {}, {}, {}
+    with connection.cursor() as cursor:
+        for table, spec in TABLES.items():
+            names = [name for name, _ in spec["columns"]]
+            cursor.execute(f"SELECT COUNT(*) AS total, MAX(last_update) AS max_last_update FROM {table}")
+            state = cursor.fetchone()
+            max_last_update = state["max_last_update"].isoformat() if state["max_last_update"] else None
+            watermarks[table] = {"max_last_update": max_last_update, "rows": state["total"]}
+            old = previous.header["tables"].get(table) if previous else None
+            rows = None
+            if old is not None and old.get("max_last_update"):
+                key_size = len(spec["key"])
+                merged = {row[:key_size]: row for row in previous.table_rows(table)}
+                if old["max_last_update"] == max_last_update and old["rows"] == state["total"]:
+                    changed = []
+                else:
+                    # >= : строки, изменённые в ту же секунду, что и прошлая синхронизация
+                    cursor.execute(f"{_table_query(table)} WHERE last_update >= %s", (old["max_last_update"],))
+                    changed = cursor.fetchall()
+                for row in changed:
+                    values = tuple(row[name] for name in names)
+                    merged[values[:key_size]] = values
+                if len(merged) == state["total"]:
+                    rows = list(merged.values())
+                    fetched[table] = len(changed)
+            if rows is None:
+                cursor.execute(_table_query(table))
+                rows = [tuple(row[name] for name in names) for row in cursor.fetchall()]
+                fetched[table] = len(rows)
+            tables[table] = rows
+    write_snapshot(path, tables, watermarks)
+    return fetched
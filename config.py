@@ -0,0 +1,31 @@
+import os
+
+_loaded = False
+
+
+def _find_env_file():
+    """Ищет .env в каталоге проекта и выше — так же, как load_dotenv() из модуля проекта."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def load_env():
+    """
+    Загружает переменные окружения из .env один раз на процесс.
+    Модули, читающие настройки при импорте, вызывают её перед os.getenv.
+    Без файла .env пакет python-dotenv не импортируется вовсе.
+    """
+    global _loaded
+    if not _loaded:
+        path = _find_env_file()
+        if path:
+            from dotenv import load_dotenv
+            load_dotenv(path)
+        _loaded = True
@@ -1,29 +1,304 @@
 import os
-import pymysql
-from pymysql.cursors import DictCursor
-from dotenv import load_dotenv
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from itertools import count as _counter
+
+from actor_index import ActorNameIndex
+from catalog_snapshot import CatalogSnapshot, match_genre, sync_snapshot
+from config import load_env
+from db_pool import ConnectionPool
+from metrics import METRICS, instrumented
+from pagination import KeysetPages, OffsetPages
+from result_cache import cached, make_key
+from rows import compact_rows, make_rows
+from title_index import TrigramIndex
 
 # Загружаем переменные окружения из .env
-load_dotenv()
+load_env()
+
+
+def like_pattern(value):
+    """Шаблон LIKE для поиска подстроки: спецсимволы % и _ экранируются."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# Коды ошибок MySQL-клиента о потере соединения с сервером
+_DISCONNECT_CODES = {0, 2006, 2013, 2014, 2045, 2055}
+
+# Колонки результата методов поиска (заголовок выгрузки пустого результата)
+RESULT_COLUMNS = {
+    "search_by_title": ("film_id", "title"),
+    "search_by_genre": ("film_id", "category_id", "title", "release_year"),
+    "search_by_year_range": ("film_id", "title", "release_year"),
+    "search_by_genre_and_years": ("film_id", "category_id", "title", "release_year", "genre"),
+    "search_by_actor": ("film_id", "actor_id", "title", "release_year", "actor_name"),
+    "search_films": ("film_id", "title", "release_year"),
+    "search_by_keyword": ("film_id", "title", "release_year", "score"),
+}
+
+# Ключи пагинации поиска по актёру: через LIKE и по actor_id из индекса имён
+_ACTOR_KEY = ("f.film_id", "a.actor_id")
+_ACTOR_IDS_KEY = ("fa.film_id", "fa.actor_id")
+
+
+def _mysql_errors():
+    """
+    Классы ошибок соединения pymysql. pymysql импортируется при первом обращении
+    к MySQL, а не при запуске программы.
+    """
+    from pymysql.err import InterfaceError, OperationalError
+    return OperationalError, InterfaceError
+
+
+def _is_disconnect(error):
+    """Ошибка означает разрыв соединения, и запрос можно повторить на новом."""
+    from pymysql.err import InterfaceError
+    return isinstance(error, InterfaceError) or (error.args and error.args[0] in _DISCONNECT_CODES)
+
+
+def _keyset_condition(key_columns, after):
+    """
+    Условие "строка идёт после ключа after" для составного ключа пагинации:
+    (k1 > a1) OR (k1 = a1 AND k2 > a2) ...
+    """
+    if not isinstance(after, (tuple, list)):
+        after = (after,)
+    clauses, params = [], []
+    for i, column in enumerate(key_columns):
+        parts = [f"{previous} = %s" for previous in key_columns[:i]] + [f"{column} > %s"]
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(after[:i])
+        params.append(after[i])
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+# Режимы полнотекстового поиска MATCH ... AGAINST
+FULLTEXT_MODES = {"natural": "IN NATURAL LANGUAGE MODE", "boolean": "IN BOOLEAN MODE"}
+# Где искать ключевые слова: колонки film_text под FULLTEXT-индексом
+FULLTEXT_FIELDS = {"title": ("title",), "title_description": ("title", "description")}
+
+# Номера подготовленных на сервере запросов: имена уникальны в пределах процесса
+_statement_numbers = _counter(1)
+
+
+def in_condition(column, values):
+    """Условие column IN (...) по списку значений; пустой список не совпадает ни с чем."""
+    if not values:
+        return "FALSE"
+    return f"{column} IN ({', '.join(['%s'] * len(values))})"
+
 
 class DBConnector:
     """
     Класс для подключения и взаимодействия с базой данных MySQL.
     Все методы возвращают результат SQL-запросов.
     """
-    def __init__(self):
+    def __init__(self, title_index=False, min_size=None, max_size=None, retries=1, cache=None, snapshot=None,
+                 actor_index=False, connect=None, metrics=None, lazy=None, prepared=None, row_format=None):
+        """
+        :param title_index: построить (при первом поиске) триграммный индекс названий в памяти,
+            чтобы search_by_title не обращался к MySQL
+        :param min_size: минимальный размер пула соединений (по умолчанию DB_POOL_MIN или 1)
+        :param max_size: максимальный размер пула соединений (по умолчанию DB_POOL_MAX или 5)
+        :param retries: сколько раз повторить запрос при потере соединения
+        :param cache: кэш результатов поиска (ResultCache) или None
+        :param snapshot: путь к снимку каталога (catalog_snapshot) или CatalogSnapshot;
+            поиск тогда выполняется по снимку без обращения к MySQL
+        :param actor_index: искать актёров через индекс имён в памяти (префикс, подстрока,
+            опечатки) и выбирать фильмы по actor_id
+        :param connect: функция, открывающая соединение (по умолчанию pymysql по переменным окружения)
+        :param metrics: реестр замеров запросов (по умолчанию общий metrics.METRICS)
+        :param lazy: не подключаться в конструкторе — соединение и индексы создаются
+            при первом запросе (по умолчанию DB_LAZY или 1); connect() подключает сразу
+        :param prepared: выполнять поисковые запросы как подготовленные на сервере
+            (PREPARE/EXECUTE, по умолчанию DB_PREPARED или 0); только для соединений pymysql
+        :param row_format: вид строк результата поиска: "dict" — словари, "tuple" — компактные
+            кортежи rows.Row с доступом по имени колонки (по умолчанию DB_ROW_FORMAT или dict)
+        """
+        self._title_index = None
+        self._actor_index = None
+        self._pool = None
+        self._init_lock = threading.RLock()
+        self._pool_options = {
+            "min_size": min_size if min_size is not None else int(os.getenv("DB_POOL_MIN", 1)),
+            "max_size": max_size if max_size is not None else int(os.getenv("DB_POOL_MAX", 5)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        }
+        self._connect_function = connect or self._connect
+        # pymysql не поддерживает бинарный протокол, поэтому текст запроса готовится
+        # SQL-командой PREPARE один раз на соединение, а выполняется через EXECUTE
+        if prepared is None:
+            prepared = connect is None and os.getenv("DB_PREPARED", "0") == "1"
+        self.prepared = prepared
+        self.prepared_max = int(os.getenv("DB_PREPARED_MAX", 64))
+        row_format = row_format or os.getenv("DB_ROW_FORMAT", "dict")
+        if row_format not in ("dict", "tuple"):
+            raise ValueError(f"Неизвестный формат строк {row_format!r}: ожидается dict или tuple")
+        self.row_format = row_format
+        # Колонки FULLTEXT-индексов film_text (читаются при первом полнотекстовом поиске)
+        self._fulltext_indexes = None
+        # Справочник жанров: название в нижнем регистре -> category_id
+        self._categories = None
+        # Время двух фаз поиска по актёру через индекс: поиск actor_id и выборка фильмов
+        # (потоки пула обновляют их под блокировкой; "last" — замер последнего вызова)
+        self.actor_timings = {"lookups": 0, "resolve_seconds": 0.0, "fetch_seconds": 0.0, "last": None}
+        self._actor_timings_lock = threading.Lock()
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else METRICS
+        self.snapshot = CatalogSnapshot(snapshot) if isinstance(snapshot, str) else snapshot
+        self.retries = retries
+        # Снимку MySQL нужен только для синхронизации, индексы тогда не строятся
+        self._want_title_index = title_index and self.snapshot is None
+        self._want_actor_index = actor_index and self.snapshot is None
+        if lazy is None:
+            lazy = os.getenv("DB_LAZY", "1") == "1"
+        if not lazy and self.snapshot is None:
+            self.connect()
+
+    def connect(self):
+        """
+        Подключается сразу: открывает min_size соединений пула и строит индексы в памяти.
+        Без вызова всё это происходит при первом запросе.
+        :return: True, если подключение удалось
+        """
+        from pymysql import MySQLError
         try:
-            self.connection = pymysql.connect(
-                host=os.getenv("DB_HOST"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-                database=os.getenv("DB_NAME"),
-                cursorclass=DictCursor,
-            )
+            self.pool.fill()
             print("Подключение к БД установлено")
-        except pymysql.MySQLError as e:
+        except MySQLError as e:
+            # Пул переподключится при первом запросе
             print("Ошибка подключения к базе данных:", e)
-            self.connection = None   # чтобы не было обращения к несуществующему connection
+            return False
+        # Запрошенные индексы в памяти строятся сразу, а не при первом поиске
+        self._build_once("_want_title_index", self.build_title_index, "названий")
+        self._build_once("_want_actor_index", self.build_actor_index, "имён актёров")
+        return True
+
+    @property
+    def pool(self):
+        """Пул соединений; создаётся при первом обращении."""
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(self._connect_function, disconnect_errors=_mysql_errors(),
+                                                **self._pool_options)
+        return self._pool
+
+    @property
+    def title_index(self):
+        """Триграммный индекс названий; строится при первом обращении, если запрошен."""
+        self._build_once("_want_title_index", self.build_title_index, "названий")
+        return self._title_index
+
+    @title_index.setter
+    def title_index(self, index):
+        self._title_index = index
+
+    @property
+    def actor_index(self):
+        """Индекс имён актёров; строится при первом обращении, если запрошен."""
+        self._build_once("_want_actor_index", self.build_actor_index, "имён актёров")
+        return self._actor_index
+
+    @actor_index.setter
+    def actor_index(self, index):
+        self._actor_index = index
+
+    def _build_once(self, wanted, build, description):
+        """
+        Строит индекс, если он запрошен флагом wanted и ещё не строился.
+        Одна попытка: при ошибке поиск идёт через MySQL.
+        """
+        if getattr(self, wanted):
+            with self._init_lock:
+                if getattr(self, wanted):
+                    setattr(self, wanted, False)
+                    try:
+                        build()
+                    except Exception as e:
+                        print(f"Не удалось построить индекс {description}: {e}")
+
+    @staticmethod
+    def _connect():
+        """Открывает новое соединение с MySQL по переменным окружения."""
+        import pymysql
+        from pymysql.cursors import DictCursor
+        return pymysql.connect(
+            host=os.getenv("DB_HOST"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME"),
+            cursorclass=DictCursor,
+            # Без autocommit долгоживущее соединение из пула видело бы старый снимок данных
+            autocommit=True,
+        )
+
+    def _run(self, operation):
+        """
+        Выполняет operation(connection) на соединении из пула.
+        При потере соединения (например, после idle timeout MySQL) повторяет на новом.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                with self.pool.connection() as connection:
+                    return operation(connection)
+            except _mysql_errors() as e:
+                if attempt == self.retries or not _is_disconnect(e):
+                    raise
+
+    def _execute(self, query, params=(), cursor_class=None, one=False, name="execute", prepared=False,
+                 compact=False):
+        """
+        Выполняет запрос и возвращает все строки (или одну при one=True).
+        :param name: имя операции в замерах (metrics)
+        :param prepared: выполнить как подготовленный запрос, если это включено (self.prepared)
+        :param compact: строки курсора — кортежи, вернуть их как rows.Row
+        """
+        def operation(connection):
+            # Замер без ожидания соединения пула: только запрос и чтение ответа
+            with self.metrics.timed("mysql", name, query, params) as call:
+                with connection.cursor(cursor_class) as cursor:
+                    if prepared and self.prepared:
+                        self._execute_prepared(connection, cursor, query, params)
+                    else:
+                        cursor.execute(query, params)
+                    result = cursor.fetchone() if one else cursor.fetchall()
+                    if compact:
+                        result = make_rows(cursor.description, [result] if one else result)
+                        result = result[0] if one else result
+                    call["result"] = result
+            return call["result"]
+        return self._run(operation)
+
+    def _execute_prepared(self, connection, cursor, query, params):
+        """
+        Выполняет query как подготовленный на сервере запрос. Текст разбирается командой
+        PREPARE один раз на соединение; затем параметры передаются через переменные
+        сессии и EXECUTE ... USING. Соединение хранит не больше prepared_max запросов,
+        давно не использованные освобождаются (DEALLOCATE PREPARE).
+        """
+        statements = getattr(connection, "_prepared_statements", None)
+        if statements is None:
+            statements = connection._prepared_statements = OrderedDict()
+        statement = statements.get(query)
+        variables = [f"@film_p{i}" for i in range(len(params))]
+        with connection.cursor() as setup:
+            if statement is None:
+                if len(statements) >= self.prepared_max:
+                    _, oldest = statements.popitem(last=False)
+                    setup.execute(f"DEALLOCATE PREPARE {oldest}")
+                statement = f"film_search_{next(_statement_numbers)}"
+                setup.execute(f"PREPARE {statement} FROM %s", (query.replace("%s", "?"),))
+                statements[query] = statement
+            else:
+                statements.move_to_end(query)
+            if variables:
+                setup.execute("SET " + ", ".join(f"{variable} = %s" for variable in variables), params)
+        cursor.execute(f"EXECUTE {statement}" + (f" USING {', '.join(variables)}" if variables else ""))
 
 
 
@@ -43,78 +318,388 @@ class DBConnector:
 #             cursorclass=DictCursor,
 #         )
 
-    def search_by_title(self, name, offset=0, limit=10):
-        """Поиск фильмов по названию."""
+    def sync_snapshot(self, path):
+        """Создаёт или инкрементально обновляет снимок каталога по данным MySQL."""
+        fetched = self._run(lambda connection: sync_snapshot(connection, path))
+        if self.snapshot is not None and self.snapshot.path == path:
+            self.snapshot.refresh()
+            if self.cache is not None:
+                self.cache.invalidate()
+        return fetched
+
+    def build_title_index(self):
+        """Строит (или перестраивает) триграммный индекс названий из таблицы film."""
+        with self.metrics.timed("mysql", "build_title_index"):
+            self.title_index = self._run(TrigramIndex.from_connection)
+        return self.title_index
+
+    def build_actor_index(self):
+        """Строит (или перестраивает) индекс имён актёров из таблицы actor."""
+        with self.metrics.timed("mysql", "build_actor_index"):
+            self.actor_index = self._run(ActorNameIndex.from_connection)
+        return self.actor_index
+
+    @staticmethod
+    def _page_query(query, params, key_columns, offset=0, limit=10, after=None):
+        """
+        Поисковый запрос страницы: упорядочен по ключу пагинации, с LIMIT/OFFSET.
+        Без ключа (key_columns=None) порядок задаёт сам запрос, а страницы — только OFFSET.
+        """
+        params = list(params)
+        if after is not None:
+            condition, after_params = _keyset_condition(key_columns, after)
+            query += f" AND {condition}"
+            params.extend(after_params)
+        if key_columns is not None:
+            query += f" ORDER BY {', '.join(key_columns)}"
+        query += " LIMIT %s OFFSET %s"
+        params.extend((limit, offset))
+        return query, params
+
+    def _fetch(self, query, params, key_columns, offset=0, limit=10, after=None, name="fetch"):
+        """
+        Выполняет поисковый запрос, упорядоченный по ключу пагинации.
+        :param after: ключ последней строки предыдущей страницы (keyset-пагинация)
+        """
+        query, params = self._page_query(query, params, key_columns, offset, limit, after)
+        # Небуферизованный курсор: строки страницы читаются с сервера потоком
+        if self.row_format == "tuple":
+            from pymysql.cursors import SSCursor
+            return self._execute(query, params, SSCursor, name=name, prepared=True, compact=True)
+        from pymysql.cursors import SSDictCursor
+        return self._execute(query, params, SSDictCursor, name=name, prepared=True)
+
+    def _rows(self, rows):
+        """Строки из индексов в памяти и снимка — в формате row_format."""
+        return compact_rows(rows) if self.row_format == "tuple" else rows
+
+    def stream(self, search, *args, chunk_size=1000):
+        """
+        Все результаты метода поиска пачками по chunk_size строк — генератор без LIMIT.
+        Строки читаются небуферизованным курсором (SSCursor) по мере обработки пачек,
+        поэтому память не зависит от размера результата. Соединение пула занято,
+        пока генератор не исчерпан или не закрыт.
+        :param search: метод поиска, например db.search_by_genre_and_years
+        """
+        if self.snapshot is not None and hasattr(self.snapshot, search.__name__):
+            rows = self.snapshot.rows(search.__name__, *args)
+            while True:
+                chunk = self._rows(list(islice(rows, chunk_size)))
+                if not chunk:
+                    return
+                yield chunk
+        query, params, key_columns = self._query(search, *args)
+        if key_columns is not None:
+            query += f" ORDER BY {', '.join(key_columns)}"
+        compact = self.row_format == "tuple"
+        from pymysql.cursors import SSCursor, SSDictCursor
+        with self.pool.connection() as connection:
+            # Замер охватывает всё чтение, включая обработку пачек получателем
+            with self.metrics.timed("mysql", f"stream.{search.__name__}", query, params) as call:
+                with connection.cursor(SSCursor if compact else SSDictCursor) as cursor:
+                    cursor.execute(query, params)
+                    call["rows"] = 0
+                    while True:
+                        chunk = cursor.fetchmany(chunk_size)
+                        if not chunk:
+                            break
+                        call["rows"] += len(chunk)
+                        yield make_rows(cursor.description, chunk) if compact else chunk
+
+    def _count(self, query, params, name="count"):
+        """Количество строк, которое вернул бы поисковый запрос без LIMIT."""
+        return self._execute(f"SELECT COUNT(*) AS total FROM ({query}) AS q", params, one=True,
+                             name=name, prepared=True)["total"]
+
+    def explain(self, search, *args, limit=10):
+        """
+        План MySQL (EXPLAIN) для первой страницы метода поиска.
+        :param search: метод поиска, например db.search_by_genre_and_years
+        :return: строки EXPLAIN — таблица, тип доступа (type), индекс (key), оценка строк
+        """
+        query, params = self._page_query(*self._query(search, *args), limit=limit)
+        return self._execute(f"EXPLAIN {query}", params, name=f"explain.{search.__name__}")
+
+    def paginate(self, search, *args, page_size=10):
+        """
+        Ленивый постраничный поиск: следующая страница запрашивается только при переходе к ней.
+        :param search: метод поиска, например db.search_by_title
+        :return: KeysetPages (OffsetPages для поиска без ключа пагинации, например по релевантности)
+        """
+        key_columns = self._key_columns(search, *args)
+        if key_columns is None:
+            return OffsetPages(lambda offset, limit: search(*args, offset=offset, limit=limit), page_size,
+                               count=lambda: self.count(search, *args))
+        key_columns = [column.split(".")[-1] for column in key_columns]
+
+        def fetch_page(after, limit):
+            return search(*args, limit=limit, after=after)
+
+        return KeysetPages(fetch_page, key_columns, page_size,
+                           count=lambda: self.count(search, *args))
+
+    def count(self, search, *args):
+        """Общее количество результатов метода поиска."""
+        if self.cache is not None:
+            key = make_key(search.__name__, args, {"count": True})
+            found, total = self.cache.get(key)
+            if not found:
+                total = self._uncached_count(search, *args)
+                self.cache.set(key, total)
+            return total
+        return self._uncached_count(search, *args)
+
+    def _uncached_count(self, search, *args):
+        # Полнотекстового и составного поиска в снимке нет: они всегда идут в MySQL
+        if self.snapshot is not None and hasattr(self.snapshot, search.__name__):
+            return self.snapshot.count(search.__name__, *args)
+        if search.__name__ == "search_by_title" and self.title_index is not None:
+            return len(self.title_index.positions(*args))
+        query, params, _ = self._query(search, *args)
+        return self._count(query, params, name=f"count.{search.__name__}")
+
+    def _query(self, search, *args):
+        """Текст запроса, параметры и ключ пагинации для метода поиска."""
+        builder = getattr(self, search.__name__.replace("search_", "_query_", 1))
+        return builder(*args)
+
+    def _key_columns(self, search, *args):
+        """Ключ пагинации метода поиска; для поиска по актёру — без поиска actor_id по имени."""
+        if search.__name__ == "search_by_actor":
+            return _ACTOR_IDS_KEY if self.actor_index is not None else _ACTOR_KEY
+        return self._query(search, *args)[2]
+
+    def _query_by_title(self, name):
         query = """
-            SELECT title
-            FROM film
-            WHERE LOWER(title) LIKE %s
-            LIMIT %s OFFSET %s
+            SELECT f.film_id, f.title
+            FROM film f
+            WHERE LOWER(f.title) LIKE %s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (f"%{name.lower()}%", limit, offset))
-            return cursor.fetchall()
+        return query, [like_pattern(name.lower())], ("f.film_id",)
 
+    @instrumented("search")
+    @cached
+    def search_by_title(self, name, offset=0, limit=10, after=None):
+        """Поиск фильмов по названию."""
+        if self.title_index is not None:
+            return self._rows(self.title_index.search(name, offset, limit, after))
+        if self.snapshot is not None:
+            return self._rows(self.snapshot.search_by_title(name, offset, limit, after))
+        return self._fetch(*self._query_by_title(name), offset=offset, limit=limit, after=after,
+                           name="search_by_title")
+
+    @instrumented("search")
+    @cached
     def get_all_genres(self):
         """Получить список всех уникальных жанров."""
+        if self.snapshot is not None:
+            return self.snapshot.get_all_genres()
         query = "SELECT DISTINCT name FROM category"
-        with self.connection.cursor() as cursor:
-            cursor.execute(query)
-            return [row["name"] for row in cursor.fetchall()]
+        return [row["name"] for row in self._execute(query, name="get_all_genres")]
+
+    def _load_categories(self):
+        rows = self._execute("SELECT category_id, name FROM category", name="load_categories")
+        self._categories = {row["name"].lower(): row["category_id"] for row in rows}
+        return self._categories
+
+    def category_ids(self, genre):
+        """
+        category_id жанра: точное совпадение названия без учёта регистра, а если его нет —
+        все жанры, содержащие genre (как прежнее условие LIKE '%genre%').
+        Справочник жанров читается из MySQL при первом обращении и перечитывается,
+        только если жанр в нём не найден.
+        """
+        categories = self._categories
+        loaded = categories is None
+        if loaded:
+            categories = self._load_categories()
+        while True:
+            category_ids = match_genre(genre, categories)
+            if category_ids or loaded:
+                return category_ids
+            categories, loaded = self._load_categories(), True
 
-    def search_by_genre(self, genre, offset=0, limit=10):
+    def _query_by_genre(self, genre):
+        category_ids = self.category_ids(genre)
+        # Отбор по индексу film_category.category_id, без сравнения названий жанров
+        query = f"""
+            SELECT fc.film_id, fc.category_id, f.title, f.release_year
+            FROM film_category fc
+            JOIN film f ON f.film_id = fc.film_id
+            WHERE {in_condition("fc.category_id", category_ids)}
+        """
+        return query, category_ids, ("fc.film_id", "fc.category_id")
+
+    @instrumented("search")
+    @cached
+    def search_by_genre(self, genre, offset=0, limit=10, after=None):
         """Поиск фильмов по жанру."""
+        if self.snapshot is not None:
+            return self._rows(self.snapshot.search_by_genre(genre, offset, limit, after))
+        return self._fetch(*self._query_by_genre(genre), offset=offset, limit=limit, after=after,
+                           name="search_by_genre")
+
+    def _query_by_year_range(self, year_from=1990, year_to=2025):
         query = """
-            SELECT f.title, f.release_year
+            SELECT f.film_id, f.title, f.release_year
             FROM film f
-            JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            WHERE LOWER(c.name) LIKE %s
-            LIMIT %s OFFSET %s
+            WHERE f.release_year BETWEEN %s AND %s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (f"%{genre.lower()}%", limit, offset))
-            return cursor.fetchall()
+        return query, [year_from, year_to], ("f.film_id",)
 
-    def search_by_year_range(self, year_from=1990, year_to=2025, offset=0, limit=10):
+    @instrumented("search")
+    @cached
+    def search_by_year_range(self, year_from=1990, year_to=2025, offset=0, limit=10, after=None):
         """Поиск фильмов в заданном диапазоне лет."""
-        query = """
-            SELECT title, release_year
-            FROM film
-            WHERE release_year BETWEEN %s AND %s
-            LIMIT %s OFFSET %s
+        if self.snapshot is not None:
+            return self._rows(self.snapshot.search_by_year_range(year_from, year_to, offset, limit, after))
+        return self._fetch(*self._query_by_year_range(year_from, year_to),
+                           offset=offset, limit=limit, after=after, name="search_by_year_range")
+
+    def _query_by_genre_and_years(self, genre, year_from, year_to):
+        category_ids = self.category_ids(genre)
+        # category соединяется по первичному ключу только ради названия жанра в результате
+        query = f"""
+            SELECT fc.film_id, fc.category_id, f.title, f.release_year, c.name AS genre
+            FROM film_category fc
+            JOIN film f ON f.film_id = fc.film_id
+            JOIN category c ON c.category_id = fc.category_id
+            WHERE {in_condition("fc.category_id", category_ids)} AND f.release_year BETWEEN %s AND %s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (year_from, year_to, limit, offset))
-            return cursor.fetchall()
+        return query, category_ids + [year_from, year_to], ("fc.film_id", "fc.category_id")
 
-    def search_by_genre_and_years(self, genre, year_from, year_to, offset=0, limit=10):
+    @instrumented("search")
+    @cached
+    def search_by_genre_and_years(self, genre, year_from, year_to, offset=0, limit=10, after=None):
         """Поиск фильмов по жанру и диапазону лет."""
-        query = """
-            SELECT f.title, f.release_year, c.name AS genre
-            FROM film f
-            JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            WHERE c.name LIKE %s AND f.release_year BETWEEN %s AND %s
-            LIMIT %s OFFSET %s
-        """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (f"%{genre}%", year_from, year_to, limit, offset))
-            return cursor.fetchall()
+        if self.snapshot is not None:
+            return self._rows(self.snapshot.search_by_genre_and_years(genre, year_from, year_to,
+                                                                      offset, limit, after))
+        return self._fetch(*self._query_by_genre_and_years(genre, year_from, year_to),
+                           offset=offset, limit=limit, after=after, name="search_by_genre_and_years")
 
-    def search_by_actor(self, actor_name, offset=0, limit=10):
-        """Поиск фильмов по имени актёра."""
+    def _query_by_actor(self, actor_name):
+        if self.actor_index is not None:
+            return self._query_by_actor_ids(self.actor_index.resolve(actor_name))
         query = """
-            SELECT f.title, f.release_year, CONCAT(a.first_name, ' ', a.last_name) AS actor_name
+            SELECT f.film_id, a.actor_id, f.title, f.release_year,
+                   CONCAT(a.first_name, ' ', a.last_name) AS actor_name
             FROM film f
             JOIN film_actor fa ON f.film_id = fa.film_id
             JOIN actor a ON fa.actor_id = a.actor_id
             WHERE LOWER(CONCAT(a.first_name, ' ', a.last_name)) LIKE %s
-            LIMIT %s OFFSET %s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (f"%{actor_name.lower()}%", limit, offset))
-            return cursor.fetchall()
+        return query, [like_pattern(actor_name.lower())], _ACTOR_KEY
+
+    def _query_by_actor_ids(self, actor_ids):
+        """Фильмы актёров с заданными actor_id (по первичному ключу film_actor)."""
+        condition = in_condition("fa.actor_id", actor_ids)
+        query = f"""
+            SELECT fa.film_id, fa.actor_id, f.title, f.release_year,
+                   CONCAT(a.first_name, ' ', a.last_name) AS actor_name
+            FROM film_actor fa
+            JOIN film f ON f.film_id = fa.film_id
+            JOIN actor a ON a.actor_id = fa.actor_id
+            WHERE {condition}
+        """
+        return query, list(actor_ids), _ACTOR_IDS_KEY
+
+    @instrumented("search")
+    @cached
+    def search_by_actor(self, actor_name, offset=0, limit=10, after=None):
+        """Поиск фильмов по имени актёра."""
+        if self.snapshot is not None:
+            return self._rows(self.snapshot.search_by_actor(actor_name, offset, limit, after))
+        if self.actor_index is None:
+            return self._fetch(*self._query_by_actor(actor_name), offset=offset, limit=limit, after=after,
+                               name="search_by_actor")
+        # Первая фаза: имя -> actor_id через индекс имён (один раз на поиск)
+        started = time.perf_counter()
+        actor_ids = self.actor_index.resolve(actor_name)
+        resolved = time.perf_counter()
+        # Вторая фаза: выборка фильмов по найденным actor_id
+        rows = self._fetch(*self._query_by_actor_ids(actor_ids), offset=offset, limit=limit, after=after,
+                           name="search_by_actor") if actor_ids else []
+        last = {"resolve_seconds": resolved - started, "fetch_seconds": time.perf_counter() - resolved,
+                "actor_ids": len(actor_ids)}
+        with self._actor_timings_lock:
+            self.actor_timings["lookups"] += 1
+            self.actor_timings["resolve_seconds"] += last["resolve_seconds"]
+            self.actor_timings["fetch_seconds"] += last["fetch_seconds"]
+            self.actor_timings["last"] = last
+        return rows
+
+    def _query_films(self, film_query):
+        return film_query.plan(self)
+
+    @instrumented("search")
+    @cached
+    def search_films(self, film_query, offset=0, limit=10, after=None):
+        """
+        Составной поиск: любое сочетание фильтров film_query.FilmQuery (название, жанр,
+        годы, актёр) одним запросом, без повторов фильмов, по возрастанию film_id.
+        """
+        return self._fetch(*self._query_films(film_query), offset=offset, limit=limit, after=after,
+                           name="search_films")
+
+    def fulltext_indexes(self):
+        """Наборы колонок FULLTEXT-индексов таблицы film_text."""
+        if self._fulltext_indexes is None:
+            query = """
+                SELECT INDEX_NAME AS name, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns
+                FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'film_text' AND INDEX_TYPE = 'FULLTEXT'
+                GROUP BY INDEX_NAME
+            """
+            rows = self._execute(query, name="fulltext_indexes")
+            self._fulltext_indexes = {tuple(row["columns"].split(",")) for row in rows}
+        return self._fulltext_indexes
+
+    def create_fulltext_index(self, fields="title"):
+        """
+        Создаёт FULLTEXT-индекс film_text для поиска по fields, если его нет
+        (в Sakila есть только индекс по title + description).
+        :return: True, если индекс создан
+        """
+        columns = FULLTEXT_FIELDS[fields]
+        if columns in self.fulltext_indexes():
+            return False
+        self._execute(f"ALTER TABLE film_text ADD FULLTEXT INDEX idx_ft_{'_'.join(columns)} ({', '.join(columns)})",
+                      name="create_fulltext_index")
+        self._fulltext_indexes = None
+        return True
+
+    def _query_by_keyword(self, keywords, mode="natural", fields="title_description"):
+        if mode not in FULLTEXT_MODES:
+            raise ValueError(f"Неизвестный режим {mode!r}: ожидается {' или '.join(FULLTEXT_MODES)}")
+        if fields not in FULLTEXT_FIELDS:
+            raise ValueError(f"Неизвестные поля {fields!r}: ожидается {' или '.join(FULLTEXT_FIELDS)}")
+        columns = FULLTEXT_FIELDS[fields]
+        if columns not in self.fulltext_indexes():
+            # MATCH в InnoDB требует FULLTEXT-индекс ровно по этим колонкам
+            raise ValueError(f"Нет FULLTEXT-индекса film_text({', '.join(columns)}); "
+                             "создайте его: python main.py --create-fulltext-index")
+        match = f"MATCH({', '.join('ft.' + column for column in columns)}) AGAINST (%s {FULLTEXT_MODES[mode]})"
+        # Релевантность считается один раз на строку: одинаковый MATCH в SELECT и WHERE
+        query = f"""
+            SELECT ft.film_id, ft.title, f.release_year, {match} AS score
+            FROM film_text ft
+            JOIN film f ON f.film_id = ft.film_id
+            WHERE {match}
+            ORDER BY score DESC, ft.film_id
+        """
+        return query, [keywords, keywords], None
+
+    @instrumented("search")
+    @cached
+    def search_by_keyword(self, keywords, mode="natural", fields="title_description", offset=0, limit=10):
+        """
+        Полнотекстовый поиск по FULLTEXT-индексу film_text, по убыванию релевантности (score).
+        :param mode: natural — естественный язык, boolean — операторы +слово -слово "фраза" слово*
+        :param fields: title — только название, title_description — название и описание
+        """
+        return self._fetch(*self._query_by_keyword(keywords, mode, fields), offset=offset, limit=limit,
+                           name="search_by_keyword")
 
     def get_popular_films_by_title(self, limit=5):
         """Получить топ популярных фильмов по названию."""
@@ -126,9 +711,7 @@ class DBConnector:
             ORDER BY count DESC
             LIMIT %s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (limit,))
-            return cursor.fetchall()
+        return self._execute(query, (limit,))
 
     def get_popular_actors(self, limit=5):
         """Получить топ популярных актеров."""
@@ -140,14 +723,12 @@ class DBConnector:
             ORDER BY count DESC
             LIMIT %s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (limit,))
-            return cursor.fetchall()
+        return self._execute(query, (limit,))
 
     def close(self):
-        """Закрытие соединения с базой данных."""
-        if self.connection:
-            self.connection.close()
+        """Закрытие всех соединений пула."""
+        if self._pool is not None:
+            self._pool.close()
 
 
 
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Ограниченный потокобезопасный пул соединений.
+    Перед выдачей соединение проверяется ping-ом, простаивающие дольше max_idle
+    соединения закрываются, разорванные соединения заменяются новыми.
+    """
+    def __init__(self, connect, min_size=1, max_size=5, max_idle=300, timeout=10,
+                 pre_ping=True, disconnect_errors=()):
+        """
+        :param connect: функция без аргументов, открывающая новое соединение
+        :param min_size: сколько соединений держать открытыми всегда
+        :param max_size: максимальное число одновременно открытых соединений
+        :param max_idle: через сколько секунд простоя соединение закрывается
+        :param timeout: сколько секунд ждать свободное соединение
+        :param pre_ping: проверять соединение ping-ом перед выдачей
+        :param disconnect_errors: исключения, после которых соединение считается разорванным
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Нужно 0 <= min_size <= max_size и max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.disconnect_errors = tuple(disconnect_errors)
+        self._idle = deque()  # (connection, время возврата в пул)
+        self._size = 0  # открытые соединения: свободные + выданные
+        self._closed = False
+        self._lock = threading.Condition()
+
+    def fill(self):
+        """Открывает соединения до min_size."""
+        while True:
+            with self._lock:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._connect()
+            except Exception:
+                self._forget()
+                raise
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+                self._lock.notify()
+
+    def acquire(self):
+        """Выдаёт проверенное соединение, при необходимости открывая новое."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Пул соединений закрыт")
+                    self._close_stale()
+                    if self._idle:
+                        connection, _ = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        connection = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"Нет свободных соединений за {self.timeout} с")
+                    self._lock.wait(remaining)
+            if connection is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+            if not self.pre_ping or self._ping(connection):
+                return connection
+            # Соединение разорвано (например, по idle timeout сервера) — берём другое
+            self._discard(connection)
+
+    def release(self, connection, broken=False):
+        """Возвращает соединение в пул; разорванное закрывается."""
+        if broken:
+            self._discard(connection)
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._lock.notify()
+                return
+        self._discard(connection)
+
+    @contextmanager
+    def connection(self):
+        """Соединение из пула на время блока with."""
+        connection = self.acquire()
+        try:
+            yield connection
+        except self.disconnect_errors:
+            self.release(connection, broken=True)
+            raise
+        except BaseException:
+            self.release(connection)
+            raise
+        else:
+            self.release(connection)
+
+    def close(self):
+        """Закрывает все свободные соединения; выданные закроются при возврате."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._lock.notify_all()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    @property
+    def size(self):
+        return self._size
+
+    def _ping(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close_stale(self):
+        """Закрывает простаивающие дольше max_idle соединения сверх min_size (под блокировкой)."""
+        now = time.monotonic()
+        # Самые давно возвращённые соединения лежат слева
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][1] > self.max_idle):
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._quiet_close(connection)
+
+    def _discard(self, connection):
+        self._quiet_close(connection)
+        self._forget()
+
+    def _forget(self):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    @staticmethod
+    def _quiet_close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
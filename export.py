@@ -0,0 +1,170 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+from rows import as_dicts
+
+# Выгрузка результатов поиска в файл: пачки строк из DBConnector.stream проходят
+# через генераторы и дописываются в CSV, JSONL (с .gz — сжатые) или Parquet по одной
+# пачке, поэтому в памяти одновременно находится только одна пачка.
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+# Типы колонок результатов поиска в Parquet. Схема задаётся до записи: колонка, пустая
+# (NULL) во всей первой пачке, иначе получила бы тип null, несовместимый с следующими пачками
+PARQUET_TYPES = {
+    "film_id": "int32",
+    "category_id": "int32",
+    "actor_id": "int32",
+    "release_year": "int32",
+    "title": "string",
+    "genre": "string",
+    "actor_name": "string",
+    "score": "float64",
+}
+
+_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".parquet": "parquet"}
+
+
+def detect_format(path):
+    """Формат по расширению файла (расширение .gz не учитывается)."""
+    name = path[:-3] if path.endswith(".gz") else path
+    return _EXTENSIONS.get(os.path.splitext(name)[1].lower())
+
+
+def _open_text(path):
+    if path == "-":
+        # stdout процесса, даже если служебные сообщения перенаправлены (redirect_stdout)
+        return io.TextIOWrapper(sys.__stdout__.buffer, encoding="utf-8", newline="", write_through=True)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class _Counted:
+    """Пропускает пачки дальше по конвейеру и считает строки."""
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.rows = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.rows += len(chunk)
+            yield chunk
+
+
+def write_csv(chunks, path, columns=None):
+    """
+    CSV с заголовком по колонкам первой строки; одна запись в файл на пачку.
+    :param columns: заголовок для пустого результата
+    """
+    file = _open_text(path)
+    try:
+        header = None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for chunk in chunks:
+            if header is None:
+                header = list(chunk[0].keys())
+                writer.writerow(header)
+            writer.writerows(row.values() for row in chunk)
+            file.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        if header is None and columns:
+            writer.writerow(columns)
+            file.write(buffer.getvalue())
+    finally:
+        if path == "-":
+            file.detach()
+        else:
+            file.close()
+
+
+def write_jsonl(chunks, path, columns=None):
+    """JSON-объект на строку; одна запись в файл на пачку (columns не используется)."""
+    file = _open_text(path)
+    try:
+        for chunk in chunks:
+            file.write("".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in as_dicts(chunk)))
+    finally:
+        if path == "-":
+            file.detach()
+        else:
+            file.close()
+
+
+def _parquet_schema(pa, names, columns):
+    """
+    Схема Parquet: известные колонки — по PARQUET_TYPES, остальные — по значениям первой
+    пачки (целиком пустая неизвестная колонка — строковая).
+    """
+    fields = []
+    for name in names:
+        if name in PARQUET_TYPES:
+            arrow_type = getattr(pa, PARQUET_TYPES[name])()
+        else:
+            arrow_type = pa.array(columns.get(name, [])).type
+            if pa.types.is_null(arrow_type):
+                arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def write_parquet(chunks, path, columns=None, compression="zstd"):
+    """
+    Колоночный файл Parquet со сжатием compression: группа строк на пачку.
+    Требует пакет pyarrow (pip install pyarrow).
+    :param columns: колонки для пустого результата (файл со схемой и без строк)
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet нужен пакет pyarrow: pip install pyarrow") from None
+    writer = None
+    try:
+        for chunk in chunks:
+            names = list(chunk[0].keys())
+            values = dict(zip(names, map(list, zip(*(row.values() for row in chunk)))))
+            if writer is None:
+                writer = pq.ParquetWriter(path, _parquet_schema(pa, names, values), compression=compression)
+            writer.write_table(pa.table(values, schema=writer.schema))
+        if writer is None and columns:
+            writer = pq.ParquetWriter(path, _parquet_schema(pa, columns, {}), compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export(chunks, path, format=None, columns=None):
+    """
+    Записывает пачки строк (списки словарей или rows.Row) в файл path ("-" — stdout).
+    :param format: csv, jsonl или parquet (по умолчанию — по расширению path)
+    :param columns: имена колонок на случай пустого результата (заголовок CSV, схема Parquet)
+    :return: {"rows", "bytes", "seconds", "rows_per_second", "mb_per_second"}
+    """
+    format = format or detect_format(path)
+    if format not in WRITERS:
+        raise ValueError(f"Неизвестный формат выгрузки {format!r}: ожидается {', '.join(FORMATS)}")
+    if format == "parquet" and path == "-":
+        raise ValueError("Parquet нельзя выгрузить в stdout")
+    counted = _Counted(chunks)
+    started = time.perf_counter()
+    WRITERS[format](counted, path, columns=columns)
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(path) if path != "-" and os.path.exists(path) else None
+    return {
+        "rows": counted.rows,
+        "bytes": size,
+        "seconds": seconds,
+        "rows_per_second": counted.rows / seconds if seconds else None,
+        "mb_per_second": size / seconds / 2 ** 20 if size is not None and seconds else None,
+    }
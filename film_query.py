@@ -0,0 +1,134 @@
+import json
+
+from db_connector import in_condition, like_pattern
+
+# Составной поиск фильмов: любое сочетание фильтров по названию, жанру, годам и актёру
+# собирается в один запрос к film. Жанр и актёр проверяются подзапросами EXISTS
+# (semi-join), поэтому фильм с несколькими подходящими жанрами или актёрами
+# возвращается один раз, а порядок строк однозначен — по film_id.
+#
+#   db.search_films(FilmQuery().actor("penelope").genre("Action").years(2000, 2010))
+
+# Не подставлять в запрос больше стольких film_id из индекса названий — дальше LIKE
+MAX_TITLE_IDS = 1000
+
+
+class FilmQuery:
+    """
+    Набор фильтров поиска. Методы возвращают сам объект, их можно вызывать цепочкой:
+    FilmQuery().title("ace").years(2000, 2010). Пустой FilmQuery выбирает все фильмы.
+    """
+    def __init__(self, title=None, genre=None, year_from=None, year_to=None, actor=None):
+        self.filters = {}
+        if title is not None:
+            self.title(title)
+        if genre is not None:
+            self.genre(genre)
+        if year_from is not None or year_to is not None:
+            self.years(year_from, year_to)
+        if actor is not None:
+            self.actor(actor)
+
+    def title(self, name):
+        """Подстрока названия без учёта регистра."""
+        self.filters["title"] = name
+        return self
+
+    def genre(self, genre):
+        """Жанр: точное название или подстрока, как в search_by_genre."""
+        self.filters["genre"] = genre
+        return self
+
+    def years(self, year_from=None, year_to=None):
+        """Год выпуска в диапазоне; любая из границ может отсутствовать."""
+        if year_from is not None and year_to is not None and year_from > year_to:
+            raise ValueError(f"начальный год {year_from} больше конечного {year_to}")
+        self.filters["years"] = (year_from, year_to)
+        return self
+
+    def actor(self, actor_name):
+        """Имя актёра (подстрока или, с индексом имён, префикс и опечатки)."""
+        self.filters["actor"] = actor_name
+        return self
+
+    def __str__(self):
+        # Ключ кэша результатов: строки в нижнем регистре, фильтры по алфавиту
+        filters = {name: value.lower() if isinstance(value, str) else value
+                   for name, value in sorted(self.filters.items())}
+        return f"FilmQuery({json.dumps(filters, ensure_ascii=False)})"
+
+    __repr__ = __str__
+
+    def plan(self, db):
+        """
+        Текст запроса, параметры и ключ пагинации для DBConnector. Порядок выполнения
+        выбирает оптимизатор MySQL (EXISTS он переписывает в semi-join), поэтому условия
+        идут в постоянном порядке; фильтр, для которого по справочнику жанров или индексам
+        в памяти заранее известно, что он ничего не находит, становится FALSE.
+        :param db: DBConnector — справочник жанров и индексы в памяти
+        """
+        conditions = []
+        if "title" in self.filters:
+            conditions.append(self._title_condition(db, self.filters["title"]))
+        if "years" in self.filters:
+            conditions.append(self._years_condition(*self.filters["years"]))
+        if "genre" in self.filters:
+            conditions.append(self._genre_condition(db, self.filters["genre"]))
+        if "actor" in self.filters:
+            conditions.append(self._actor_condition(db, self.filters["actor"]))
+        where = " AND ".join(f"({sql})" for sql, _ in conditions) or "TRUE"
+        query = f"""
+            SELECT f.film_id, f.title, f.release_year
+            FROM film f
+            WHERE {where}
+        """
+        return query, [param for _, params in conditions for param in params], ("f.film_id",)
+
+    @staticmethod
+    def _title_condition(db, name):
+        index = db.title_index
+        if index is not None:
+            positions = index.positions(name)
+            if len(positions) <= MAX_TITLE_IDS:
+                film_ids = sorted(index.film_ids[p] for p in positions)
+                if not film_ids:
+                    return "FALSE", []
+                return in_condition("f.film_id", film_ids), film_ids
+        return "LOWER(f.title) LIKE %s", [like_pattern(name.lower())]
+
+    @staticmethod
+    def _years_condition(year_from, year_to):
+        if year_from is None and year_to is None:
+            return "TRUE", []
+        if year_from is None:
+            return "f.release_year <= %s", [year_to]
+        if year_to is None:
+            return "f.release_year >= %s", [year_from]
+        return "f.release_year BETWEEN %s AND %s", [year_from, year_to]
+
+    @staticmethod
+    def _genre_condition(db, genre):
+        category_ids = db.category_ids(genre)
+        if not category_ids:
+            return "FALSE", []
+        sql = f"""EXISTS (
+                SELECT 1 FROM film_category fc
+                WHERE fc.film_id = f.film_id AND {in_condition("fc.category_id", category_ids)})"""
+        return sql, list(category_ids)
+
+    @staticmethod
+    def _actor_condition(db, actor_name):
+        index = db.actor_index
+        if index is None:
+            sql = """EXISTS (
+                SELECT 1 FROM film_actor fa JOIN actor a ON a.actor_id = fa.actor_id
+                WHERE fa.film_id = f.film_id
+                  AND LOWER(CONCAT(a.first_name, ' ', a.last_name)) LIKE %s)"""
+            return sql, [like_pattern(actor_name.lower())]
+        actor_ids = index.resolve(actor_name)
+        if not actor_ids:
+            return "FALSE", []
+        sql = f"""EXISTS (
+                SELECT 1 FROM film_actor fa
+                WHERE fa.film_id = f.film_id AND {in_condition("fa.actor_id", actor_ids)})"""
+        return sql, list(actor_ids)
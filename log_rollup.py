@@ -0,0 +1,291 @@
+import os
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+from config import load_env
+
+load_env()
+
+# Свёртка сырого лога поиска в почасовые и суточные корзины: один документ на
+# (корзина, search_type, нормализованные параметры) с числом запросов. Сырые события
+# удаляются TTL-индексом через LOG_RETENTION_DAYS дней, почасовые корзины — через
+# LOG_HOURLY_RETENTION_DAYS, поэтому объём хранения и стоимость топов за окно
+# зависят от длины окна, а не от всего трафика.
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+_EPOCH = datetime(1970, 1, 1)
+_WINDOW = re.compile(r"^\s*(\d+)\s*([mhdw])\s*$", re.IGNORECASE)
+_WINDOW_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def floor_time(moment, step):
+    """Начало корзины длиной step, в которую попадает moment."""
+    return _EPOCH + (moment - _EPOCH) // step * step
+
+
+def parse_window(value):
+    """Окно вида "30m", "24h", "7d", "2w" -> timedelta."""
+    if isinstance(value, timedelta):
+        return value
+    match = _WINDOW.match(str(value))
+    if not match:
+        raise ValueError(f"некорректное окно {value!r}: ожидается число и m, h, d или w, например 24h")
+    return timedelta(**{_WINDOW_UNITS[match.group(2).lower()]: int(match.group(1))})
+
+
+def _bucket_expression(step):
+    """Начало корзины timestamp в конвейере агрегации (без $dateTrunc, MongoDB до 5.0)."""
+    milliseconds = int(step.total_seconds() * 1000)
+    return {"$subtract": ["$timestamp", {"$mod": [{"$subtract": ["$timestamp", _EPOCH]}, milliseconds]}]}
+
+
+def _params_key(parameters):
+    return tuple((parameters or {}).items())
+
+
+def rollup_lag():
+    """Сколько ждать запоздавшие события после конца часа (LOG_ROLLUP_LAG или 300 секунд)."""
+    return timedelta(seconds=float(os.getenv("LOG_ROLLUP_LAG", 300)))
+
+
+def mark_late_hours(state, entries, lag, now=None):
+    """
+    Отмечает в коллекции состояния свёртки часы событий старше lag: такие события
+    (например, загруженные из журнала предзаписи после сбоя MongoDB) могли попасть
+    в уже свёрнутые часы, и rollup() свернёт эти часы заново. Каждая отметка — документ
+    {"_id": {"late": час}} со счётчиком version: rollup() удаляет отметку, только если
+    после пересвёртки её не обновили.
+    """
+    from pymongo import UpdateOne
+    boundary = (now or datetime.now()) - lag
+    hours = {floor_time(entry["timestamp"], HOUR) for entry in entries if entry["timestamp"] < boundary}
+    if hours:
+        state.bulk_write([UpdateOne({"_id": {"late": hour}}, {"$inc": {"version": 1}}, upsert=True)
+                          for hour in sorted(hours)], ordered=False)
+    return len(hours)
+
+
+class LogRollup:
+    """
+    Почасовые и суточные свёртки лога LogSearch.
+    Отметка (watermark) хранит конец последнего свёрнутого часа: rollup() обрабатывает
+    только закончившиеся часы после неё, поэтому повторный запуск ничего не пересчитывает
+    дважды. Часы до отметки, в которые LogSearch записал запоздавшие события
+    (mark_late_hours), сворачиваются заново. Корзины перезаписываются целиком
+    (ReplaceOne), и прерванный запуск безопасно повторить.
+    """
+    def __init__(self, log_search, retention_days=None, hourly_retention_days=None, lag=None):
+        """
+        :param log_search: LogSearch — источник сырого лога и подключения к MongoDB
+        :param retention_days: сколько дней хранить сырые события (LOG_RETENTION_DAYS или 90, 0 — всегда)
+        :param hourly_retention_days: сколько дней хранить почасовые корзины (LOG_HOURLY_RETENTION_DAYS или 35)
+        :param lag: секунд после конца часа, в течение которых ещё ждём запоздавшие события
+            буферизованной записи (LOG_ROLLUP_LAG или 300)
+        """
+        self.log_search = log_search
+        self.metrics = log_search.metrics
+        self.retention = timedelta(days=retention_days if retention_days is not None
+                                   else float(os.getenv("LOG_RETENTION_DAYS", 90)))
+        self.hourly_retention = timedelta(days=hourly_retention_days if hourly_retention_days is not None
+                                          else float(os.getenv("LOG_HOURLY_RETENTION_DAYS", 35)))
+        self.lag = timedelta(seconds=lag) if lag is not None else rollup_lag()
+
+    @property
+    def collection(self):
+        return self.log_search.collection
+
+    @property
+    def hourly(self):
+        return self.log_search.db[f"{self.collection.name}_hourly"]
+
+    @property
+    def daily(self):
+        return self.log_search.db[f"{self.collection.name}_daily"]
+
+    @property
+    def state(self):
+        return self.log_search.db[f"{self.collection.name}_rollup_state"]
+
+    def _aggregate(self, operation, collection, pipeline):
+        with self.metrics.timed("mongo", operation, pipeline) as call:
+            call["result"] = list(collection.aggregate(pipeline, allowDiskUse=True))
+        return call["result"]
+
+    def ensure_indexes(self):
+        """
+        Индексы свёрток и TTL-индексы: сырые события старше retention и почасовые
+        корзины старше hourly_retention удаляет сервер. Изменённый срок хранения
+        применяется к уже существующему индексу (collMod).
+        """
+        from pymongo import ASCENDING
+        for collection in (self.hourly, self.daily):
+            collection.create_index([("bucket", ASCENDING), ("search_type", ASCENDING), ("parameters", ASCENDING)],
+                                    unique=True)
+            collection.create_index([("search_type", ASCENDING), ("bucket", ASCENDING)])
+        self._ensure_ttl(self.hourly, "bucket", self.hourly_retention)
+        if self.retention:
+            self._ensure_ttl(self.collection, "timestamp", self.retention)
+
+    def _ensure_ttl(self, collection, field, retention):
+        from pymongo.errors import OperationFailure
+        seconds = int(retention.total_seconds())
+        try:
+            collection.create_index(field, expireAfterSeconds=seconds)
+        except OperationFailure as e:
+            # 85/86: индекс по этому полю уже есть с другими параметрами — меняем только срок
+            if e.code not in (85, 86):
+                raise
+            collection.database.command("collMod", collection.name,
+                                        index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds})
+
+    def watermark(self):
+        """Конец последнего свёрнутого часа или None, если свёртки ещё не было."""
+        document = self.state.find_one({"_id": "watermark"})
+        return document["until"] if document else None
+
+    def _first_event(self):
+        first = list(self.collection.find({}, {"timestamp": 1}).sort("timestamp", 1).limit(1))
+        return first[0]["timestamp"] if first else None
+
+    def rollup(self, now=None):
+        """
+        Сворачивает закончившиеся часы после отметки: почасовые корзины из сырого лога,
+        затем суточные корзины затронутых дней из почасовых. Работает по суткам,
+        отметка сдвигается после каждых суток. Затем заново сворачивает отмеченные часы
+        с запоздавшими событиями.
+        :return: {"hours": свёрнуто часов, "hourly": записано почасовых корзин,
+            "daily": записано суточных корзин, "until": новая отметка,
+            "late_hours": пересвёрнуто часов с запоздавшими событиями}
+        """
+        now = now or datetime.now()
+        until = floor_time(now - self.lag, HOUR)
+        start = self.watermark()
+        if start is None:
+            first = self._first_event()
+            start = floor_time(first, HOUR) if first is not None else until
+        summary = {"hours": 0, "hourly": 0, "daily": 0, "until": start}
+        while start < until:
+            end = min(floor_time(start, DAY) + DAY, until)
+            summary["hourly"] += self._rollup_hours(start, end)
+            summary["daily"] += self._rollup_day(floor_time(start, DAY))
+            self.state.replace_one({"_id": "watermark"}, {"_id": "watermark", "until": end}, upsert=True)
+            summary["hours"] += (end - start) // HOUR
+            summary["until"] = start = end
+        summary["late_hours"] = self._rollup_late(summary["until"], now, summary)
+        return summary
+
+    def _rollup_late(self, watermark, now, summary):
+        """
+        Пересворачивает отмеченные часы до отметки и суточные корзины их дней. Часы старше
+        срока хранения почасовых корзин не пересчитываются: суточная корзина собирается из
+        почасовых, а их уже удалил TTL.
+        """
+        marks = list(self.state.find({"_id.late": {"$exists": True}}))
+        days = set()
+        rolled = 0
+        for mark in marks:
+            hour = mark["_id"]["late"]
+            if hour < watermark and hour >= now - self.hourly_retention:
+                summary["hourly"] += self._rollup_hours(hour, hour + HOUR)
+                days.add(floor_time(hour, DAY))
+                rolled += 1
+        for day in sorted(days):
+            summary["daily"] += self._rollup_day(day)
+        for mark in marks:
+            # Часы после отметки свернёт обычный проход; отметку, обновлённую во время
+            # пересвёртки (новые запоздавшие события), оставляем до следующего запуска
+            self.state.delete_one({"_id": mark["_id"], "version": mark["version"]})
+        return rolled
+
+    def _rollup_hours(self, start, end):
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {"bucket": _bucket_expression(HOUR), "search_type": "$search_type",
+                        "parameters": "$parameters"},
+                "count": {"$sum": 1},
+                "last_seen": {"$max": "$timestamp"}
+            }}
+        ]
+        groups = self._aggregate("rollup.hourly", self.collection, pipeline)
+        return self._replace(self.hourly, groups)
+
+    def _rollup_day(self, day):
+        pipeline = [
+            {"$match": {"bucket": {"$gte": day, "$lt": day + DAY}}},
+            {"$group": {
+                "_id": {"search_type": "$search_type", "parameters": "$parameters"},
+                "count": {"$sum": "$count"},
+                "last_seen": {"$max": "$last_seen"}
+            }}
+        ]
+        groups = self._aggregate("rollup.daily", self.hourly, pipeline)
+        for group in groups:
+            group["_id"]["bucket"] = day
+        return self._replace(self.daily, groups)
+
+    def _replace(self, collection, groups):
+        from pymongo import ReplaceOne
+        operations = []
+        for group in groups:
+            key = {"bucket": group["_id"]["bucket"], "search_type": group["_id"].get("search_type"),
+                   "parameters": group["_id"].get("parameters") or {}}
+            operations.append(ReplaceOne(key, {**key, "count": group["count"], "last_seen": group["last_seen"]},
+                                         upsert=True))
+        if operations:
+            with self.metrics.timed("mongo", f"rollup.write.{collection.name}") as call:
+                collection.bulk_write(operations, ordered=False)
+                call["rows"] = len(operations)
+        return len(operations)
+
+    def top(self, window, search_type=None, extra_filter=None, limit=5, now=None):
+        """
+        Топ запросов за последнее окно window (timedelta или строка "24h", "7d").
+        Свёрнутые часы читаются из почасовых корзин, если окно в пределах их хранения,
+        а неполный первый час и ещё не свёрнутый хвост после отметки — из сырого лога.
+        Для более длинных окон используются суточные корзины, и начало окна
+        округляется вниз до начала суток.
+        :param search_type: тип поиска; без него — топ типов поиска
+        :param extra_filter: дополнительный фильтр по параметрам (например, _GENRE_YEARS_FILTER)
+        :return: [{"search_type", "parameters", "count"}] по убыванию count
+        """
+        window = parse_window(window)
+        now = now or datetime.now()
+        since = now - window
+        step, collection = (HOUR, self.hourly) if window <= self.hourly_retention else (DAY, self.daily)
+        group_id = "$parameters" if search_type else "$search_type"
+        query = {} if search_type is None else {"search_type": search_type, **(extra_filter or {})}
+        start = floor_time(since, step)
+        if step == HOUR and start < since:
+            start += HOUR
+        watermark = self.watermark()
+        counts = Counter()
+        if watermark is not None and start < watermark:
+            pipeline = [
+                {"$match": {**query, "bucket": {"$gte": start, "$lt": watermark}}},
+                {"$group": {"_id": group_id, "count": {"$sum": "$count"}}}
+            ]
+            for group in self._aggregate("rollup.top", collection, pipeline):
+                counts[self._group_key(group["_id"], search_type)] += group["count"]
+            ranges = [{"timestamp": {"$gte": watermark, "$lte": now}}]
+            if since < start:
+                ranges.append({"timestamp": {"$gte": since, "$lt": start}})
+        else:
+            ranges = [{"timestamp": {"$gte": since, "$lte": now}}]
+        pipeline = [
+            {"$match": {**query, "$or": ranges}},
+            {"$group": {"_id": group_id, "count": {"$sum": 1}}}
+        ]
+        for group in self._aggregate("rollup.top.tail", self.collection, pipeline):
+            counts[self._group_key(group["_id"], search_type)] += group["count"]
+        return [
+            {"search_type": search_type, "parameters": dict(key), "count": count} if search_type
+            else {"search_type": key, "parameters": None, "count": count}
+            for key, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+        ]
+
+    @staticmethod
+    def _group_key(value, search_type):
+        return _params_key(value) if search_type else value
@@ -0,0 +1,163 @@
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Локальный журнал предзаписи логов поиска: события дописываются в файл JSONL
+# (append-only) без обращения к MongoDB, а фоновый поток LogSearch загружает их
+# в MongoDB пачками. Перед загрузкой текущий файл переименовывается в сегмент
+# <path>.<время>.replay; сегмент удаляется только после загрузки всех событий,
+# а повторная загрузка после сбоя не создаёт дублей — у каждого события свой _id.
+# Файл журнала занимает один процесс: на время работы он держит блокировку <path>.lock.
+
+
+class SpoolLocked(RuntimeError):
+    """Файл журнала уже используется другим процессом."""
+
+
+def _try_lock(file):
+    """Неблокирующая монопольная блокировка открытого файла; False, если она занята."""
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _encode(entry):
+    return {**entry, "_id": str(entry["_id"]), "timestamp": entry["timestamp"].isoformat()}
+
+
+def _decode(record):
+    from bson import ObjectId
+    return {**record, "_id": ObjectId(record["_id"]), "timestamp": datetime.fromisoformat(record["timestamp"])}
+
+
+class LogSpool:
+    """
+    Файл предзаписи. append() только пишет в файл (данные попадают в кэш ОС и
+    переживают падение процесса); sync() делает fsync накопленных записей одним
+    вызовом — его выполняет фоновый поток, а не поток поиска.
+    Один файл журнала — на один процесс: второй процесс с тем же path получает SpoolLocked
+    (rotate переименовывает файл, и записи другого процесса в него терялись бы).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.appended = 0
+        self._file = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock_file = open(f"{path}.lock", "a+", encoding="utf-8")
+        if not _try_lock(self._lock_file):
+            self._lock_file.seek(0)
+            owner = self._lock_file.read().strip() or "?"
+            self._lock_file.close()
+            raise SpoolLocked(f"Журнал {path} уже используется процессом {owner}; "
+                              f"задайте каждому процессу свой LOG_SPOOL")
+        self._lock_file.seek(0)
+        self._lock_file.truncate()
+        self._lock_file.write(str(os.getpid()))
+        self._lock_file.flush()
+
+    def append(self, entries):
+        """Дописывает события в журнал."""
+        lines = "".join(json.dumps(_encode(entry), ensure_ascii=False, default=str) + "\n" for entry in entries)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(lines)
+            self._file.flush()
+            self._unsynced += len(entries)
+            self.appended += len(entries)
+
+    def sync(self):
+        """
+        fsync всех записей, дописанных после предыдущего вызова. Сам fsync выполняется
+        без блокировки (по копии дескриптора), поэтому append() его не ждёт.
+        """
+        with self._lock:
+            if self._file is None or not self._unsynced:
+                return
+            pending, self._unsynced = self._unsynced, 0
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        except OSError:
+            with self._lock:
+                self._unsynced += pending
+            raise
+        finally:
+            os.close(fd)
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def rotate(self):
+        """
+        Превращает текущий файл в сегмент для загрузки; новые события пойдут в новый файл.
+        :return: путь сегмента или None, если журнал пуст
+        """
+        # Основная часть fsync — без блокировки; под ней остаются только записи за это время
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                return None
+            segment = f"{self.path}.{time.time_ns()}.replay"
+            os.replace(self.path, segment)
+            return segment
+
+    def segments(self):
+        """Сегменты, ожидающие загрузки, от старых к новым."""
+        return sorted(glob.glob(glob.escape(self.path) + ".*.replay"))
+
+    @staticmethod
+    def read(segment, batch_size):
+        """
+        События сегмента пачками по batch_size. Недописанная при падении последняя
+        строка (некорректный JSON) пропускается.
+        """
+        batch = []
+        with open(segment, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    batch.append(_decode(json.loads(line)))
+                except (ValueError, KeyError):
+                    continue
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def remove(segment):
+        os.remove(segment)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                # Закрытие файла снимает блокировку
+                self._lock_file.close()
+                self._lock_file = None
@@ -1,19 +1,102 @@
+import time
+
+from log_rollup import LogRollup
+
+# Запрос по жанру и годам учитывается, только если указаны все три параметра
+_GENRE_YEARS_FILTER = {
+    "parameters.genre": {"$exists": True},
+    "parameters.from": {"$exists": True},
+    "parameters.to": {"$exists": True}
+}
+
+
 class LogStats:
     """
     Класс для анализа статистики логов поисковых запросов,
     сохранённых в MongoDB (через log_writer.collection).
     """
-    def __init__(self, log_search):
-        # Сохраняем коллекцию MongoDB из переданного log_writer
-        self.collection = log_search.collection
+    def __init__(self, log_search, use_counters=True, rollup=None):
+        """
+        :param use_counters: читать топы из счётчиков популярности (LogSearch.popularity),
+            а не агрегировать весь сырой лог
+        :param rollup: свёртки лога (LogRollup) для топов за окно времени;
+            по умолчанию создаются по log_search при первом обращении
+        """
+        # Коллекции MongoDB берутся из log_writer при обращении: подключение к MongoDB
+        # откладывается до первого запроса статистики
+        self.log_search = log_search
+        self.use_counters = use_counters
+        self.metrics = log_search.metrics
+        self._rollup = rollup
+
+    @property
+    def rollup(self):
+        if self._rollup is None:
+            self._rollup = LogRollup(self.log_search)
+        return self._rollup
+    @property
+    def collection(self):
+        return self.log_search.collection
+
+    @property
+    def popularity(self):
+        return self.log_search.popularity
+
+    @property
+    def recent(self):
+        return self.log_search.recent
 
-    def get_popular(self, limit=5):
+    def _aggregate(self, operation, collection, pipeline, **kwargs):
+        """Агрегация с замером времени; медленный конвейер попадает в журнал metrics."""
+        with self.metrics.timed("mongo", operation, pipeline) as call:
+            call["result"] = list(collection.aggregate(pipeline, **kwargs))
+        return call["result"]
+
+    def _find(self, operation, collection, query, sort_field, limit):
+        """Выборка по убыванию sort_field с замером времени."""
+        statement = {"find": query, "sort": {sort_field: -1}, "limit": limit}
+        with self.metrics.timed("mongo", operation, statement) as call:
+            call["result"] = list(collection.find(query, {"_id": 0}).sort(sort_field, -1).limit(limit))
+        return call["result"]
+
+    @staticmethod
+    def _counters_query(search_type=None, extra_filter=None):
+        """Фильтр счётчиков популярности; без search_type — счётчики по типам поиска."""
+        if search_type is None:
+            return {"kind": "type"}
+        return {"kind": "params", "search_type": search_type, **(extra_filter or {})}
+
+    def _top_counters(self, search_type=None, extra_filter=None, limit=5):
+        """
+        Топ счётчиков популярности по убыванию count: индекс kind + search_type + count,
+        для типов поиска — kind + count.
+        """
+        query = self._counters_query(search_type, extra_filter)
+        return self._find(f"stats.counters.{search_type or 'type'}", self.popularity, query, "count", limit)
+
+    def get_popular(self, limit=5, window=None):
         """
         Получить топ популярных поисков на основе количества повторений.
         Группировка только по типу поиска.
         :param limit: по дефолту 5
+        :param window: только запросы за последнее окно (timedelta или "24h", "7d") — по свёрткам
         """
-        pipeline = [
+        if window is not None:
+            return self._popular_rows(self.rollup.top(window, limit=limit))
+        if self.use_counters:
+            return self._popular_rows(self._top_counters(limit=limit))
+        return self._aggregate("stats.get_popular", self.collection, self._popular_pipeline(limit))
+
+    @staticmethod
+    def _popular_rows(docs):
+        return [{"search_type": doc["search_type"], "count": doc["count"]} for doc in docs]
+
+    @staticmethod
+    def _popular_pipeline(limit):
+        return [
+            # Сортировка по ключу группировки идёт по индексу search_type + timestamp
+            # (только по индексу, без чтения документов) вместо полного просмотра коллекции
+            {"$sort": {"search_type": 1}},
             {
                 "$group": {
                     "_id": "$search_type",  # Группировка только по типу поиска
@@ -30,14 +113,27 @@ class LogStats:
                 }
             }
         ]
-        return list(self.collection.aggregate(pipeline))
 
-    def get_popular_genre(self, limit=5):
+    def get_popular_genre(self, limit=5, window=None):
         """
         Получить топ популярных запросов по жанру и диапазону лет.
         :param limit: количество результатов
+        :param window: только запросы за последнее окно — по свёрткам
         """
-        pipeline = [
+        if window is not None:
+            return self._genre_rows(self.rollup.top(window, "by genre and years", _GENRE_YEARS_FILTER, limit))
+        if self.use_counters:
+            return self._genre_rows(self._top_counters("by genre and years", _GENRE_YEARS_FILTER, limit))
+        return self._aggregate("stats.get_popular_genre", self.collection, self._genre_pipeline(limit))
+
+    @staticmethod
+    def _genre_rows(docs):
+        return [{"genre": doc["parameters"]["genre"], "from": doc["parameters"]["from"],
+                 "to": doc["parameters"]["to"], "count": doc["count"]} for doc in docs]
+
+    @staticmethod
+    def _genre_pipeline(limit):
+        return [
             {"$match": {
                 "search_type": "by genre and years",
                 "parameters.genre": {"$exists": True},
@@ -62,14 +158,31 @@ class LogStats:
                 "count": 1
             }}
         ]
-        return list(self.collection.aggregate(pipeline))
+
+    @staticmethod
+    def _params_string(parameters):
+        """Значения параметров через запятую — так же, как $reduce/$toString в get_latest."""
+        def to_string(value):
+            if isinstance(value, bool):
+                return "true" if value else "false"
+            return str(value)
+        return ", ".join(to_string(value) for value in parameters.values())
 
     def get_latest(self, limit=5):
         """
         Получить последние уникальные поисковые запросы, отсортированные по времени (timestamp).
         :param limit: по дефолту 5
         """
-        pipeline = [
+        if self.use_counters:
+            # Один документ на уникальный запрос, выборка по индексу timestamp — O(limit)
+            cursor = self._find("stats.recent", self.recent, {}, "timestamp", limit)
+            return [{"search_type": doc["search_type"], "params": self._params_string(doc["parameters"]),
+                     "count": doc.get("result_count")} for doc in cursor]
+        return self._aggregate("stats.get_latest", self.collection, self._latest_pipeline(limit))
+
+    @staticmethod
+    def _latest_pipeline(limit):
+        return [
             {"$sort": {"timestamp": -1}},  # Сортировка по убыванию времени
             {
                 "$group": {
@@ -111,14 +224,27 @@ class LogStats:
                 }
             }
         ]
-        return list(self.collection.aggregate(pipeline))
 
 
-    def get_popular_films_by_title(self, limit=5):
+    def get_popular_films_by_title(self, limit=5, window=None):
         """
         Получить топ популярных фильмов по названию.
+        :param window: только запросы за последнее окно — по свёрткам
         """
-        pipeline = [
+        if window is not None:
+            return self._title_rows(self.rollup.top(window, "by title", limit=limit))
+        if self.use_counters:
+            # Параметры в счётчиках уже нормализованы (нижний регистр)
+            return self._title_rows(self._top_counters("by title", limit=limit))
+        return self._aggregate("stats.get_popular_films_by_title", self.collection, self._title_pipeline(limit))
+
+    @staticmethod
+    def _title_rows(docs):
+        return [{"title": doc["parameters"].get("title"), "count": doc["count"]} for doc in docs]
+
+    @staticmethod
+    def _title_pipeline(limit):
+        return [
             {"$match": {"search_type": "by title"}},
             {"$addFields": {
                 "normalized_title": {"$toLower": "$parameters.title"}
@@ -136,11 +262,25 @@ class LogStats:
                 "count": 1
             }}
         ]
-        return list(self.collection.aggregate(pipeline))
 
-    def get_popular_actors(self, limit=5):
-        """Получить топ популярных актеров."""
-        pipeline = [
+    def get_popular_actors(self, limit=5, window=None):
+        """
+        Получить топ популярных актеров.
+        :param window: только запросы за последнее окно (например, "24h" или "7d") — по свёрткам
+        """
+        if window is not None:
+            return self._actor_rows(self.rollup.top(window, "by actor", limit=limit))
+        if self.use_counters:
+            return self._actor_rows(self._top_counters("by actor", limit=limit))
+        return self._aggregate("stats.get_popular_actors", self.collection, self._actor_pipeline(limit))
+
+    @staticmethod
+    def _actor_rows(docs):
+        return [{"actor_name": doc["parameters"].get("actor"), "count": doc["count"]} for doc in docs]
+
+    @staticmethod
+    def _actor_pipeline(limit):
+        return [
             {"$match": {"search_type": "by actor"}},
             {"$group": {
                 "_id": "$parameters.actor",
@@ -154,6 +294,100 @@ class LogStats:
                 "count": 1
             }}
         ]
-        return list(self.collection.aggregate(pipeline))
 
+    def _raw_facet(self, limit):
+        """Все секции одним $facet по сырому логу: коллекция читается один раз."""
+        pipeline = self._raw_facet_pipeline(limit)
+        return next(iter(self._aggregate("stats.dashboard.raw", self.collection, pipeline, allowDiskUse=True)), {})
 
+    def _raw_facet_pipeline(self, limit):
+        return [{"$facet": {
+            "popular": self._popular_pipeline(limit),
+            "genre_and_years": self._genre_pipeline(limit),
+            "titles": self._title_pipeline(limit),
+            "actors": self._actor_pipeline(limit),
+            "latest": self._latest_pipeline(limit),
+        }}]
+
+    @staticmethod
+    def _timed(func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - started
+
+    def windowed(self, window, limit=5):
+        """Топы popular, genre_and_years, titles и actors за последнее окно window по свёрткам."""
+        return {
+            "popular": self.get_popular(limit, window),
+            "genre_and_years": self.get_popular_genre(limit, window),
+            "titles": self.get_popular_films_by_title(limit, window),
+            "actors": self.get_popular_actors(limit, window),
+        }
+
+    def explain_plans(self, limit=5):
+        """
+        Планы MongoDB (explain) для конвейеров сырого лога и выборок счётчиков популярности
+        и последних запросов — включая те, что выполняет dashboard в текущем режиме:
+        в режиме счётчиков это те же выборки, без счётчиков — общий $facet по сырому логу
+        (stats.dashboard.raw; он читает всю коллекцию).
+        :return: {операция: документ explain}
+        """
+        aggregations = {
+            "stats.get_popular": self._popular_pipeline(limit),
+            "stats.get_popular_genre": self._genre_pipeline(limit),
+            "stats.get_popular_films_by_title": self._title_pipeline(limit),
+            "stats.get_popular_actors": self._actor_pipeline(limit),
+            "stats.get_latest": self._latest_pipeline(limit),
+        }
+        if not self.use_counters:
+            aggregations["stats.dashboard.raw"] = self._raw_facet_pipeline(limit)
+        finds = {
+            "stats.counters.type": (self.popularity, self._counters_query(), "count"),
+            "stats.counters.by genre and years": (
+                self.popularity, self._counters_query("by genre and years", _GENRE_YEARS_FILTER), "count"),
+            "stats.counters.by title": (self.popularity, self._counters_query("by title"), "count"),
+            "stats.counters.by actor": (self.popularity, self._counters_query("by actor"), "count"),
+            "stats.recent": (self.recent, {}, "timestamp"),
+        }
+        plans = {}
+        for operation, pipeline in aggregations.items():
+            with self.metrics.timed("mongo", f"explain.{operation}", pipeline):
+                plans[operation] = self.collection.database.command(
+                    "aggregate", self.collection.name, pipeline=pipeline, explain=True)
+        for operation, (collection, query, sort_field) in finds.items():
+            with self.metrics.timed("mongo", f"explain.{operation}", query):
+                plans[operation] = collection.find(query, {"_id": 0}).sort(sort_field, -1).limit(limit).explain()
+        return plans
+
+    def dashboard(self, limit=5):
+        """
+        Все разделы экрана статистики: popular, genre_and_years, titles, actors и latest.
+        В режиме счётчиков каждый раздел — отдельная выборка топа по индексу
+        (kind + search_type + count, kind + count или timestamp последних запросов), все выборки идут
+        параллельно. Без счётчиков все разделы — один $facet по сырому логу.
+        :return: {"sections": {раздел: строки}, "timings": {раздел: секунды, "total": секунды}};
+            разделы одного $facet показывают время этого общего запроса
+        """
+        started = time.perf_counter()
+        timings = {}
+        if self.use_counters:
+            from concurrent.futures import ThreadPoolExecutor
+            sections_calls = {
+                "popular": self.get_popular,
+                "genre_and_years": self.get_popular_genre,
+                "titles": self.get_popular_films_by_title,
+                "actors": self.get_popular_actors,
+                "latest": self.get_latest,
+            }
+            sections = {}
+            with ThreadPoolExecutor(max_workers=len(sections_calls), thread_name_prefix="stats") as executor:
+                futures = {name: executor.submit(self._timed, call, limit) for name, call in sections_calls.items()}
+                for name, future in futures.items():
+                    sections[name], timings[name] = future.result()
+        else:
+            sections, facet_seconds = self._timed(self._raw_facet, limit)
+            for name in ("popular", "genre_and_years", "titles", "actors", "latest"):
+                sections.setdefault(name, [])
+                timings[name] = facet_seconds
+        timings["total"] = time.perf_counter() - started
+        return {"sections": sections, "timings": timings}
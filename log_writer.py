@@ -1,25 +1,213 @@
-from pymongo.errors import PyMongoError, ServerSelectionTimeoutError, OperationFailure, WriteError
-
-from formatter import RESET, RED
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from config import load_env
+from formatter import GREEN, RESET, RED
+from log_rollup import mark_late_hours, rollup_lag
+from log_spool import LogSpool
+from metrics import METRICS
+import atexit
 import os
+import threading
+import time
+from collections import Counter, deque
 from datetime import datetime
 
 # Загружаем переменные окружения
-load_dotenv()
+load_env()
+
+
+# Индексы сырого лога под запросы LogStats и LogRollup: (ключ, параметры create_index).
+# Частичные индексы по search_type содержат только записи своего типа поиска и
+# покрывают группировку по его параметрам.
+LOG_INDEXES = (
+    # get_latest (сортировка по убыванию времени — обратный проход); тот же ключ у TTL-индекса
+    # LogRollup, поэтому при включённом сроке хранения используется он
+    ([("timestamp", 1)], {}),
+    # get_popular (группировка по search_type) и хвосты топов за окно в LogRollup
+    ([("search_type", 1), ("timestamp", 1)], {}),
+    ([("search_type", 1), ("parameters.genre", 1), ("parameters.from", 1), ("parameters.to", 1)],
+     {"partialFilterExpression": {"search_type": "by genre and years",
+                                  "parameters.genre": {"$exists": True},
+                                  "parameters.from": {"$exists": True},
+                                  "parameters.to": {"$exists": True}}}),
+    ([("search_type", 1), ("parameters.title", 1)], {"partialFilterExpression": {"search_type": "by title"}}),
+    ([("search_type", 1), ("parameters.actor", 1)], {"partialFilterExpression": {"search_type": "by actor"}}),
+)
+
+# Индексы счётчиков популярности: уникальный ключ для upsert с $inc, топ параметров одного
+# типа поиска (kind + search_type + count) и топ типов поиска ({kind: "type"} по count)
+POPULARITY_INDEXES = (
+    ([("kind", 1), ("search_type", 1), ("parameters", 1)], {"unique": True}),
+    ([("kind", 1), ("search_type", 1), ("count", -1)], {}),
+    ([("kind", 1), ("count", -1)], {}),
+)
+
+# Что делать с новой записью, если очередь буферизованной записи заполнена
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest", "block")
+
+
+class _Connected:
+    """
+    Атрибут LogSearch, которому нужно подключение к MongoDB (client, db, коллекции).
+    pymongo импортируется и клиент создаётся при первом чтении любого такого атрибута.
+    """
+    def __set_name__(self, owner, name):
+        self.name = f"_{name}"
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if not instance._connected:
+            instance._connect()
+        return instance.__dict__.get(self.name)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
 
 
 class LogSearch:
     """Класс для логирования поисковых запросов в MongoDB."""
 
-    def __init__(self):
-        try:
-            self.client = MongoClient(os.getenv("MONGO_URI"))
-            self.db = self.client[os.getenv("MONGO_DB_NAME")]
-            self.collection = self.db[os.getenv("MONGO_COLLECTION_NAME")]
-        except ServerSelectionTimeoutError as e:
-            print(f"{RED}Ошибка подключения к MongoDB: {e}{RESET}")
+    client = _Connected()
+    db = _Connected()
+    collection = _Connected()
+    # Счётчики популярности запросов, обновляются при каждой записи лога
+    popularity = _Connected()
+    # Последние уникальные запросы: один документ на (search_type, parameters)
+    recent = _Connected()
+
+    def __init__(self, buffered=False, batch_size=None, flush_interval=None, max_queue=None, overflow=None,
+                 recent_limit=None, client=None, metrics=None, spool=None, indexes=None):
+        """
+        :param buffered: писать логи пачками в фоновом потоке, не задерживая поиск
+        :param batch_size: размер пачки insert_many (по умолчанию LOG_BATCH_SIZE или 100)
+        :param flush_interval: максимум секунд ожидания неполной пачки (LOG_FLUSH_INTERVAL или 1)
+        :param max_queue: размер очереди в памяти (LOG_QUEUE_SIZE или 10000)
+        :param overflow: поведение при переполнении очереди (LOG_OVERFLOW):
+            drop_new — отбросить новую запись, drop_oldest — самую старую, block — ждать
+        :param recent_limit: сколько уникальных последних запросов хранить (LOG_RECENT_LIMIT или 1000)
+        :param client: готовый клиент MongoDB (по умолчанию MongoClient(MONGO_URI),
+            создаётся при первом обращении к MongoDB)
+        :param metrics: реестр замеров запросов (по умолчанию общий metrics.METRICS)
+        :param spool: файл журнала предзаписи (LOG_SPOOL): события пишутся в него, а в MongoDB
+            их загружает фоновый поток, поэтому недоступность MongoDB не задерживает поиск;
+            buffered тогда не используется
+        :param indexes: создавать индексы лога (ensure_indexes) при подключении к MongoDB
+            (по умолчанию LOG_ENSURE_INDEXES или 1)
+        """
+        spool = spool or os.getenv("LOG_SPOOL") or None
+        self.buffered = buffered and spool is None
+        self.metrics = metrics if metrics is not None else METRICS
+        self.batch_size = batch_size or int(os.getenv("LOG_BATCH_SIZE", 100))
+        self.flush_interval = flush_interval or float(os.getenv("LOG_FLUSH_INTERVAL", 1))
+        self.max_queue = max_queue or int(os.getenv("LOG_QUEUE_SIZE", 10000))
+        self.overflow = overflow or os.getenv("LOG_OVERFLOW", "drop_new")
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow должен быть одним из {OVERFLOW_POLICIES}")
+        self.recent_limit = recent_limit or int(os.getenv("LOG_RECENT_LIMIT", 1000))
+        self.indexes = indexes if indexes is not None else os.getenv("LOG_ENSURE_INDEXES", "1") == "1"
+        # События старше этого могли опоздать к свёртке LogRollup (mark_late_hours)
+        self.rollup_lag = rollup_lag()
+        self._recent_writes = 0
+        # Счётчики буферизованной записи
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue = deque()
+        self._in_flight = 0
+        self._flush_waiters = 0
+        self._closing = False
+        self._cond = threading.Condition()
+        self._writer = None
+        self._popularity_indexed = False
+        self._connected = False
+        self._connect_lock = threading.Lock()
+        self.client = client
+        # Журнал предзаписи и поток его загрузки в MongoDB
+        self._spool = None
+        self._spool_thread = None
+        self._spool_cond = threading.Condition()
+        self._spool_closing = False
+        # Номера загрузок журнала: начатой последней, завершённой целиком последней и
+        # нужной flush(); загрузка, начатая после вызова flush, содержит все его события
+        self._replay_started = 0
+        self._replay_done = 0
+        self._spool_wanted = 0
+        self._spool_signalled = False
+        self.replayed = 0
+        self.duplicates = 0
+        self.mongo_available = True
+        if spool is not None:
+            self._spool = LogSpool(spool)
+            self.sync_interval = float(os.getenv("LOG_SPOOL_SYNC_INTERVAL", 0.2))
+            self.retry_max = float(os.getenv("LOG_SPOOL_RETRY_MAX", 30))
+            self._spool_thread = threading.Thread(target=self._spool_loop, name="log-spool", daemon=True)
+            self._spool_thread.start()
+            atexit.register(self.close)
+        if self.buffered:
+            self._writer = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+            self._writer.start()
+            # Остаток очереди записывается при выходе из программы
+            atexit.register(self.close)
+
+    def _connect(self):
+        """Создаёт клиент MongoDB и коллекции; уже заданные атрибуты не меняются."""
+        with self._connect_lock:
+            if self._connected:
+                return
+            from pymongo import MongoClient
+            from pymongo.errors import ServerSelectionTimeoutError
+            state = self.__dict__
+            try:
+                if state.get("_client") is None:
+                    # Недоступный сервер обнаруживается за MONGO_TIMEOUT_MS, а не за 30 с по умолчанию
+                    timeout = int(os.getenv("MONGO_TIMEOUT_MS", 2000))
+                    state["_client"] = MongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=timeout,
+                                                   connectTimeoutMS=timeout)
+                if state.get("_db") is None:
+                    state["_db"] = state["_client"][os.getenv("MONGO_DB_NAME")]
+                if state.get("_collection") is None:
+                    state["_collection"] = state["_db"][os.getenv("MONGO_COLLECTION_NAME")]
+                name = state["_collection"].name
+                if state.get("_popularity") is None:
+                    state["_popularity"] = state["_db"][os.getenv("MONGO_POPULARITY_COLLECTION_NAME",
+                                                                  f"{name}_popularity")]
+                if state.get("_recent") is None:
+                    state["_recent"] = state["_db"][os.getenv("MONGO_RECENT_COLLECTION_NAME", f"{name}_recent")]
+            except ServerSelectionTimeoutError as e:
+                print(f"{RED}Ошибка подключения к MongoDB: {e}{RESET}")
+            self._connected = True
+        # Индексы создаёт только поток, выполнивший подключение, и уже без блокировки:
+        # ensure_indexes обращается к коллекциям через те же атрибуты
+        if self.indexes and self.__dict__.get("_collection") is not None:
+            from pymongo.errors import PyMongoError
+            try:
+                self.ensure_indexes()
+            except PyMongoError as e:
+                print(f"{RED}Не удалось создать индексы лога поиска: {e}{RESET}")
+
+    def ensure_indexes(self):
+        """
+        Создаёт индексы сырого лога (LOG_INDEXES), счётчиков популярности и последних
+        запросов. Повторный вызов ничего не меняет: существующие индексы с теми же
+        ключом и параметрами create_index пропускает.
+        :return: имена индексов сырого лога
+        """
+        from pymongo.errors import OperationFailure
+        names = []
+        with self.metrics.timed("mongo", "log.ensure_indexes"):
+            for keys, options in LOG_INDEXES:
+                try:
+                    names.append(self.collection.create_index(keys, **options))
+                except OperationFailure as e:
+                    # 85/86: индекс с тем же ключом, но другими параметрами (TTL-индекс LogRollup) уже есть
+                    if e.code not in (85, 86):
+                        raise
+                    names.append(next(name for name, index in self.collection.index_information().items()
+                                      if index["key"] == keys))
+            self._ensure_popularity_indexes()
+            self._ensure_recent_indexes()
+        self._popularity_indexed = True
+        return names
 
     def _normalize_params(self, params):
         """Нормализует параметры: сортировка ключей, приведение строк к нижнему регистру, удаление пробелов."""
@@ -33,16 +221,88 @@ class LogSearch:
 
     def log_search(self, search_type, parameters, result_count):
         """Логирует поисковый запрос."""
+        from bson import ObjectId
         normalized_params = self._normalize_params(parameters)
         log_entry = {
+            # _id задаётся на клиенте: повторная запись того же события не создаёт дубль
+            "_id": ObjectId(),
             "search_type": search_type.strip().lower(),
             "parameters": normalized_params,
             "result_count": result_count,
             "timestamp": datetime.now()
         }
 
+        if self._spool is not None:
+            self._spool.append([log_entry])
+            # Поток загрузки будится один раз на пачку и только при доступной MongoDB:
+            # во время сбоя он повторяет попытки по своему расписанию
+            if (self.mongo_available and not self._spool_signalled
+                    and self._spool.appended - self.replayed >= self.batch_size):
+                with self._spool_cond:
+                    self._spool_signalled = True
+                    self._spool_cond.notify_all()
+        elif self.buffered:
+            self._enqueue(log_entry)
+        else:
+            self._write([log_entry])
+
+    def _store(self, entries):
+        """
+        Записывает пачку логов в MongoDB. Событие вставляется с флагом pending, который
+        снимается после обновления счётчиков популярности и последних запросов. Повторно
+        отправленное событие (его _id уже есть в коллекции) не вставляется, а счётчики
+        обновляются, только если флаг pending у него остался: предыдущая попытка
+        записала сырое событие, но упала до счётчиков. Ошибки MongoDB пробрасываются.
+        :return: число новых событий
+        """
+        with self.metrics.timed("mongo", "log.insert") as call:
+            inserted, duplicates = self._insert_new([{**entry, "pending": True} for entry in entries])
+            call["result"] = inserted
+        if duplicates:
+            with self.metrics.timed("mongo", "log.pending") as call:
+                pending = {document["_id"] for document in self.collection.find(
+                    {"_id": {"$in": [entry["_id"] for entry in duplicates]}, "pending": True}, {"_id": 1})}
+                call["rows"] = len(pending)
+            duplicates = [entry for entry in duplicates if entry["_id"] in pending]
+        unapplied = inserted + duplicates
+        if unapplied:
+            self._count_popularity(unapplied)
+            self._remember_recent(unapplied)
+            with self.metrics.timed("mongo", "log.late_hours") as call:
+                call["rows"] = mark_late_hours(self.db[f"{self.collection.name}_rollup_state"], unapplied,
+                                               self.rollup_lag)
+            with self.metrics.timed("mongo", "log.applied"):
+                self.collection.update_many({"_id": {"$in": [entry["_id"] for entry in unapplied]}},
+                                            {"$unset": {"pending": ""}})
+        return len(inserted)
+
+    def _insert_new(self, entries):
+        """
+        insert_many без остановки на ошибках отдельных событий: дубли _id пропускаются,
+        остальные отклонённые сервером события выводятся и отбрасываются.
+        :return: (вставленные события, события с уже существующим _id)
+        """
+        from pymongo.errors import BulkWriteError
+        try:
+            self.collection.insert_many(entries, ordered=False)
+            return entries, []
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            duplicate = {error["index"] for error in errors if error.get("code") == 11000}
+            rejected = [error for error in errors if error.get("code") != 11000]
+            self.duplicates += len(duplicate)
+            if rejected:
+                print(f"{RED}MongoDB отклонила событий лога: {len(rejected)} ({rejected[0].get('errmsg')}){RESET}")
+            skipped = {error["index"] for error in errors}
+            return ([entry for i, entry in enumerate(entries) if i not in skipped],
+                    [entries[i] for i in sorted(duplicate)])
+
+    def _write(self, entries):
+        """Записывает пачку логов в MongoDB, возвращает True при успехе."""
+        from pymongo.errors import PyMongoError, OperationFailure, WriteError
         try:
-            self.collection.insert_one(log_entry)
+            self._store(entries)
+            return True
         except WriteError as e:
             print(f"{RED}Ошибка записи в MongoDB: {e}{RESET}")
         except OperationFailure as e:
@@ -51,5 +311,317 @@ class LogSearch:
             print(f"{RED}Ошибка MongoDB: {e}{RESET}")
         except Exception as e:
             print(f"{RED}Непредвиденная ошибка при логировании: {e}{RESET}")
+        return False
+
+    @staticmethod
+    def _popularity_key(search_type, parameters):
+        """
+        Ключ счётчика: kind="type" — все запросы данного типа,
+        kind="params" — запросы с конкретными нормализованными параметрами.
+        """
+        if parameters is None:
+            return {"kind": "type", "search_type": search_type, "parameters": None}
+        return {"kind": "params", "search_type": search_type, "parameters": parameters}
+
+    def _ensure_popularity_indexes(self, collection=None):
+        """Индексы коллекции счётчиков (POPULARITY_INDEXES)."""
+        collection = collection if collection is not None else self.popularity
+        for keys, options in POPULARITY_INDEXES:
+            collection.create_index(keys, **options)
+
+    def _count_popularity(self, entries):
+        """Увеличивает счётчики популярности ($inc с upsert) для пачки логов."""
+        from pymongo import UpdateOne
+        if not self._popularity_indexed:
+            self._ensure_popularity_indexes()
+            self._ensure_recent_indexes()
+            self._popularity_indexed = True
+        increments = Counter()
+        last_seen = {}
+        for entry in entries:
+            for parameters in (None, tuple(entry["parameters"].items())):
+                key = (entry["search_type"], parameters)
+                increments[key] += 1
+                last_seen[key] = entry["timestamp"]
+        operations = [
+            UpdateOne(self._popularity_key(search_type, dict(parameters) if parameters is not None else None),
+                      {"$inc": {"count": count}, "$max": {"last_seen": last_seen[(search_type, parameters)]}},
+                      upsert=True)
+            for (search_type, parameters), count in increments.items()
+        ]
+        with self.metrics.timed("mongo", "log.popularity") as call:
+            self.popularity.bulk_write(operations, ordered=False)
+            call["rows"] = len(operations)
+
+    def _ensure_recent_indexes(self):
+        """Индексы последних запросов: уникальный ключ для upsert и timestamp для выборки."""
+        from pymongo import ASCENDING, DESCENDING
+        self.recent.create_index([("search_type", ASCENDING), ("parameters", ASCENDING)], unique=True)
+        self.recent.create_index([("timestamp", DESCENDING)])
+
+    def _remember_recent(self, entries):
+        """Обновляет последние уникальные запросы (upsert по search_type + parameters)."""
+        from pymongo import UpdateOne
+        latest = {}
+        for entry in entries:
+            latest[(entry["search_type"], tuple(entry["parameters"].items()))] = entry
+        with self.metrics.timed("mongo", "log.recent") as call:
+            call["rows"] = len(latest)
+            self.recent.bulk_write([
+                UpdateOne({"search_type": entry["search_type"], "parameters": entry["parameters"]},
+                          {"$set": {"timestamp": entry["timestamp"], "result_count": entry["result_count"]}},
+                          upsert=True)
+                for entry in latest.values()
+            ], ordered=False)
+        self._recent_writes += len(latest)
+        # Обрезаем коллекцию не на каждой записи, а примерно раз в recent_limit / 10 запросов
+        if self._recent_writes >= max(1, self.recent_limit // 10):
+            self._recent_writes = 0
+            self._trim_recent()
+
+    def _trim_recent(self):
+        """Удаляет запросы старше recent_limit последних."""
+        with self.metrics.timed("mongo", "log.trim_recent"):
+            boundary = list(self.recent.find({}, {"timestamp": 1}).sort("timestamp", -1)
+                            .skip(self.recent_limit - 1).limit(1))
+            if boundary:
+                self.recent.delete_many({"timestamp": {"$lt": boundary[0]["timestamp"]}})
+
+    def rebuild_recent(self):
+        """Заполняет последние уникальные запросы по сырому логу."""
+        pipeline = [
+            {"$sort": {"timestamp": -1}},
+            {"$group": {
+                "_id": {"search_type": "$search_type", "parameters": "$parameters"},
+                "timestamp": {"$first": "$timestamp"},
+                "result_count": {"$first": "$result_count"}
+            }},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": self.recent_limit}
+        ]
+        documents = [
+            {"search_type": group["_id"].get("search_type"), "parameters": group["_id"].get("parameters") or {},
+             "timestamp": group["timestamp"], "result_count": group["result_count"]}
+            for group in self.collection.aggregate(pipeline, allowDiskUse=True)
+        ]
+        self.recent.delete_many({})
+        self._ensure_recent_indexes()
+        if documents:
+            self.recent.insert_many(documents, ordered=False)
+        return len(documents)
+
+    def rebuild_popularity(self, batch_size=1000):
+        """
+        Пересчитывает счётчики популярности по всему сырому логу.
+        Счётчики собираются во временной коллекции и атомарно подменяют текущие;
+        запросы, залогированные во время пересчёта, могут не попасть в счётчики.
+        :return: количество записанных счётчиков
+        """
+        from pymongo import ReplaceOne
+        pipeline = [
+            {"$group": {
+                "_id": {"search_type": "$search_type", "parameters": "$parameters"},
+                "count": {"$sum": 1},
+                "last_seen": {"$max": "$timestamp"}
+            }}
+        ]
+        target = self.db[f"{self.popularity.name}_rebuild"]
+        target.drop()
+        self._ensure_popularity_indexes(target)
+        totals = Counter()
+        type_last_seen = {}
+        written = 0
+        batch = []
+        for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            search_type = group["_id"].get("search_type")
+            totals[search_type] += group["count"]
+            if group["last_seen"] is not None:
+                type_last_seen[search_type] = max(group["last_seen"], type_last_seen.get(search_type, group["last_seen"]))
+            key = self._popularity_key(search_type, group["_id"].get("parameters") or {})
+            batch.append(ReplaceOne(key, {**key, "count": group["count"], "last_seen": group["last_seen"]},
+                                    upsert=True))
+            if len(batch) >= batch_size:
+                target.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        for search_type, count in totals.items():
+            key = self._popularity_key(search_type, None)
+            batch.append(ReplaceOne(key, {**key, "count": count, "last_seen": type_last_seen.get(search_type)},
+                                    upsert=True))
+        if batch:
+            target.bulk_write(batch, ordered=False)
+            written += len(batch)
+        if written:
+            target.rename(self.popularity.name, dropTarget=True)
+        else:
+            target.drop()
+            self.popularity.delete_many({})
+        self._popularity_indexed = True
+        return written
+
+    def _enqueue(self, log_entry):
+        """Кладёт запись в очередь фоновой записи с учётом политики переполнения."""
+        with self._cond:
+            if self.overflow == "block":
+                while len(self._queue) >= self.max_queue and not self._closing:
+                    self._cond.wait()
+            if not self._closing:
+                if len(self._queue) >= self.max_queue:
+                    self.dropped += 1
+                    if self.overflow == "drop_new":
+                        return
+                    self._queue.popleft()
+                self._queue.append(log_entry)
+                # Будим поток на первой записи (запуск таймера) и на заполненной пачке
+                if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+                return
+        # Фоновый поток уже остановлен — пишем сразу
+        self._write([log_entry])
+
+    def _writer_loop(self):
+        """Фоновый поток: записывает пачку, когда она заполнена или истёк flush_interval."""
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                deadline = time.monotonic() + self.flush_interval
+                while (len(self._queue) < self.batch_size and not self._closing
+                       and not self._flush_waiters):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                self._cond.notify_all()
+            ok = self._write(batch)
+            with self._cond:
+                self._in_flight = 0
+                self.batches += 1
+                if ok:
+                    self.flushed += len(batch)
+                else:
+                    self.failed += len(batch)
+                self._cond.notify_all()
+
+    def _spool_loop(self):
+        """
+        Фоновый поток журнала предзаписи: раз в sync_interval делает fsync новых записей,
+        раз в flush_interval (или при заполненной пачке) загружает журнал в MongoDB.
+        Пока MongoDB недоступна, попытки повторяются с растущей паузой до retry_max секунд.
+        """
+        next_replay = 0
+        delay = self.flush_interval
+        while True:
+            with self._spool_cond:
+                if not self._spool_closing:
+                    self._spool_cond.wait(self.sync_interval)
+                closing = self._spool_closing
+                wanted = (self._spool_wanted > self._replay_done
+                          or self._spool.appended - self.replayed >= self.batch_size)
+            self._spool.sync()
+            if closing or time.monotonic() >= next_replay or (wanted and self.mongo_available):
+                if self._replay():
+                    delay = self.flush_interval
+                else:
+                    delay = min(self.retry_max, max(delay * 2, 1))
+                next_replay = time.monotonic() + delay
+            if closing:
+                return
+
+    def _replay(self):
+        """Загружает сегменты журнала в MongoDB; True, если журнал загружен целиком."""
+        from pymongo.errors import PyMongoError
+        with self._spool_cond:
+            self._replay_started += 1
+            number = self._replay_started
+            self._spool_signalled = False
+        try:
+            # Текущий файл становится самым новым сегментом: загружаются все события,
+            # записанные до начала загрузки, и сегменты прошлых запусков
+            self._spool.rotate()
+            for segment in self._spool.segments():
+                for batch in self._spool.read(segment, self.batch_size):
+                    self._store(batch)
+                    with self._spool_cond:
+                        self.replayed += len(batch)
+                self._spool.remove(segment)
+        except PyMongoError as e:
+            if self.mongo_available:
+                print(f"{RED}MongoDB недоступна, логи поиска копятся в {self._spool.path}: {e}{RESET}")
+            self.mongo_available = False
+            return False
+        except OSError as e:
+            print(f"{RED}Ошибка чтения журнала {self._spool.path}: {e}{RESET}")
+            return False
+        if not self.mongo_available:
+            print(f"{GREEN}MongoDB снова доступна, журнал {self._spool.path} загружен{RESET}")
+        self.mongo_available = True
+        with self._spool_cond:
+            self._replay_done = max(self._replay_done, number)
+            self._spool_cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Дожидается записи всех накопленных логов."""
+        if self._spool_thread is not None:
+            with self._spool_cond:
+                # Нужна загрузка, которая начнётся после этого вызова и завершится целиком
+                target = self._replay_started + 1
+                self._spool_wanted = max(self._spool_wanted, target)
+                self._spool_cond.notify_all()
+                self._spool_cond.wait_for(lambda: self._replay_done >= target or not self._spool_thread.is_alive(),
+                                          timeout)
+            return
+        if self._writer is None:
+            return
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                self._cond.wait_for(lambda: not (self._queue or self._in_flight)
+                                    or not self._writer.is_alive(), timeout)
+            finally:
+                self._flush_waiters -= 1
 
+    def counters(self):
+        """Счётчики буферизованной записи (и журнала предзаписи, если он включён)."""
+        if self._spool is not None:
+            with self._spool_cond:
+                return {
+                    "spooled": self._spool.appended,
+                    "replayed": self.replayed,
+                    "duplicates": self.duplicates,
+                    "mongo_available": self.mongo_available,
+                }
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
 
+    def close(self):
+        """Записывает остаток очереди и останавливает фоновый поток."""
+        if self._spool_thread is not None:
+            # Последняя попытка загрузки; незагруженное останется в журнале до следующего запуска
+            with self._spool_cond:
+                self._spool_closing = True
+                self._spool_cond.notify_all()
+            self._spool_thread.join()
+            self._spool_thread = None
+            self._spool.close()
+            atexit.unregister(self.close)
+        if self._writer is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._writer = None
+        atexit.unregister(self.close)
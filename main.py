@@ -1,9 +1,16 @@
-from pymongo.errors import PyMongoError
-from pymysql.err import MySQLError, OperationalError, ProgrammingError, InternalError
-from db_connector import DBConnector
+import argparse
+import json
+import os
+import sys
+
+# Драйверы MongoDB/MySQL и модули отдельных режимов импортируются при первом
+# использовании: меню появляется без ожидания подключений
+from db_connector import DBConnector, RESULT_COLUMNS
 from log_writer import LogSearch
 from formatter import GREEN, MAGENTA, RESET, BERUSA, RED
 from log_stats import LogStats
+from metrics import METRICS
+from result_cache import ResultCache
 
 def main_menu():
     print(f"{MAGENTA}\n*** WELCOME TO FILM SEARCH ***{RESET}")
@@ -13,36 +20,41 @@ def main_menu():
     print("3. Search for popular queries")
     print("4. Search by actor")
     print("5. Exit")
+    print("6. Query latency stats")
+    print("7. Search by keyword")
 
     while True:
         choice_input = input(f"{GREEN}Your choice: {RESET}").strip()
         if not choice_input.isdigit():
-            print("Please enter a number between 1 and 5.")
+            print("Please enter a number between 1 and 7.")
             continue
         choice = int(choice_input)
-        if choice in range(1, 6):
+        if choice in range(1, 8):
             return choice
         else:
-            print("Please choose a number between 1 and 5.")
+            print("Please choose a number between 1 and 7.")
 
-def print_paginated_results(results, description_func=None, limit=10):
-    offset = 0
-    while True:
-        batch = results[offset:offset + limit]
-        if not batch:
-            break
-        for i, entry in enumerate(batch, offset + 1):
+def print_paginated_results(pages, description_func=None, limit=10):
+    """
+    Постраничный вывод результатов.
+    :param pages: ленивый итератор страниц (KeysetPages) или готовый список результатов
+    """
+    if isinstance(pages, list):
+        pages = (pages[offset:offset + limit] for offset in range(0, len(pages), limit))
+    number = 1
+    for batch in pages:
+        for entry in batch:
             if description_func:
                 description = description_func(entry)
-                print(f"{i}. {description}")
+                print(f"{number}. {description}")
             else:
-                print(f"{i}. {entry}")
+                print(f"{number}. {entry}")
+            number += 1
         if len(batch) < limit:
             break
         user_input = input(f"\nПоказать ещё {limit} результатов? (y/n): ").strip().lower()
         if user_input != 'y':
             break
-        offset += limit
 
 def get_search_description(search_type):
     descriptions = {
@@ -50,29 +62,82 @@ def get_search_description(search_type):
         "by actor": "По актёру",
         "by genre and years": "По жанру и годам",
         "by years (from... to...)": "По диапазону лет",
-        "by genre": "По жанру"
+        "by genre": "По жанру",
+        "by keyword": "По ключевым словам"
     }
     return descriptions.get(search_type, search_type)
 
+def print_latency_stats():
+    """Перцентили времени запросов к MySQL/MongoDB и последние медленные вызовы."""
+    from tabulate import tabulate
+    rows = [
+        [component, operation, item["calls"], f"{item['p50_ms']:.2f}", f"{item['p90_ms']:.2f}",
+         f"{item['p99_ms']:.2f}", f"{item['max_ms']:.2f}", item["rows_p50"], item["bytes_p50"], item["slow"],
+         item["errors"]]
+        for (component, operation), item in METRICS.snapshot().items()
+    ]
+    if not rows:
+        print(f"{BERUSA}Замеров пока нет.{RESET}")
+        return
+    print(f"\n{MAGENTA}Query latency, ms:{RESET}")
+    print(tabulate(rows, headers=["Component", "Operation", "Calls", "p50", "p90", "p99", "max", "Rows p50",
+                                  "Bytes p50", "Slow", "Errors"]))
+    if METRICS.slow_calls:
+        print(f"\n{MAGENTA}Latest slow calls (> {METRICS.slow_threshold * 1000:g} ms):{RESET}")
+        for entry in list(METRICS.slow_calls)[-5:]:
+            print(f"{entry['timestamp']} {entry['component']}.{entry['operation']} {entry['ms']} ms: "
+                  f"{(entry['statement'] or '')[:200]}")
+    export_metrics()
+
+def export_metrics():
+    """Выгружает замеры в файл METRICS_EXPORT в формате Prometheus, если он задан."""
+    path = os.getenv("METRICS_EXPORT")
+    if path:
+        try:
+            METRICS.write_prometheus(path)
+        except OSError as e:
+            print(f"{RED}Не удалось записать метрики в {path}: {e}{RESET}")
+
+def serve_metrics():
+    """Отдаёт замеры по HTTP на порту METRICS_PORT, если он задан."""
+    port = os.getenv("METRICS_PORT")
+    if port:
+        METRICS.serve_prometheus(int(port))
+
+def create_db(**kwargs):
+    """DBConnector с настройками из окружения; соединение откроется при первом запросе."""
+    # Триграммный индекс названий в памяти (TITLE_INDEX=0 — искать через MySQL)
+    # Снимок каталога (CATALOG_SNAPSHOT) убирает MySQL из пути чтения
+    snapshot = os.getenv("CATALOG_SNAPSHOT")
+    return DBConnector(title_index=os.getenv("TITLE_INDEX", "1") == "1", cache=ResultCache.from_env(),
+                       snapshot=snapshot if snapshot and os.path.exists(snapshot) else None,
+                       actor_index=os.getenv("ACTOR_INDEX", "0") == "1", **kwargs)
+
+def create_app():
+    """Объекты интерактивного режима: (db, logger, stats)."""
+    db = create_db()
+    # Логи пишутся пачками в фоновом потоке (LOG_BUFFERED=0 — синхронно)
+    logger = LogSearch(buffered=os.getenv("LOG_BUFFERED", "1") == "1")
+    return db, logger, LogStats(logger)
+
 def main():
-    db = DBConnector()
-    logger = LogSearch()
-    stats = LogStats(logger)
+    db, logger, stats = create_app()
+    serve_metrics()
 
     while True:
         choice = main_menu()
         if choice == 1:
+            def description_func(entry):
+                return entry['title']
             try:
                 title = input("Enter film title: ")
-                all_results = db.search_by_title(title, limit=1000)
+                pages = db.paginate(db.search_by_title, title, page_size=10)
+                print_paginated_results(pages, description_func, limit=10)
+                result_count = pages.count()
             except Exception as e:
                 print(f"{RED}Ошибка при поиске по названию: {e}{RESET}")
                 continue
-
-            def description_func(entry):
-                return entry['title']
-            print_paginated_results(all_results, description_func, limit=10)
-            logger.log_search("by title", {"title": title}, len(all_results))
+            logger.log_search("by title", {"title": title}, result_count)
 
         elif choice == 2:
             try:
@@ -106,28 +171,35 @@ def main():
                 if year_from < 1990 or year_to > 2025:
                     print(f'{RED}Please enter years from 1990 to 2025.{RESET}')
                     continue
-                all_results = db.search_by_genre_and_years(genre, year_from, year_to, limit=1000)
+                pages = db.paginate(db.search_by_genre_and_years, genre, year_from, year_to, page_size=10)
                 def description_func(entry):
                     return f"{entry['title']} ({entry['release_year']}) - {entry['genre']}"
-                print_paginated_results(all_results, description_func, limit=10)
-                logger.log_search("by genre and years", {"genre": genre, "from": year_from, "to": year_to}, len(all_results))
+                print_paginated_results(pages, description_func, limit=10)
+                logger.log_search("by genre and years", {"genre": genre, "from": year_from, "to": year_to}, pages.count())
             except ValueError:
                 print(f"{BERUSA}Invalid year input.{RESET}")
+            except Exception as e:
+                print(f"{RED}Ошибка при поиске по жанру и годам: {e}{RESET}")
 
 
         elif choice == 3:
-            print(f"\n{MAGENTA}Top 5 popular searches by genre and years:{RESET}")
-            print(f"{'#':<3} {'Genre':<15} | {'Years':<15} | {'Requests':<10}")
-            print('-' * 45)
-            popular_genre_years = []
+            from pymongo.errors import PyMongoError
+            # Статистика должна учитывать только что выполненные поиски
+            logger.flush(timeout=5)
+            # Все разделы экрана одним запросом (+ последние запросы параллельно)
+            sections, timings = {}, {}
             try:
-                popular_genre_years = stats.get_popular_genre(limit=5)
+                dashboard = stats.dashboard(limit=5)
+                sections, timings = dashboard["sections"], dashboard["timings"]
             except PyMongoError as e:
                 print(f"{RED}Ошибка MongoDB: {e}{RESET}")
             except Exception as e:
                 print(f"{RED}Непредвиденная ошибка: {e}{RESET}")
 
-            for i, entry in enumerate(popular_genre_years, 1):
+            print(f"\n{MAGENTA}Top 5 popular searches by genre and years:{RESET}")
+            print(f"{'#':<3} {'Genre':<15} | {'Years':<15} | {'Requests':<10}")
+            print('-' * 45)
+            for i, entry in enumerate(sections.get("genre_and_years", []), 1):
                 genre = entry['genre'].capitalize()
                 year_range = f"{entry['from']}–{entry['to']}"
                 count = entry['count']
@@ -136,54 +208,41 @@ def main():
             print(f"\n{MAGENTA}Top 5 popular films by title:{RESET}")
             print(f"{'#':<3} {'Film Title':<30} | {'Requests':<10}")
             print('-' * 50)
-            popular_films_by_title = []
-            try:
-                popular_films_by_title = stats.get_popular_films_by_title(limit=5)
-            except PyMongoError as e:
-                print(f"{RED}Ошибка MongoDB: {e}{RESET}")
-            except Exception as e:
-                print(f"{RED}Непредвиденная ошибка: {e}{RESET}")
-
-            for i, entry in enumerate(popular_films_by_title, 1):
-                film_title = entry.get('title', 'Unknown').upper()
+            for i, entry in enumerate(sections.get("titles", []), 1):
+                film_title = (entry.get('title') or 'Unknown').upper()
                 count = entry['count']
                 print(f"{i:<3} {film_title:<30} | {count:<10}")
+
             print(f"\n{MAGENTA}Top 5 popular actors:{RESET}")
             print(f"{'#':<3} {'Actor':<25} | {'Requests':<10}")
             print('-' * 45)
-            popular_actors = []
-            try:
-                popular_actors = stats.get_popular_actors(limit=5)
-            except PyMongoError as e:
-                print(f"{RED}Ошибка MongoDB: {e}{RESET}")
-            except Exception as e:
-                print(f"{RED}Непредвиденная ошибка: {e}{RESET}")
-
-            for i, entry in enumerate(popular_actors, 1):
-                actor_name = entry.get('actor_name', 'Unknown').capitalize()
+            for i, entry in enumerate(sections.get("actors", []), 1):
+                actor_name = (entry.get('actor_name') or 'Unknown').capitalize()
                 count = entry['count']
                 print(f"{i:<3} {actor_name:<25} | {count:<10}")
 
             # Последние 5 запросов
             print(f"\n{MAGENTA}Latest 5 searches:{RESET}")
-            latest_searches = []
-            try:
-                latest_searches = stats.get_latest(limit=5)
-            except PyMongoError as e:
-                print(f"{RED}Ошибка MongoDB: {e}{RESET}")
-            except Exception as e:
-                print(f"{RED}Непредвиденная ошибка: {e}{RESET}")
-
-            for i, entry in enumerate(latest_searches, 1):
+            for i, entry in enumerate(sections.get("latest", []), 1):
                 search_type = get_search_description(entry['search_type'])
                 params = entry['params']
                 print(f"{i}. {search_type}: {params}")
 
+            if timings:
+                details = ", ".join(f"{name} {seconds * 1000:.1f}" for name, seconds in timings.items()
+                                    if name != "total")
+                print(f"\nСтатистика получена за {timings['total'] * 1000:.1f} мс ({details})")
+
 
         elif choice == 4:
+            def description_func(entry):
+                return f"{entry['title']} ({entry['release_year']}) - {entry['actor_name']}"
+            from pymysql.err import MySQLError, OperationalError, ProgrammingError
             try:
                 actor = input("Enter actor name: ")
-                all_results = db.search_by_actor(actor, limit=1000)
+                pages = db.paginate(db.search_by_actor, actor, page_size=10)
+                print_paginated_results(pages, description_func, limit=10)
+                result_count = pages.count()
             except ProgrammingError as e:
                 print(f"{RED}Ошибка в SQL-запросе: {e}{RESET}")
                 continue
@@ -196,20 +255,309 @@ def main():
             except Exception as e:
                 print(f"{RED}Непредвиденная ошибка: {e}{RESET}")
                 continue
-
-            def description_func(entry):
-                return f"{entry['title']} ({entry['release_year']}) - {entry['actor_name']}"
-            print_paginated_results(all_results, description_func, limit=10)
-            logger.log_search("by actor", {"actor": actor}, len(all_results))
+            logger.log_search("by actor", {"actor": actor}, result_count)
 
         elif choice == 5:
             print(f"{MAGENTA}Goodbye! See you soon.{RESET}")
+            logger.close()
             db.close()
+            export_metrics()
+            METRICS.close()
             break
 
+        elif choice == 6:
+            print_latency_stats()
+
+        elif choice == 7:
+            def description_func(entry):
+                return f"{entry['title']} ({entry['release_year']}) - relevance {entry['score']:.2f}"
+            from pymysql.err import MySQLError
+            try:
+                keywords = input("Enter keywords: ").strip()
+                if not keywords:
+                    print(f"{BERUSA}Keywords cannot be empty.{RESET}")
+                    continue
+                boolean = input("Boolean mode: +word -word \"phrase\" word* (y/n): ").strip().lower() == "y"
+                with_description = input("Search in descriptions too (y/n): ").strip().lower() == "y"
+                mode = "boolean" if boolean else "natural"
+                fields = "title_description" if with_description else "title"
+                pages = db.paginate(db.search_by_keyword, keywords, mode, fields, page_size=10)
+                print_paginated_results(pages, description_func, limit=10)
+                result_count = pages.count()
+            except ValueError as e:
+                print(f"{RED}{e}{RESET}")
+                continue
+            except MySQLError as e:
+                print(f"{RED}Ошибка MySQL: {e}{RESET}")
+                continue
+            except Exception as e:
+                print(f"{RED}Непредвиденная ошибка: {e}{RESET}")
+                continue
+            logger.log_search("by keyword", {"keywords": keywords, "mode": mode, "fields": fields}, result_count)
+
+def rebuild_counters():
+    """Пересчитывает счётчики популярности запросов по всему сырому логу."""
+    logger = LogSearch()
+    written = logger.rebuild_popularity()
+    print(f"{GREEN}Счётчики популярности пересчитаны: {written}{RESET}")
+    recent = logger.rebuild_recent()
+    print(f"{GREEN}Последние уникальные запросы восстановлены: {recent}{RESET}")
+
+def rollup_log():
+    """Сворачивает сырой лог в почасовые и суточные корзины и включает TTL-индексы."""
+    from log_rollup import LogRollup
+    rollup = LogRollup(LogSearch())
+    summary = rollup.rollup()
+    rollup.ensure_indexes()
+    print(f"{GREEN}Свёрнуто часов: {summary['hours']}, почасовых корзин: {summary['hourly']}, "
+          f"суточных: {summary['daily']}; отметка: {summary['until']}; "
+          f"пересвёрнуто часов с запоздавшими событиями: {summary['late_hours']}{RESET}")
+    if rollup.retention:
+        print(f"Сырые события хранятся {rollup.retention.days} дн., почасовые корзины — "
+              f"{rollup.hourly_retention.days} дн.")
+
+def sync_catalog_snapshot(path):
+    """Создаёт или инкрементально обновляет снимок каталога."""
+    db = DBConnector()
+    try:
+        fetched = db.sync_snapshot(path)
+    finally:
+        db.close()
+    print(f"{GREEN}Снимок каталога {path} обновлён, прочитано строк из MySQL:{RESET}")
+    for table, rows in fetched.items():
+        print(f"  {table}: {rows}")
+
+def batch_search(path, output_path=None, workers=None, limit=10, log=True):
+    """
+    Пакетный поиск без интерактивного меню: запросы из JSONL-файла (или stdin при path="-"),
+    результаты — JSONL в output_path (или stdout) в порядке входа.
+    """
+    import contextlib
+    from batch_search import run_batch
+    workers = workers or int(os.getenv("BATCH_WORKERS", 8))
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    output = sys.stdout if not output_path else open(output_path, "w", encoding="utf-8")
+    # Служебные сообщения не должны смешиваться с результатами на stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        db = create_db(max_size=workers)
+        # В пакетном режиме логи не отбрасываются: при заполненной очереди поиск ждёт запись
+        logger = LogSearch(buffered=True, overflow="block") if log else None
+        try:
+            summary = run_batch(db, source, output, workers=workers, limit=limit, logger=logger)
+        finally:
+            if logger is not None:
+                logger.close()
+            db.close()
+            export_metrics()
+            if source is not sys.stdin:
+                source.close()
+            if output is not sys.stdout:
+                output.close()
+        print(f"{GREEN}Выполнено запросов: {summary['requests']}, ошибок: {summary['errors']}, "
+              f"за {summary['seconds']:.2f} с ({summary['per_second'] or 0:.1f} запросов/с){RESET}")
+
+def export_results(search_type, parameters, output_path=None, format=None, chunk_size=None):
+    """
+    Выгружает все результаты поиска в файл CSV, JSONL (.gz — сжатый) или Parquet
+    потоком, пачками по chunk_size строк. search_type — как в пакетном режиме,
+    а "by filters" — составной поиск FilmQuery (без параметров — весь каталог).
+    """
+    import contextlib
+    from tabulate import tabulate
+    from export import export
+    chunk_size = chunk_size or int(os.getenv("EXPORT_CHUNK_SIZE", 5000))
+    output_path = output_path or "-"
+    if output_path == "-":
+        format = format or "jsonl"
+    with contextlib.redirect_stdout(sys.stderr if output_path == "-" else sys.stdout):
+        db = create_db(row_format="tuple", max_size=1)
+        try:
+            from batch_search import search_args
+            _, method, args = search_args({"search_type": search_type, "parameters": parameters})
+            search = getattr(db, method)
+            summary = export(db.stream(search, *args, chunk_size=chunk_size), output_path, format,
+                             columns=RESULT_COLUMNS.get(method))
+        finally:
+            db.close()
+            export_metrics()
+        rows = [["Строк", summary["rows"]],
+                ["Время, с", f"{summary['seconds']:.3f}"],
+                ["Строк/с", f"{summary['rows_per_second'] or 0:,.0f}"]]
+        if summary["bytes"] is not None:
+            rows += [["Размер, МБ", f"{summary['bytes'] / 2 ** 20:.2f}"],
+                     ["МБ/с", f"{summary['mb_per_second'] or 0:.2f}"]]
+        print(f"{GREEN}Выгрузка {search_type} -> {output_path}:{RESET}")
+        print(tabulate(rows, tablefmt="simple"))
+
+def replay_log(limit=1000, sample=False, window=None, processes=None, rate=None, speed=None, page_size=10):
+    """
+    Нагрузочный тест: воспроизводит записи лога MongoDB против MySQL в нескольких процессах
+    и сверяет количество результатов с записанным в логе.
+    :return: True, если нет ошибок и расхождений result_count
+    """
+    from functools import partial
+    from tabulate import tabulate
+    from replay_load import read_log, replay
+    logger = LogSearch()
+    entries = read_log(logger, limit=limit, sample=sample, window=window)
+    # Клиент MongoDB не должен переходить в процессы-исполнители
+    if logger.client is not None:
+        logger.client.close()
+    if not entries:
+        print(f"{BERUSA}В логе нет записей для воспроизведения.{RESET}")
+        return True
+    processes = processes or int(os.getenv("REPLAY_PROCESSES", os.cpu_count() or 4))
+    report = replay(entries, partial(create_db, max_size=1), processes=processes, rate=rate, speed=speed,
+                    limit=page_size)
+    rows = [[search_type, item["calls"], f"{item['p50_ms']:.2f}", f"{item['p90_ms']:.2f}", f"{item['p99_ms']:.2f}",
+             f"{item['max_ms']:.2f}", item["errors"], item["mismatches"]]
+            for search_type, item in report["types"].items()]
+    print(f"\n{MAGENTA}Replay latency, ms:{RESET}")
+    print(tabulate(rows, headers=["Search type", "Calls", "p50", "p90", "p99", "max", "Errors", "Mismatches"]))
+    print(f"\nЗапросов: {report['requests']} за {report['seconds']:.2f} с ({report['per_second'] or 0:.1f} запросов/с), "
+          f"процессов: {processes}, p99 опоздания от расписания: {report['lag_p99_ms']:.2f} мс")
+    for example in report["examples"]:
+        problem = example.get("error") or f"{example['result_count']} результатов, в логе {example['logged_count']}"
+        print(f"{RED}{example['search_type']} {example['parameters']}: {problem}{RESET}")
+    ok = not report["errors"] and not report["mismatches"]
+    if ok:
+        print(f"{GREEN}Количество результатов совпадает с логом.{RESET}")
+    return ok
+
+def serve(address):
+    """Запускает HTTP-сервис поиска на адресе "host:port" до SIGINT/SIGTERM."""
+    import asyncio
+    from search_service import SearchService
+    host, _, port = address.rpartition(":")
+    workers = int(os.getenv("SERVICE_WORKERS", 16))
+    db = create_db(max_size=workers)
+    # Сервис подключается и строит индексы до первого клиента
+    db.connect()
+    logger = LogSearch(buffered=True)
+    service = SearchService(db, logger, LogStats(logger), workers=workers)
+    serve_metrics()
+    try:
+        asyncio.run(service.serve(host or "127.0.0.1", int(port)))
+    finally:
+        logger.close()
+        db.close()
+        export_metrics()
+        METRICS.close()
+    print(f"{MAGENTA}Сервис поиска остановлен.{RESET}")
+
+def create_fulltext_index():
+    """Создаёт FULLTEXT-индекс film_text(title) для полнотекстового поиска только по названию."""
+    db = DBConnector()
+    try:
+        created = db.create_fulltext_index("title")
+    finally:
+        db.close()
+    print(f"{GREEN}{'Индекс film_text(title) создан' if created else 'Индекс film_text(title) уже есть'}{RESET}")
+
+def check_plans(genre=None):
+    """Проверяет планы поиска по жанру (EXPLAIN) на MySQL без кэша и снимка."""
+    from query_plans import check_query_plans
+    db = DBConnector()
+    try:
+        return check_query_plans(db, genre)
+    finally:
+        db.close()
+
+def verify_log_indexes():
+    """
+    Создаёт индексы лога поиска и проверяет планы запросов статистики (explain),
+    включая выборки, которые выполняет экран статистики меню и сервиса (режим счётчиков).
+    """
+    from query_plans import check_log_plans
+    logger = LogSearch(indexes=False)
+    names = logger.ensure_indexes()
+    print(f"{GREEN}Индексы лога поиска: {', '.join(names)}{RESET}")
+    return check_log_plans(LogStats(logger))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Film search")
+    parser.add_argument("--rebuild-counters", action="store_true",
+                        help="пересчитать счётчики популярности и последние запросы по сырому логу MongoDB и выйти")
+    parser.add_argument("--rollup", action="store_true",
+                        help="свернуть сырой лог MongoDB в почасовые и суточные корзины и выйти (запускать по cron)")
+    parser.add_argument("--sync-snapshot", nargs="?", const=os.getenv("CATALOG_SNAPSHOT"), metavar="PATH",
+                        help="создать или обновить снимок каталога (по умолчанию CATALOG_SNAPSHOT) и выйти")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="PATH",
+                        help="выполнить поисковые запросы из JSONL-файла (без PATH — из stdin) и выйти")
+    parser.add_argument("--export", metavar="SEARCH_TYPE",
+                        help="выгрузить все результаты поиска (\"by genre and years\", \"by filters\" и др.) "
+                             "в --output и выйти")
+    parser.add_argument("--params", type=json.loads, default={}, metavar="JSON",
+                        help='параметры поиска --export, например \'{"genre": "Action", "from": 2000, "to": 2010}\'')
+    parser.add_argument("--format", choices=("csv", "jsonl", "parquet"),
+                        help="формат --export (по умолчанию — по расширению --output)")
+    parser.add_argument("--chunk-size", type=int,
+                        help="строк в пачке --export (по умолчанию EXPORT_CHUNK_SIZE или 5000)")
+    parser.add_argument("--replay", nargs="?", type=int, const=1000, metavar="N",
+                        help="нагрузочный тест: воспроизвести последние N записей лога MongoDB (по умолчанию 1000) "
+                             "против MySQL; код возврата 1 при ошибках или расхождении result_count")
+    parser.add_argument("--sample", action="store_true", help="--replay: случайные N записей вместо последних")
+    parser.add_argument("--window", help="--replay: только записи за последнее окно, например 24h или 7d")
+    parser.add_argument("--processes", type=int,
+                        help="--replay: число процессов (по умолчанию REPLAY_PROCESSES или число ядер)")
+    parser.add_argument("--rate", type=float, help="--replay: запросов в секунду (по умолчанию без пауз)")
+    parser.add_argument("--speed", type=float,
+                        help="--replay: исходные интервалы между запросами, ускоренные в SPEED раз")
+    parser.add_argument("--output", metavar="PATH",
+                        help="файл для результатов --batch и --export (по умолчанию stdout)")
+    parser.add_argument("--workers", type=int, help="число потоков --batch (по умолчанию BATCH_WORKERS или 8)")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="сколько результатов запрашивать на запрос в --batch и --replay (0 — только количество)")
+    parser.add_argument("--no-log", action="store_true", help="не записывать запросы --batch в лог MongoDB")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="показать, сколько миллисекунд занимают фазы запуска и импорты, и выйти")
+    parser.add_argument("--check-startup", nargs="?", type=float, const=0, metavar="BUDGET_MS",
+                        help="проверить бюджет холодного запуска (по умолчанию STARTUP_BUDGET_MS или 300 мс); "
+                             "код возврата 1 при превышении")
+    parser.add_argument("--create-fulltext-index", action="store_true",
+                        help="создать FULLTEXT-индекс film_text(title) для поиска по ключевым словам в названиях")
+    parser.add_argument("--check-plans", nargs="?", const="", metavar="GENRE",
+                        help="проверить через EXPLAIN, что поиск по жанру использует индексы; "
+                             "код возврата 1 при полном просмотре таблиц")
+    parser.add_argument("--verify-log-indexes", action="store_true",
+                        help="создать индексы лога MongoDB и проверить через explain, что запросы статистики "
+                             "их используют; код возврата 1 при просмотре всей коллекции или сортировке в памяти")
+    parser.add_argument("--serve", nargs="?", const=os.getenv("SERVICE_ADDRESS", "127.0.0.1:8080"),
+                        metavar="HOST:PORT", help="запустить HTTP-сервис поиска с JSON-ответами")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        main()
+        if args.rebuild_counters:
+            rebuild_counters()
+        elif args.rollup:
+            rollup_log()
+        elif args.sync_snapshot:
+            sync_catalog_snapshot(args.sync_snapshot)
+        elif args.batch:
+            batch_search(args.batch, args.output, args.workers, args.limit, log=not args.no_log)
+        elif args.replay:
+            sys.exit(0 if replay_log(args.replay, args.sample, args.window, args.processes, args.rate, args.speed,
+                                     args.limit) else 1)
+        elif args.export:
+            export_results(args.export, args.params, args.output, args.format, args.chunk_size)
+        elif args.serve:
+            serve(args.serve)
+        elif args.create_fulltext_index:
+            create_fulltext_index()
+        elif args.verify_log_indexes:
+            sys.exit(0 if verify_log_indexes() else 1)
+        elif args.check_plans is not None:
+            sys.exit(0 if check_plans(args.check_plans or None) else 1)
+        elif args.profile_startup:
+            from startup_profile import profile_startup
+            profile_startup()
+        elif args.check_startup is not None:
+            from startup_profile import check_startup_budget
+            sys.exit(0 if check_startup_budget(args.check_startup or None) else 1)
+        else:
+            main()
     except KeyboardInterrupt:
         print(f"\n{RED}Программа остановлена пользователем.{RESET}")
     except Exception as e:
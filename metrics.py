@@ -0,0 +1,319 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from itertools import count
+
+from config import load_env
+
+load_env()
+
+# Замеры каждого запроса к MySQL и MongoDB: время, число строк и объём полученных данных
+# копятся в гистограммах в памяти процесса. Медленные вызовы попадают в журнал вместе
+# с текстом SQL или конвейером агрегации. Снимок выгружается в текстовом формате Prometheus.
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """
+    Гистограмма в духе HDR: значение (целое) попадает в корзину с significant_bits
+    старшими битами, поэтому относительная погрешность перцентилей не больше
+    2 ** -(significant_bits - 1) при любом диапазоне значений, а память — O(число корзин).
+    Не потокобезопасна: синхронизацию обеспечивает Metrics.
+    """
+    def __init__(self, significant_bits=7):
+        self.significant_bits = significant_bits
+        self._buckets = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        value = max(0, int(value))
+        shift = max(0, value.bit_length() - self.significant_bits)
+        # Ключ — нижняя граница корзины
+        self._buckets[(value >> shift) << shift] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Значение, не меньше которого p процентов записей (верхняя граница корзины)."""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * p // 100))
+        seen = 0
+        for lower in sorted(self._buckets):
+            seen += self._buckets[lower]
+            if seen >= target:
+                shift = max(0, lower.bit_length() - self.significant_bits)
+                return min(self.max, lower + (1 << shift) - 1)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+
+def payload_size(value):
+    """
+    Приблизительный объём данных в байтах: длина строк и bytes, 8 байт на число.
+    Драйверы не сообщают размер ответа, поэтому он оценивается по полученным строкам.
+    """
+    if isinstance(value, dict):
+        return sum(len(key) + payload_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return 0 if value is None else 8
+
+
+def _statement_text(statement):
+    """SQL в одну строку, конвейер или фильтр MongoDB — в JSON."""
+    if statement is None or isinstance(statement, str):
+        return " ".join(statement.split()) if statement else statement
+    return json.dumps(statement, ensure_ascii=False, default=str)
+
+
+class _Series:
+    """Гистограммы одной операции: время (мкс), строки, байты."""
+    def __init__(self):
+        self.latency = Histogram()
+        self.rows = Histogram()
+        self.bytes = Histogram()
+        self.errors = 0
+        self.slow = 0
+
+
+class Metrics:
+    """Реестр замеров: (component, operation) -> гистограммы, плюс журнал медленных вызовов."""
+
+    def __init__(self, enabled=True, slow_threshold=0.5, slow_log=None, slow_keep=100, size_sample=100):
+        """
+        :param enabled: собирать замеры (False — timed() ничего не делает)
+        :param slow_threshold: вызовы дольше этого числа секунд пишутся в журнал медленных
+        :param slow_log: файл журнала медленных вызовов (JSONL) или None — только в памяти
+        :param slow_keep: сколько последних медленных вызовов хранить в памяти
+        :param size_sample: объём результата в timed() считается для каждого size_sample-го
+            вызова и для всех медленных (1 — для каждого, 0 — только для медленных)
+        """
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        self.slow_calls = deque(maxlen=slow_keep)
+        self.size_sample = size_sample
+        self._series = {}
+        self._lock = threading.Lock()
+        # Строки журнала пишутся в файл под своей блокировкой, не задерживая замеры
+        self._file_lock = threading.Lock()
+        self._calls = count(1)
+        self._server = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Настройки из окружения: METRICS_ENABLED (1), METRICS_SLOW_MS (500),
+        METRICS_SLOW_LOG (файл журнала медленных вызовов), METRICS_SIZE_SAMPLE (100).
+        """
+        return cls(enabled=os.getenv("METRICS_ENABLED", "1") == "1",
+                   slow_threshold=float(os.getenv("METRICS_SLOW_MS", 500)) / 1000,
+                   slow_log=os.getenv("METRICS_SLOW_LOG") or None,
+                   size_sample=int(os.getenv("METRICS_SIZE_SAMPLE", 100)))
+
+    def observe(self, component, operation, seconds, rows=None, size=None, statement=None, params=None,
+                error=None):
+        """Записывает один вызов; медленный вызов попадает в журнал."""
+        if not self.enabled:
+            return
+        slow = seconds >= self.slow_threshold
+        with self._lock:
+            series = self._series.get((component, operation))
+            if series is None:
+                series = self._series[(component, operation)] = _Series()
+            series.latency.record(seconds * 1e6)
+            if rows is not None:
+                series.rows.record(rows)
+            if size is not None:
+                series.bytes.record(size)
+            if error is not None:
+                series.errors += 1
+            if slow:
+                series.slow += 1
+        if slow:
+            self._log_slow({
+                "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+                "component": component,
+                "operation": operation,
+                "ms": round(seconds * 1000, 3),
+                "rows": rows,
+                "bytes": size,
+                "statement": _statement_text(statement),
+                "params": params,
+                "error": error,
+            })
+
+    def _log_slow(self, entry):
+        with self._lock:
+            self.slow_calls.append(entry)
+            line = json.dumps(entry, ensure_ascii=False, default=str) + "\n" if self.slow_log else None
+        if line is None:
+            return
+        try:
+            with self._file_lock, open(self.slow_log, "a", encoding="utf-8") as file:
+                file.write(line)
+        except OSError:
+            # Журнал не должен ломать поиск
+            pass
+
+    @contextmanager
+    def timed(self, component, operation, statement=None, params=None):
+        """
+        Замер блока кода. Результат вызова кладётся в call["result"] — число строк
+        и объём считаются по нему уже после остановки таймера (или задаются явно
+        в call["rows"] и call["bytes"]). Объём обходит все строки результата, поэтому
+        считается только для выборки вызовов (size_sample) и для медленных:
+
+            with metrics.timed("mysql", "search_by_title", query, params) as call:
+                call["result"] = cursor.fetchall()
+        """
+        call = {}
+        if not self.enabled:
+            yield call
+            return
+        started = time.perf_counter()
+        error = None
+        try:
+            yield call
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            rows, size = call.get("rows"), call.get("bytes")
+            if "result" in call:
+                result = call["result"]
+                rows = len(result) if isinstance(result, (list, tuple)) else int(result is not None)
+                sampled = self.size_sample and next(self._calls) % self.size_sample == 0
+                size = payload_size(result) if sampled or elapsed >= self.slow_threshold else None
+            self.observe(component, operation, elapsed, rows, size, statement, params, error)
+
+    def snapshot(self):
+        """Перцентили по операциям: {(component, operation): {...}}."""
+        with self._lock:
+            result = {}
+            for key, series in sorted(self._series.items()):
+                result[key] = {
+                    "calls": series.latency.count,
+                    "errors": series.errors,
+                    "slow": series.slow,
+                    "p50_ms": series.latency.percentile(50) / 1000,
+                    "p90_ms": series.latency.percentile(90) / 1000,
+                    "p99_ms": series.latency.percentile(99) / 1000,
+                    "max_ms": series.latency.max / 1000,
+                    "mean_ms": series.latency.mean() / 1000,
+                    "rows_p50": series.rows.percentile(50),
+                    "rows_max": series.rows.max,
+                    "bytes_p50": series.bytes.percentile(50),
+                    "bytes_total": series.bytes.total,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self.slow_calls.clear()
+
+    def to_prometheus(self, prefix="film_search"):
+        """Снимок в текстовом формате Prometheus (summary с квантилями)."""
+        lines = []
+        with self._lock:
+            items = sorted(self._series.items())
+            for name, help_text, unit_scale, attribute in (
+                    ("call_seconds", "Время вызова MySQL/MongoDB", 1e-6, "latency"),
+                    ("rows", "Строк (документов) в ответе", 1, "rows"),
+                    ("bytes", "Приблизительный объём ответа в байтах (по выборке вызовов)", 1, "bytes")):
+                metric = f"{prefix}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} summary")
+                for (component, operation), series in items:
+                    histogram = getattr(series, attribute)
+                    if not histogram.count:
+                        continue
+                    labels = f'component="{component}",operation="{operation}"'
+                    for quantile in QUANTILES:
+                        value = histogram.percentile(quantile * 100) * unit_scale
+                        lines.append(f'{metric}{{{labels},quantile="{quantile}"}} {value:g}')
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.total * unit_scale:g}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+            for name, help_text, attribute in (("errors_total", "Вызовов, завершившихся ошибкой", "errors"),
+                                               ("slow_calls_total", "Вызовов дольше порога", "slow")):
+                metric = f"{prefix}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for (component, operation), series in items:
+                    lines.append(f'{metric}{{component="{component}",operation="{operation}"}} '
+                                 f'{getattr(series, attribute)}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Атомарно записывает снимок в файл (для node_exporter textfile collector)."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """Отдаёт снимок по HTTP (GET /metrics) из фонового потока."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def instrumented(component):
+    """
+    Декоратор метода: замер полного вызова (включая кэш, индексы в памяти и разбор
+    результата) в реестре self.metrics. Разница с замерами самих запросов к базе —
+    время на стороне клиента.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timed(component, method.__name__) as call:
+                call["result"] = method(self, *args, **kwargs)
+            return call["result"]
+        return wrapper
+    return decorator
+
+
+# Общий реестр процесса: DBConnector, LogSearch и LogStats пишут в него по умолчанию
+METRICS = Metrics.from_env()
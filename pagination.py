@@ -0,0 +1,77 @@
+class KeysetPages:
+    """
+    Ленивый итератор страниц результатов поиска.
+    Каждая следующая страница запрашивается только при переходе к ней
+    и продолжает выборку с ключа последней строки (keyset/seek-пагинация),
+    поэтому память и время до первой строки не зависят от размера выборки.
+    """
+    def __init__(self, fetch_page, key_columns, page_size=10, count=None):
+        """
+        :param fetch_page: функция (after, limit) -> список строк,
+            after — ключ последней строки предыдущей страницы или None
+        :param key_columns: имена колонок ключа пагинации в строке результата
+        :param page_size: размер страницы
+        :param count: функция без аргументов, возвращающая общее число результатов
+        """
+        self._fetch_page = fetch_page
+        self.key_columns = tuple(key_columns)
+        self.page_size = page_size
+        self._count = count
+        self._total = None
+        self.fetched = 0
+
+    def key(self, row):
+        """Ключ пагинации строки."""
+        return tuple(row[column] for column in self.key_columns)
+
+    def __iter__(self):
+        after = None
+        while True:
+            page = self._fetch_page(after, self.page_size)
+            if not page:
+                return
+            self.fetched += len(page)
+            yield page
+            if len(page) < self.page_size:
+                return
+            after = self.key(page[-1])
+
+    def count(self):
+        """Общее число результатов (запрашивается один раз и запоминается)."""
+        if self._total is None:
+            self._total = self._count()
+        return self._total
+
+
+class OffsetPages:
+    """
+    Ленивый итератор страниц для результатов без ключа пагинации (например,
+    упорядоченных по релевантности): следующая страница запрашивается по OFFSET.
+    """
+    def __init__(self, fetch_page, page_size=10, count=None):
+        """
+        :param fetch_page: функция (offset, limit) -> список строк
+        :param page_size: размер страницы
+        :param count: функция без аргументов, возвращающая общее число результатов
+        """
+        self._fetch_page = fetch_page
+        self.page_size = page_size
+        self._count = count
+        self._total = None
+        self.fetched = 0
+
+    def __iter__(self):
+        while True:
+            page = self._fetch_page(self.fetched, self.page_size)
+            if not page:
+                return
+            self.fetched += len(page)
+            yield page
+            if len(page) < self.page_size:
+                return
+
+    def count(self):
+        """Общее число результатов (запрашивается один раз и запоминается)."""
+        if self._total is None:
+            self._total = self._count()
+        return self._total
@@ -0,0 +1,108 @@
+from formatter import GREEN, MAGENTA, RED, RESET
+
+# Проверка планов поисковых запросов через EXPLAIN: поиск по жанру должен идти
+# по индексу film_category.category_id и первичным ключам, без полного просмотра таблиц.
+# Запросы статистики лога поиска проверяются через explain MongoDB: без просмотра
+# всей коллекции (COLLSCAN) и сортировки в памяти (SORT).
+
+# Таблица -> обязательное использование индекса
+INDEXED_TABLES = ("fc",)
+
+
+def plan_problems(plan):
+    """Замечания к плану: полные просмотры таблиц (type = ALL) и отбор без индекса."""
+    problems = []
+    for row in plan:
+        table = row.get("table")
+        if table is None:
+            # "Impossible WHERE" и подобные строки без обращения к таблицам
+            continue
+        if row.get("type") == "ALL":
+            problems.append(f"полный просмотр таблицы {table}")
+        elif table in INDEXED_TABLES and not row.get("key"):
+            problems.append(f"таблица {table} читается без индекса")
+    return problems
+
+
+def plan_checks(db, genre=None, year_from=1990, year_to=2025):
+    """
+    Поиски, планы которых должны использовать индексы: [(метод поиска, аргументы)].
+    :param genre: жанр для проверки (по умолчанию первый из get_all_genres)
+    """
+    genre = genre or db.get_all_genres()[0]
+    return [
+        (db.search_by_genre, (genre,)),
+        (db.search_by_genre_and_years, (genre, year_from, year_to)),
+    ]
+
+
+def check_query_plans(db, genre=None, year_from=1990, year_to=2025):
+    """
+    Печатает EXPLAIN поиска по жанру и по жанру и годам и проверяет, что он использует индексы.
+    :param genre: жанр для проверки (по умолчанию первый из get_all_genres)
+    :return: True, если полных просмотров нет
+    """
+    from tabulate import tabulate
+    ok = True
+    for search, args in plan_checks(db, genre, year_from, year_to):
+        plan = db.explain(search, *args)
+        print(f"{MAGENTA}{search.__name__}{args}:{RESET}")
+        print(tabulate([[row.get("table"), row.get("type"), row.get("key"), row.get("rows"), row.get("Extra")]
+                        for row in plan], headers=["Таблица", "type", "Индекс", "Строк", "Extra"]))
+        problems = plan_problems(plan)
+        if problems:
+            ok = False
+            print(f"{RED}{'; '.join(problems)}{RESET}\n")
+        else:
+            print(f"{GREEN}Индексы используются{RESET}\n")
+    return ok
+
+
+# Стадии плана MongoDB, недопустимые для запросов статистики лога
+_MONGO_PROBLEMS = {
+    "COLLSCAN": "полный просмотр коллекции",
+    "SORT": "блокирующая сортировка в памяти",
+}
+
+
+def mongo_plan_stages(explain):
+    """Стадии выигравших планов (winningPlan) в документе explain, включая вложенные."""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and isinstance(node.get("stage"), str):
+                stages.append(node["stage"])
+            for key, value in node.items():
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+def mongo_plan_problems(explain):
+    """Замечания к плану MongoDB: полный просмотр коллекции и сортировка без индекса."""
+    stages = mongo_plan_stages(explain)
+    return [message for stage, message in _MONGO_PROBLEMS.items() if stage in stages]
+
+
+def check_log_plans(stats, limit=5):
+    """
+    Печатает стадии планов запросов статистики лога (LogStats.explain_plans) и проверяет,
+    что все они идут по индексам.
+    :return: True, если нет полных просмотров коллекций и сортировок в памяти
+    """
+    ok = True
+    for operation, explain in stats.explain_plans(limit).items():
+        stages = mongo_plan_stages(explain)
+        print(f"{MAGENTA}{operation}:{RESET} {' <- '.join(stages) or '-'}")
+        problems = mongo_plan_problems(explain)
+        if problems:
+            ok = False
+            print(f"{RED}{'; '.join(problems)}{RESET}")
+    if ok:
+        print(f"{GREEN}Все запросы статистики лога используют индексы{RESET}")
+    return ok
@@ -0,0 +1,155 @@
+import multiprocessing
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from batch_search import search_args
+from log_rollup import parse_window
+from metrics import Histogram
+
+# Нагрузочный тест по реальному трафику: записи лога LogSearch (search_type, parameters,
+# result_count, timestamp) воспроизводятся против DBConnector несколькими процессами —
+# с исходными интервалами между запросами, с заданной частотой или без пауз.
+# Для каждого типа поиска считаются перцентили времени, а количество результатов
+# сверяется с записанным в логе result_count.
+#
+#   entries = read_log(LogSearch(), limit=1000, window="24h")
+#   report = replay(entries, create_db, processes=4, speed=2)
+
+# Сколько примеров расхождений result_count сохранять в отчёте
+MAX_EXAMPLES = 10
+_PROJECTION = {"_id": 0, "search_type": 1, "parameters": 1, "result_count": 1, "timestamp": 1}
+
+# Состояние процесса-исполнителя
+_db = None
+_init_error = None
+
+
+def read_log(log_search, limit=1000, sample=False, window=None, search_types=None, now=None):
+    """
+    Записи лога для воспроизведения по возрастанию timestamp.
+    :param limit: сколько записей взять: последние limit (или случайные при sample=True)
+    :param window: только записи за последнее окно ("24h", "7d" или timedelta)
+    :param search_types: только эти типы поиска
+    """
+    query = {}
+    if window is not None:
+        query["timestamp"] = {"$gte": (now or datetime.now()) - parse_window(window)}
+    if search_types:
+        query["search_type"] = {"$in": [search_type.strip().lower() for search_type in search_types]}
+    collection = log_search.collection
+    if sample:
+        pipeline = [{"$match": query}, {"$sample": {"size": limit}}, {"$sort": {"timestamp": 1}},
+                    {"$project": _PROJECTION}]
+        with log_search.metrics.timed("mongo", "replay.sample", pipeline) as call:
+            call["result"] = list(collection.aggregate(pipeline, allowDiskUse=True))
+        return call["result"]
+    with log_search.metrics.timed("mongo", "replay.read") as call:
+        call["result"] = list(collection.find(query, _PROJECTION).sort("timestamp", -1).limit(limit))
+    return call["result"][::-1]
+
+
+def schedule(entries, rate=None, speed=None):
+    """
+    Секунды от начала теста, когда нужно выполнить каждую запись:
+    speed — исходные интервалы лога, ускоренные в speed раз; rate — равномерно rate запросов
+    в секунду; без обоих — все сразу (сколько успеют исполнители).
+    """
+    if speed:
+        first = entries[0]["timestamp"] if entries else None
+        return [(entry["timestamp"] - first).total_seconds() / speed for entry in entries]
+    if rate:
+        return [number / rate for number in range(len(entries))]
+    return [0.0] * len(entries)
+
+
+def _init_worker(db_factory, barrier):
+    global _db, _init_error
+    try:
+        _db = db_factory()
+        # Подключение и индексы в памяти строятся до начала отсчёта
+        _db.connect()
+    except Exception as e:
+        _init_error = f"{type(e).__name__}: {e}"
+    finally:
+        barrier.wait()
+
+
+def _replay_one(task):
+    started, offset, entry, limit = task
+    delay = started + offset - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    record = {"search_type": entry.get("search_type"), "parameters": entry.get("parameters"),
+              "logged_count": entry.get("result_count"), "lag": max(0.0, -delay)}
+    began = time.perf_counter()
+    try:
+        if _init_error is not None:
+            raise RuntimeError(_init_error)
+        _, method, args = search_args(entry)
+        search = getattr(_db, method)
+        # Как в интерактивном режиме: первая страница и общее количество
+        if limit > 0:
+            search(*args, limit=limit)
+        record["result_count"] = _db.count(search, *args)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = time.perf_counter() - began
+    return record
+
+
+def replay(entries, db_factory, processes=4, rate=None, speed=None, limit=10):
+    """
+    Воспроизводит записи лога в processes процессах.
+    :param db_factory: функция без аргументов, возвращающая DBConnector (вызывается в каждом процессе)
+    :param limit: размер первой страницы (0 — только количество)
+    :return: {"requests", "errors", "mismatches", "seconds", "per_second", "lag_p99_ms",
+        "types": {search_type: {"calls", "errors", "mismatches", "p50_ms", "p90_ms", "p99_ms", "max_ms"}},
+        "examples": [первые расхождения и ошибки]}
+    """
+    offsets = schedule(entries, rate, speed)
+    latency = defaultdict(Histogram)
+    counters = defaultdict(lambda: {"calls": 0, "errors": 0, "mismatches": 0})
+    lag = Histogram()
+    examples = []
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(processes + 1)
+    with context.Pool(processes, initializer=_init_worker, initargs=(db_factory, barrier)) as pool:
+        barrier.wait()
+        started = time.time()
+        tasks = ((started, offset, entry, limit) for offset, entry in zip(offsets, entries))
+        for record in pool.imap_unordered(_replay_one, tasks):
+            search_type = record["search_type"]
+            counter = counters[search_type]
+            counter["calls"] += 1
+            latency[search_type].record(record["seconds"] * 1e6)
+            lag.record(record["lag"] * 1e6)
+            if "error" in record:
+                counter["errors"] += 1
+            elif record["logged_count"] is not None and record["result_count"] != record["logged_count"]:
+                counter["mismatches"] += 1
+            else:
+                continue
+            if len(examples) < MAX_EXAMPLES:
+                examples.append({key: value for key, value in record.items() if key not in ("lag", "seconds")})
+        seconds = time.time() - started
+    requests = sum(counter["calls"] for counter in counters.values())
+    return {
+        "requests": requests,
+        "errors": sum(counter["errors"] for counter in counters.values()),
+        "mismatches": sum(counter["mismatches"] for counter in counters.values()),
+        "seconds": seconds,
+        "per_second": requests / seconds if seconds else None,
+        "lag_p99_ms": lag.percentile(99) / 1000,
+        "types": {
+            search_type: {
+                **counter,
+                "p50_ms": latency[search_type].percentile(50) / 1000,
+                "p90_ms": latency[search_type].percentile(90) / 1000,
+                "p99_ms": latency[search_type].percentile(99) / 1000,
+                "max_ms": latency[search_type].max / 1000,
+            }
+            for search_type, counter in sorted(counters.items(), key=lambda item: str(item[0]))
+        },
+        "examples": examples,
+    }
@@ -0,0 +1,189 @@
+import functools
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(method_name, args, kwargs):
+    """
+    Ключ кэша: имя метода и нормализованные аргументы.
+    Строки приводятся к нижнему регистру — поиск в MySQL регистронезависимый.
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return value.lower()
+        if isinstance(value, (tuple, list)):
+            return [normalize(item) for item in value]
+        return value
+    payload = [normalize(list(args)), {key: normalize(kwargs[key]) for key in sorted(kwargs)}]
+    return f"{method_name}:{json.dumps(payload, default=str, ensure_ascii=False)}"
+
+
+class SQLiteCacheBackend:
+    """
+    Общий для нескольких процессов кэш результатов в файле SQLite.
+    Значения хранятся в pickle вместе со временем истечения.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value BLOB)"
+            )
+
+    def _connection(self):
+        # Отдельное соединение на поток: sqlite3 не разделяет соединения между потоками
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        """Возвращает (True, значение) или (False, None), если записи нет или она истекла."""
+        row = self._connection().execute(
+            "SELECT expires, value FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] < time.time():
+            return False, None
+        return True, pickle.loads(row[1])
+
+    def set(self, key, value, ttl):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+            )
+
+    def delete_prefix(self, prefix):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache")
+
+    def purge_expired(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+
+class ResultCache:
+    """
+    Кэш результатов поиска: LRU с ограничением по числу записей и TTL каждой записи.
+    При заданном backend промахи локального кэша проверяются в общем кэше.
+    """
+    def __init__(self, max_size=1024, ttl=300, backend=None):
+        """
+        :param max_size: максимальное число записей в памяти
+        :param ttl: время жизни записи в секундах
+        :param backend: общий кэш для нескольких процессов (например, SQLiteCacheBackend)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (время истечения, значение)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Кэш по переменным окружения RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_PATH.
+        RESULT_CACHE_SIZE=0 отключает кэш (возвращается None).
+        """
+        max_size = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+        if max_size <= 0:
+            return None
+        path = os.getenv("RESULT_CACHE_PATH")
+        backend = SQLiteCacheBackend(path) if path else None
+        return cls(max_size, float(os.getenv("RESULT_CACHE_TTL", 300)), backend)
+
+    def get(self, key):
+        """Возвращает (True, значение) при попадании, иначе (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[key]
+                self.expirations += 1
+        if self.backend is not None:
+            found, value = self.backend.get(key)
+            if found:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return True, value
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, method_name=None):
+        """Удаляет записи метода method_name или весь кэш."""
+        prefix = f"{method_name}:" if method_name else ""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+        if self.backend is not None:
+            if prefix:
+                self.backend.delete_prefix(prefix)
+            else:
+                self.backend.clear()
+
+    def stats(self):
+        """Статистика попаданий, промахов и вытеснений."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def cached(method):
+    """Декоратор метода DBConnector: результат берётся из self.cache, если он задан."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.cache
+        if cache is None:
+            return method(self, *args, **kwargs)
+        key = make_key(method.__name__, args, kwargs)
+        found, value = cache.get(key)
+        if found:
+            return value
+        value = method(self, *args, **kwargs)
+        cache.set(key, value)
+        return value
+    return wrapper
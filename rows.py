@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+# Компактное представление строк результата поиска. Словарь на каждую строку хранит
+# собственную хеш-таблицу и ссылки на ключи; Row — кортеж значений, а имена колонок
+# и их позиции хранятся один раз в классе строки, общем для всего результата.
+
+
+class Row(tuple):
+    """
+    Строка результата: кортеж значений с доступом по имени колонки, как у словаря
+    (row["title"], row.get("genre"), row.keys()), и по позиции (row[0]).
+    Итерация и оператор in работают по значениям, как у кортежа.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        position = self._index.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return tuple(zip(self._fields, self))
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return "Row(" + ", ".join(f"{name}={value!r}" for name, value in zip(self._fields, self)) + ")"
+
+    def __reduce__(self):
+        # Классы строк создаются во время работы, поэтому pickle сохраняет имена колонок
+        return _restore, (self._fields, tuple(self))
+
+
+@lru_cache(maxsize=None)
+def row_class(fields):
+    """Класс строки для набора колонок (один на каждый набор, создаётся при первом обращении)."""
+    return type("Row", (Row,), {"__slots__": (), "_fields": fields,
+                                "_index": {name: i for i, name in enumerate(fields)}})
+
+
+def _restore(fields, values):
+    return row_class(fields)(values)
+
+
+def make_rows(description, values):
+    """
+    Строки Row из кортежей значений курсора.
+    :param description: cursor.description (имя колонки — первый элемент) или кортеж имён
+    """
+    fields = tuple(column if isinstance(column, str) else column[0] for column in description)
+    return list(map(row_class(fields), values))
+
+
+def compact_rows(rows):
+    """Список словарей с одинаковыми ключами -> список Row."""
+    if not rows or isinstance(rows[0], Row):
+        return rows
+    cls = row_class(tuple(rows[0]))
+    return [cls(row.values()) for row in rows]
+
+
+def as_dicts(rows):
+    """Строки в виде словарей (для JSON: кортеж сериализуется списком без имён колонок)."""
+    return [row.as_dict() if isinstance(row, Row) else row for row in rows]
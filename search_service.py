@@ -0,0 +1,348 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from film_query import FilmQuery
+from formatter import GREEN, RESET
+from log_rollup import parse_window
+from rows import as_dicts
+
+# Сетевой режим поиска: HTTP-сервер на asyncio отдаёт JSON. Соединения обслуживает один
+# цикл событий, а блокирующие вызовы DBConnector/LogStats выполняются в ограниченном пуле
+# потоков, поэтому сотни клиентов не требуют сотен потоков.
+#
+#   GET /search/title?title=ace&offset=0&limit=10
+#   GET /search/genre-years?genre=Comedy&from=2000&to=2010
+#   GET /search/actor?actor=penelope
+#   GET /search/films?actor=penelope&genre=Action&from=2000&to=2010
+#   GET /genres
+#   GET /stats?limit=5
+#   GET /stats?window=24h&limit=5
+#   GET /stats?fresh=1        (сначала дописать в лог уже выполненные поиски)
+#   GET /health
+#
+# Параметры передаются в строке запроса или JSON-телом POST.
+
+MAX_LIMIT = 100
+# Ограничения на чтение запроса: длина строки (строка запроса и заголовки), число заголовков
+MAX_LINE = 8192
+MAX_HEADERS = 100
+
+
+class RequestTooLarge(ValueError):
+    """Тело запроса больше SERVICE_MAX_BODY (ответ 413)."""
+
+
+class StatsNotConfigured(Exception):
+    """Сервис запущен без LogStats (ответ 404 на /stats)."""
+
+
+def _required(params, name):
+    value = params.get(name)
+    if value is None or str(value).strip() == "":
+        raise ValueError(f"не указан параметр {name}")
+    return value
+
+
+class SearchService:
+    """
+    HTTP-сервис поиска фильмов поверх DBConnector, LogSearch и LogStats.
+    Ограничения: не больше max_pending запросов в работе (остальным сразу 503),
+    timeout секунд на запрос (504); при остановке новые соединения не принимаются,
+    а начатые запросы дорабатывают до grace секунд.
+    """
+    def __init__(self, db, logger=None, stats=None, workers=None, max_pending=None, timeout=None,
+                 keepalive=None, read_timeout=None, max_body=None):
+        """
+        :param db: DBConnector (размер пула соединений лучше задать равным workers)
+        :param logger: LogSearch для записи запросов (буферизованный, чтобы не задерживать ответ)
+        :param stats: LogStats для /stats
+        :param workers: потоков для блокирующих вызовов (SERVICE_WORKERS или 16)
+        :param max_pending: запросов в работе одновременно (SERVICE_MAX_PENDING или 256)
+        :param timeout: секунд на запрос (SERVICE_TIMEOUT или 10)
+        :param keepalive: секунд простоя keep-alive соединения (SERVICE_KEEPALIVE или 15)
+        :param read_timeout: секунд на чтение заголовков и тела после строки запроса
+            (SERVICE_READ_TIMEOUT или 5)
+        :param max_body: максимальный размер тела запроса в байтах (SERVICE_MAX_BODY или 65536)
+        """
+        self.db = db
+        self.logger = logger
+        self.stats = stats
+        self.workers = workers or int(os.getenv("SERVICE_WORKERS", 16))
+        self.max_pending = max_pending or int(os.getenv("SERVICE_MAX_PENDING", 256))
+        self.timeout = timeout or float(os.getenv("SERVICE_TIMEOUT", 10))
+        self.keepalive = keepalive or float(os.getenv("SERVICE_KEEPALIVE", 15))
+        self.read_timeout = read_timeout or float(os.getenv("SERVICE_READ_TIMEOUT", 5))
+        self.max_body = max_body or int(os.getenv("SERVICE_MAX_BODY", 65536))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="search-service")
+        # Запросы в пуле потоков, включая превысившие таймаут, но ещё не завершённые
+        self.pending = 0
+        # Запросы, для которых ещё не отправлен ответ
+        self.active = 0
+        self.served = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._closing = False
+        self._server = None
+        self._connections = set()
+        self.routes = {
+            "/search/title": self._search_title,
+            "/search/genre-years": self._search_genre_years,
+            "/search/actor": self._search_actor,
+            "/search/films": self._search_films,
+            "/genres": self._genres,
+            "/stats": self._stats,
+        }
+
+    # Обработчики: выполняются в пуле потоков
+
+    def _search(self, search_type, parameters, search, args, params):
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 10))
+        if offset < 0 or not 0 < limit <= MAX_LIMIT:
+            raise ValueError(f"offset должен быть >= 0, limit — от 1 до {MAX_LIMIT}")
+        # Компактные строки (DB_ROW_FORMAT=tuple) отдаются объектами, а не списками значений
+        results = as_dicts(search(*args, offset=offset, limit=limit))
+        count = self.db.count(search, *args)
+        # Следующие страницы — продолжение того же поиска, а не новый запрос для статистики
+        if self.logger is not None and offset == 0:
+            self.logger.log_search(search_type, parameters, count)
+        return {"count": count, "offset": offset, "limit": limit, "results": results}
+
+    def _search_title(self, params):
+        title = _required(params, "title")
+        return self._search("by title", {"title": title}, self.db.search_by_title, (title,), params)
+
+    def _search_genre_years(self, params):
+        genre = _required(params, "genre")
+        year_from, year_to = int(_required(params, "from")), int(_required(params, "to"))
+        if year_from > year_to:
+            raise ValueError(f"начальный год {year_from} больше конечного {year_to}")
+        return self._search("by genre and years", {"genre": genre, "from": year_from, "to": year_to},
+                            self.db.search_by_genre_and_years, (genre, year_from, year_to), params)
+
+    def _search_actor(self, params):
+        actor = _required(params, "actor")
+        return self._search("by actor", {"actor": actor}, self.db.search_by_actor, (actor,), params)
+
+    def _search_films(self, params):
+        # Любое непустое сочетание фильтров одним запросом (FilmQuery)
+        parameters = {name: params[name] for name in ("title", "genre", "from", "to", "actor")
+                      if str(params.get(name, "")).strip()}
+        if not parameters:
+            raise ValueError("укажите хотя бы один из параметров title, genre, from, to, actor")
+        # Годы в логе — числами, как в остальных типах поиска
+        for name in ("from", "to"):
+            if name in parameters:
+                parameters[name] = int(parameters[name])
+        year_from, year_to = parameters.get("from"), parameters.get("to")
+        film_query = FilmQuery(parameters.get("title"), parameters.get("genre"), year_from, year_to,
+                               parameters.get("actor"))
+        return self._search("by filters", parameters, self.db.search_films, (film_query,), params)
+
+    def _genres(self, params):
+        return {"genres": self.db.get_all_genres()}
+
+    def _stats(self, params):
+        if self.stats is None:
+            raise StatsNotConfigured("статистика не настроена")
+        limit = int(params.get("limit", 5))
+        if not 0 < limit <= MAX_LIMIT:
+            raise ValueError(f"limit должен быть от 1 до {MAX_LIMIT}")
+        if self.logger is not None and params.get("fresh") in ("1", "true", True):
+            # По запросу статистика учитывает и только что выполненные поиски; по умолчанию
+            # не ждём записи лога, чтобы не дробить пачки insert_many и не задерживать ответ
+            self.logger.flush(timeout=1)
+        if params.get("window"):
+            # Топы за окно времени — по почасовым и суточным свёрткам лога
+            window = params["window"]
+            return {"window": window, "sections": self.stats.windowed(parse_window(window), limit)}
+        return self.stats.dashboard(limit=limit)
+
+    def health(self):
+        return {
+            "status": "closing" if self._closing else "ok",
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "pending": self.pending,
+            "connections": len(self._connections),
+            "served": self.served,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+        }
+
+    # Цикл событий
+
+    def _release(self, future):
+        self.pending -= 1
+        if not future.cancelled():
+            # Ошибка запроса, превысившего таймаут, уже никому не нужна
+            future.exception()
+
+    async def dispatch(self, path, params):
+        """Выполняет запрос к пути path, возвращает (HTTP-статус, JSON-ответ)."""
+        if path == "/health":
+            return HTTPStatus.OK, self.health()
+        handler = self.routes.get(path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {"error": f"неизвестный путь {path}"}
+        if self._closing:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "сервис останавливается"}
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "сервис перегружен, повторите позже"}
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, handler, params)
+        # Место освобождается, только когда поток действительно закончил работу
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return HTTPStatus.GATEWAY_TIMEOUT, {"error": f"запрос не выполнен за {self.timeout} с"}
+        except (ValueError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except StatsNotConfigured as e:
+            return HTTPStatus.NOT_FOUND, {"error": str(e)}
+        except Exception as e:
+            self.failed += 1
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        self.served += 1
+        return HTTPStatus.OK, result
+
+    async def _read_request(self, reader):
+        """
+        Читает HTTP-запрос: (метод, путь, параметры, версия, заголовки) или None при закрытии.
+        Строку запроса ждём не дольше keepalive, остальное — не дольше read_timeout;
+        длина строк ограничена MAX_LINE (лимит StreamReader), число заголовков — MAX_HEADERS.
+        """
+        request_line = await asyncio.wait_for(reader.readline(), self.keepalive)
+        if not request_line.strip():
+            return None
+        return await asyncio.wait_for(self._read_rest(reader, request_line), self.read_timeout)
+
+    async def _read_rest(self, reader, request_line):
+        method, target, version = request_line.decode("latin-1").split()
+        headers = {}
+        for count in range(MAX_HEADERS + 1):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if count == MAX_HEADERS:
+                raise ValueError(f"больше {MAX_HEADERS} заголовков")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_body:
+            raise RequestTooLarge(f"тело запроса больше {self.max_body} байт")
+        if length:
+            body = json.loads(await reader.readexactly(length))
+            if not isinstance(body, dict):
+                raise ValueError("тело запроса должно быть JSON-объектом")
+            params.update(body)
+        return method.upper(), url.path.rstrip("/") or "/", params, version, headers
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head += "Retry-After: 1\r\n"
+        return head.encode("latin-1") + b"\r\n" + body
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while not self._closing:
+                try:
+                    request = await self._read_request(reader)
+                except asyncio.TimeoutError:
+                    break
+                except RequestTooLarge as e:
+                    writer.write(self._response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": str(e)}, False))
+                    await writer.drain()
+                    break
+                except (ValueError, UnicodeDecodeError) as e:
+                    writer.write(self._response(HTTPStatus.BAD_REQUEST, {"error": f"некорректный запрос: {e}"},
+                                                False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, params, version, headers = request
+                self.active += 1
+                try:
+                    if method not in ("GET", "POST"):
+                        status, payload = HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"метод {method} не поддерживается"}
+                    else:
+                        status, payload = await self.dispatch(path, params)
+                finally:
+                    self.active -= 1
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                              and not self._closing)
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Начинает принимать соединения, возвращает asyncio-сервер."""
+        # limit: строка длиннее MAX_LINE — ValueError при чтении, ответ 400
+        self._server = await asyncio.start_server(self._handle_connection, host, port,
+                                                  backlog=self.max_pending, limit=MAX_LINE)
+        return self._server
+
+    async def shutdown(self, grace=None):
+        """
+        Плавная остановка: не принимать соединения, дождаться начатых запросов
+        (не дольше grace секунд, SERVICE_GRACE или 10), закрыть соединения и пул потоков.
+        """
+        grace = grace if grace is not None else float(os.getenv("SERVICE_GRACE", 10))
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + grace
+        while (self.active or self.pending) and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for writer in list(self._connections):
+            writer.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+        await loop.run_in_executor(None, partial(self.executor.shutdown, wait=True))
+
+    async def serve(self, host="127.0.0.1", port=8080, grace=None):
+        """Работает до SIGINT/SIGTERM, затем плавно останавливается."""
+        await self.start(host, port)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: остановка по KeyboardInterrupt
+                pass
+        addresses = ", ".join(str(sock.getsockname()) for sock in self._server.sockets)
+        print(f"{GREEN}Сервис поиска слушает {addresses}{RESET}")
+        try:
+            await stop.wait()
+        finally:
+            await self.shutdown(grace)
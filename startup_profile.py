@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from formatter import GREEN, MAGENTA, RED, RESET
+
+# Замер холодного запуска: отдельный процесс импортирует main и создаёт объекты
+# интерактивного режима (create_app), как при обычном запуске до вывода меню.
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Модули, которые не должны загружаться до первого обращения к базам
+LAZY_MODULES = ("pymongo", "pymysql", "asyncio", "tabulate")
+
+_CHILD = """
+import sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+db = main.create_db()
+db_created = time.perf_counter()
+logger = main.LogSearch(buffered=main.os.getenv("LOG_BUFFERED", "1") == "1")
+stats = main.LogStats(logger)
+created = time.perf_counter()
+import json
+print(json.dumps({
+    "import main": (imported - started) * 1000,
+    "DBConnector": (db_created - imported) * 1000,
+    "LogSearch + LogStats": (created - db_created) * 1000,
+    "loaded": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (LAZY_MODULES,)
+
+
+def _run_child(importtime=False):
+    """Запускает холодный старт в новом процессе: (мс от запуска до выхода, фазы, stderr)."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", _CHILD]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=PROJECT_DIR, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Процесс замера завершился с ошибкой:\n{result.stderr}")
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    return elapsed, phases, result.stderr
+
+
+def _import_times(stderr, limit):
+    """Самые дорогие импорты из вывода -X importtime: (модуль, собственное мс, всего мс)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, name))
+    # Только модули, импортированные проектом напрямую (первый уровень вложенности под main)
+    top = [row for row in rows if len(row[3]) - len(row[3].lstrip()) <= 3]
+    top.sort(key=lambda row: row[2], reverse=True)
+    return [(name, self_ms, cumulative_ms) for name, self_ms, cumulative_ms, _ in top[:limit]]
+
+
+def profile_startup(limit=15):
+    """Печатает, куда уходят миллисекунды запуска: фазы и самые дорогие импорты."""
+    from tabulate import tabulate
+    elapsed, phases, stderr = _run_child(importtime=True)
+    loaded = phases.pop("loaded")
+    in_process = sum(phases.values())
+    print(f"{MAGENTA}Фазы запуска, мс:{RESET}")
+    rows = [["интерпретатор и выход", f"{elapsed - in_process:.1f}"]]
+    rows += [[phase, f"{ms:.1f}"] for phase, ms in phases.items()]
+    rows.append(["всего", f"{elapsed:.1f}"])
+    print(tabulate(rows, headers=["Фаза", "мс"]))
+    print(f"\n{MAGENTA}Самые дорогие импорты (-X importtime), мс:{RESET}")
+    print(tabulate([[name, f"{self_ms:.1f}", f"{cumulative_ms:.1f}"]
+                    for name, self_ms, cumulative_ms in _import_times(stderr, limit)],
+                   headers=["Модуль", "собственное", "с зависимостями"]))
+    if loaded:
+        print(f"\n{RED}Загружены при запуске (должны импортироваться лениво): {', '.join(loaded)}{RESET}")
+
+
+def measure_startup(runs=5):
+    """
+    Холодный запуск в runs новых процессах.
+    :return: (время запусков в мс по возрастанию, модули из LAZY_MODULES, загруженные хотя бы в одном)
+    """
+    samples, loaded = [], set()
+    for _ in range(runs):
+        elapsed, phases, _ = _run_child()
+        samples.append(elapsed)
+        loaded.update(phases["loaded"])
+    return sorted(samples), loaded
+
+
+def budget_ms_from_env():
+    """Бюджет холодного запуска: STARTUP_BUDGET_MS или 300 мс."""
+    return float(os.getenv("STARTUP_BUDGET_MS", 300))
+
+
+def check_startup_budget(budget_ms=None, runs=5):
+    """
+    Проверка бюджета холодного запуска: медиана runs запусков не больше budget_ms
+    (по умолчанию STARTUP_BUDGET_MS или 300) и драйверы баз не загружаются до первого запроса.
+    :return: True, если бюджет соблюдён
+    """
+    budget_ms = budget_ms or budget_ms_from_env()
+    samples, loaded = measure_startup(runs)
+    median = samples[len(samples) // 2]
+    ok = median <= budget_ms and not loaded
+    color = GREEN if ok else RED
+    print(f"{color}Холодный запуск: медиана {median:.1f} мс (min {samples[0]:.1f}, max {samples[-1]:.1f}), "
+          f"бюджет {budget_ms:g} мс{RESET}")
+    if loaded:
+        print(f"{RED}При запуске загружены модули: {', '.join(sorted(loaded))}{RESET}")
+    return ok
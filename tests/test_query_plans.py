@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from config import load_env
+from db_connector import DBConnector
+from query_plans import plan_checks, plan_problems
+
+
+@pytest.fixture(scope="module")
+def mysql_db():
+    """DBConnector к MySQL из переменных окружения DB_*; без доступного сервера тесты пропускаются."""
+    pytest.importorskip("pymysql")
+    load_env()
+    if not os.getenv("DB_HOST"):
+        pytest.skip("MySQL не настроен (DB_HOST)")
+    db = DBConnector(min_size=1, max_size=1)
+    if not db.connect():
+        pytest.skip("MySQL недоступен")
+    yield db
+    db.close()
+
+
+def test_genre_searches_use_indexes(mysql_db):
+    """EXPLAIN поисков по жанру — без полных просмотров таблиц и отбора film_category без индекса."""
+    for search, args in plan_checks(mysql_db):
+        assert plan_problems(mysql_db.explain(search, *args)) == [], f"{search.__name__}{args}"
@@ -0,0 +1,9 @@
+from startup_profile import LAZY_MODULES, budget_ms_from_env, measure_startup
+
+
+def test_cold_start_within_budget_and_lazy():
+    """Медиана холодного запуска в бюджете, драйверы баз и asyncio не загружаются при старте."""
+    samples, loaded = measure_startup(runs=5)
+    median = samples[len(samples) // 2]
+    assert median <= budget_ms_from_env(), f"медиана {median:.1f} мс, запуски: {samples}"
+    assert not loaded & set(LAZY_MODULES), f"загружены при запуске: {sorted(loaded)}"
@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks.datasets import build_catalog
+from benchmarks.standins import sqlite_connect
+from db_connector import DBConnector
+
+# Подстроки разной длины: короче триграммы, с пробелом, спецсимволы LIKE и отсутствующая
+QUERIES = ("a", "ar", "the", "ace", "r c", " ", "%", "_", "zzzz")
+
+
+@pytest.fixture(scope="module")
+def databases(tmp_path_factory):
+    """DBConnector без индекса (SQL через заменитель MySQL) и с триграммным индексом названий."""
+    path = str(tmp_path_factory.mktemp("catalog") / "catalog.sqlite3")
+    build_catalog(path, 500)
+    sql = DBConnector(connect=sqlite_connect(path))
+    indexed = DBConnector(title_index=True, connect=sqlite_connect(path))
+    indexed.connect()
+    assert indexed.title_index is not None
+    yield sql, indexed
+    sql.close()
+    indexed.close()
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_title_index_matches_sql(databases, query):
+    """TrigramIndex возвращает те же строки в том же порядке, что и поиск через SQL."""
+    sql, indexed = databases
+    assert indexed.search_by_title(query, 0, 10000) == sql.search_by_title(query, 0, 10000)
+    assert indexed.count(indexed.search_by_title, query) == sql.count(sql.search_by_title, query)
+
+
+@pytest.mark.parametrize("query", ("a", "the"))
+def test_title_index_pages_match_sql(databases, query):
+    """Страницы по OFFSET и по ключу after совпадают с SQL."""
+    sql, indexed = databases
+    assert indexed.search_by_title(query, 7, 5) == sql.search_by_title(query, 7, 5)
+    after = sql.search_by_title(query, 0, 3)[-1]["film_id"]
+    assert indexed.search_by_title(query, limit=5, after=(after,)) == sql.search_by_title(query, limit=5,
+                                                                                         after=(after,))
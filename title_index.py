@@ -0,0 +1,83 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+
+class TrigramIndex:
+    """
+    Триграммный инвертированный индекс по названиям фильмов.
+    Строится один раз из таблицы film и хранится в памяти,
+    поиск подстроки не обращается к MySQL.
+    """
+    def __init__(self, rows):
+        """
+        :param rows: пары (film_id, title) в любом порядке
+        """
+        rows = sorted(rows, key=lambda row: row[0])
+        self.film_ids = [film_id for film_id, _ in rows]
+        self.titles = [title for _, title in rows]
+        self._lowered = [title.lower() for title in self.titles]
+        # trigram -> отсортированный список позиций (позиция = порядок по film_id)
+        postings = defaultdict(list)
+        for position, title in enumerate(self._lowered):
+            for trigram in self._trigrams(title):
+                postings[trigram].append(position)
+        self._postings = dict(postings)
+
+    @classmethod
+    def from_connection(cls, connection):
+        """Строит индекс по всем фильмам из таблицы film."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT film_id, title FROM film")
+            return cls((row["film_id"], row["title"]) for row in cursor.fetchall())
+
+    def __len__(self):
+        return len(self.titles)
+
+    @staticmethod
+    def _trigrams(text):
+        """Уникальные триграммы строки."""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _candidates(self, needle):
+        """Позиции, у которых есть все триграммы подстроки (пересечение posting-листов)."""
+        if len(needle) < 3:
+            # Слишком короткая подстрока: триграмм нет, проверяем все названия
+            return range(len(self._lowered))
+        lists = []
+        for trigram in self._trigrams(needle):
+            posting = self._postings.get(trigram)
+            if not posting:
+                return []
+            lists.append(posting)
+        lists.sort(key=len)
+        result = lists[0]
+        for other in lists[1:]:
+            result = [p for p in result if self._contains(other, p)]
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def _contains(posting, position):
+        i = bisect_left(posting, position)
+        return i < len(posting) and posting[i] == position
+
+    def positions(self, name):
+        """Позиции названий, содержащих подстроку name (без учёта регистра), по возрастанию film_id."""
+        needle = name.lower()
+        # Триграммы дают только кандидатов, окончательно проверяем вхождение подстроки
+        return [p for p in self._candidates(needle) if needle in self._lowered[p]]
+
+    def search(self, name, offset=0, limit=10, after=None):
+        """
+        Поиск фильмов по подстроке названия.
+        Возвращает те же строки и в том же порядке, что и DBConnector.search_by_title.
+        :param after: ключ (film_id,) последней строки предыдущей страницы
+        """
+        positions = self.positions(name)
+        if after is not None:
+            after_id = after[0] if isinstance(after, (tuple, list)) else after
+            start = bisect_right(self.film_ids, after_id)
+            positions = positions[bisect_left(positions, start):]
+        return [{"film_id": self.film_ids[p], "title": self.titles[p]}
+                for p in positions[offset:offset + limit]]